@@ -1,5 +1,7 @@
 from typing import Callable, Optional
 
+import multiprocessing
+
 from flet import (
     AlertDialog,
     FilePicker,
@@ -364,6 +366,8 @@ def main(page: Page):
 
 
 if __name__ == "__main__":
+    # in the packaged app, rendering worker processes start here
+    multiprocessing.freeze_support()
     app(
         name="Tuttle",
         target=main,
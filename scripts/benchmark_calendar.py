@@ -0,0 +1,142 @@
+"""Benchmark the conversion of calendar events to time tracking data.
+
+Compares the vectorized conversion of tuttle.calendar with the previous
+row-by-row conversion, on synthetic calendars.
+
+    python scripts/benchmark_calendar.py --n-events 100000
+    python scripts/benchmark_calendar.py --n-events 1000 --ics-reference
+"""
+
+import datetime
+import time
+
+import pandas
+import typer
+from loguru import logger
+
+from tuttle.calendar import (
+    ICSCalendar,
+    _icloud_events_to_data,
+    extract_hashtag,
+    parse_pyicloud_datetime,
+)
+
+app = typer.Typer()
+
+
+def generate_ics(n_events: int) -> bytes:
+    """An .ics calendar with events in several time zones."""
+    time_zones = ["Europe/Berlin", "Europe/Lisbon", "America/New_York"]
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//tuttle//benchmark//EN"]
+    for i in range(n_events):
+        day = datetime.date(2022, 1, 1) + datetime.timedelta(days=i % 365)
+        time_zone = time_zones[i % len(time_zones)]
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{i}",
+            f"DTSTART;TZID={time_zone}:{day:%Y%m%d}T090000",
+            f"DTEND;TZID={time_zone}:{day:%Y%m%d}T{10 + i % 8:02d}0000",
+            f"SUMMARY:Work on #Project{i % 20}",
+            f"DESCRIPTION:Task {i}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines).encode("utf-8")
+
+
+def generate_icloud_events(n_events: int) -> pandas.DataFrame:
+    """Events in the format returned by the iCloud API."""
+    events = []
+    for i in range(n_events):
+        day = datetime.date(2022, 1, 1) + datetime.timedelta(days=i % 365)
+        hours = 1 + i % 8
+        events.append(
+            {
+                "startDate": [0, day.year, day.month, day.day, 9, 0, 540],
+                "endDate": [0, day.year, day.month, day.day, 9 + hours, 0, 0],
+                "title": f"Work on #Project{i % 20}",
+                "description": f"Task {i}",
+                "allDay": False,
+                "guid": f"event-{i}",
+                "duration": hours * 60,
+            }
+        )
+    return pandas.DataFrame(events)
+
+
+def ics_to_data_row_by_row(cal: ICSCalendar) -> pandas.DataFrame:
+    """The previous conversion: one Python object per event."""
+    event_data = pandas.DataFrame(
+        [
+            (
+                event.name,
+                event.description,
+                pandas.to_datetime(event.begin.datetime).tz_convert("CET"),
+                pandas.to_datetime(event.end.datetime).tz_convert("CET"),
+                event.all_day,
+            )
+            for event in cal.ical.events
+        ],
+        columns=["title", "description", "begin", "end", "all_day"],
+    )
+    event_data["duration"] = event_data["end"] - event_data["begin"]
+    event_data["tag"] = event_data["title"].apply(extract_hashtag)
+    return event_data.set_index("begin")
+
+
+def icloud_to_data_row_by_row(event_data: pandas.DataFrame) -> pandas.DataFrame:
+    """The previous conversion: one Python call per event and column."""
+    timetracking_data = pandas.DataFrame().assign(
+        **{
+            "begin": event_data["startDate"].apply(parse_pyicloud_datetime),
+            "end": event_data["endDate"].apply(parse_pyicloud_datetime),
+            "title": event_data["title"],
+            "tag": event_data["title"].apply(extract_hashtag),
+            "description": event_data["description"],
+            "all_day": event_data["allDay"],
+        }
+    )
+    timetracking_data["duration"] = event_data["duration"].apply(
+        lambda m: datetime.timedelta(minutes=m)
+    )
+    return timetracking_data.set_index("begin")
+
+
+def measure(label: str, function, *args) -> float:
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    logger.info(f"{label}: {len(result)} events in {seconds:.2f} s")
+    return seconds
+
+
+@app.command()
+def main(
+    n_events: int = 100000,
+    ics_reference: bool = typer.Option(
+        False,
+        help="Also time the ics library, which takes minutes already for 1000 events",
+    ),
+):
+    content = generate_ics(n_events)
+    vectorized = measure(
+        "ICS, streamed and vectorized",
+        lambda: ICSCalendar(name="Benchmark", content=content).to_data(),
+    )
+    if ics_reference:
+        reference = measure(
+            "ICS, ics library and row by row",
+            lambda: ics_to_data_row_by_row(
+                ICSCalendar(name="Benchmark", content=content)
+            ),
+        )
+        logger.info(f"ICS speedup: {reference / vectorized:.1f}x")
+
+    events = generate_icloud_events(n_events)
+    vectorized = measure("iCloud, vectorized", _icloud_events_to_data, events)
+    reference = measure("iCloud, row by row", icloud_to_data_row_by_row, events)
+    logger.info(f"iCloud speedup: {reference / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    app()
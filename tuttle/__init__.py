@@ -15,6 +15,7 @@ from . import (
     model,
     tax,
     timetracking,
+    timetracking_store,
     dataviz,
     time,
     rendering,
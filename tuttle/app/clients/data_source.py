@@ -1,5 +1,6 @@
 from typing import List, Optional, Type, Union
 
+from ..core import loading_profiles
 from ..core.abstractions import SQLModelDataSourceMixin
 from ..core.intent_result import IntentResult
 
@@ -23,7 +24,7 @@ class ClientDataSource(SQLModelDataSourceMixin):
                 exception : Exception if an exception occurs
         """
         try:
-            clients = self.query(Client)
+            clients = self.query(Client, profile=loading_profiles.LIST)
             return IntentResult(was_intent_successful=True, data=clients)
         except Exception as e:
             return IntentResult(
@@ -1,5 +1,6 @@
 from typing import List, Union
 
+from ..core import loading_profiles
 from ..core.abstractions import SQLModelDataSourceMixin
 from ..core.intent_result import IntentResult
 from loguru import logger
@@ -48,7 +49,7 @@ class ContactDataSource(SQLModelDataSourceMixin):
                 exception : Exception if an exception occurs
         """
         try:
-            contacts = self.query(Contact)
+            contacts = self.query(Contact, profile=loading_profiles.LIST)
             return IntentResult(
                 was_intent_successful=True,
                 data=contacts,
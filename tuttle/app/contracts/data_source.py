@@ -2,7 +2,8 @@ from typing import List, Optional, Union
 
 import datetime
 
-from ..core.abstractions import SQLModelDataSourceMixin
+from ..core import loading_profiles
+from ..core.abstractions import DEFAULT_PAGE_SIZE, SQLModelDataSourceMixin
 from ..core.intent_result import IntentResult
 
 from ...model import Client, Contract
@@ -26,7 +27,7 @@ class ContractDataSource(SQLModelDataSourceMixin):
                 exception : Exception if an exception occurs
         """
         try:
-            contracts = self.query(Contract)
+            contracts = self.query(Contract, profile=loading_profiles.LIST)
             return IntentResult(was_intent_successful=True, data=contracts)
         except Exception as e:
             return IntentResult(
@@ -35,6 +36,41 @@ class ContractDataSource(SQLModelDataSourceMixin):
                 exception=e,
             )
 
+    def get_contracts_page(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> IntentResult[List[Contract]]:
+        """Fetches one page of contracts, most recent start date first
+
+        Args:
+            after_id : id of the last contract of the previous page, None for the first page
+            limit : maximum number of contracts in the page
+
+        Returns:
+            IntentResult:
+                was_intent_successful : bool
+                data :  list[Contract] if was_intent_successful else None
+                log_message  : str  if an error or exception occurs
+                exception : Exception if an exception occurs
+        """
+        try:
+            contracts = self.query_page(
+                Contract,
+                after_id=after_id,
+                limit=limit,
+                order_by="start_date",
+                descending=True,
+                profile=loading_profiles.LIST,
+            )
+            return IntentResult(was_intent_successful=True, data=contracts)
+        except Exception as e:
+            return IntentResult(
+                was_intent_successful=False,
+                log_message=f"An exception was raised @ContractDataSource.get_contracts_page {e.__class__.__name__}",
+                exception=e,
+            )
+
     def get_contract_by_id(self, contract_id) -> IntentResult[Union[Contract, None]]:
         """Fetches a contract with the contract id if one exists
 
@@ -4,7 +4,7 @@ import datetime
 
 from ..clients.intent import ClientsIntent
 from ..contacts.intent import ContactsIntent
-from ..core.abstractions import ClientStorage, Intent
+from ..core.abstractions import DEFAULT_PAGE_SIZE, ClientStorage, Intent
 from ..core.intent_result import IntentResult
 from ..preferences.intent import PreferencesIntent
 from ..preferences.model import PreferencesStorageKeys
@@ -172,6 +172,24 @@ class ContractsIntent:
             result.log_message_if_any()
             return {}
 
+    def get_contracts_page_as_map(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Mapping[int, Contract]:
+        """Get one page of contracts as a map of contract_id to contract object, most recent first
+
+        Pass the last key of a page as after_id to get the next page.
+        """
+        result = self._data_source.get_contracts_page(after_id=after_id, limit=limit)
+        if result.was_intent_successful:
+            contracts = result.data
+            contracts_map = {contract.id: contract for contract in contracts}
+            return contracts_map
+        else:
+            result.log_message_if_any()
+            return {}
+
     def get_completed_contracts(self) -> Mapping[int, Contract]:
         """Retrieves all completed contracts as a map"""
         _all_contracts = self.get_all_contracts_as_map()
@@ -1,4 +1,4 @@
-from typing import Any, Callable, List, Optional, Type
+from typing import Any, Callable, Dict, Iterator, List, Optional, Type
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -7,11 +7,14 @@ import functools
 
 from flet import AlertDialog, file_picker
 
+import sqlalchemy
 import sqlmodel
-from sqlmodel import pool
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from loguru import logger
 
+from .db_engine import get_engine
+from .loading_profiles import get_loader_options
 from .utils import AUTO_SCROLL, START_ALIGNMENT, AlertDialogControls
 
 
@@ -175,21 +178,19 @@ class DialogHandler(ABC):
             self.close_dialog()
 
 
+# number of rows a list screen loads at a time
+DEFAULT_PAGE_SIZE = 50
+
+
 class SQLModelDataSourceMixin:
     """Implements common methods for data sources that interact with SQLModel"""
 
     def __init__(
         self,
     ):
-        db_path = Path.home() / ".tuttle" / "tuttle.db"
-        db_path = f"sqlite:///{db_path}"
-        logger.debug(f"Creating {self.__class__.__name__} with db_path: {db_path}")
-        self.db_engine = sqlmodel.create_engine(
-            db_path,
-            echo=False,
-            connect_args={"check_same_thread": False},
-            poolclass=pool.StaticPool,
-        )
+        logger.debug(f"Creating {self.__class__.__name__}")
+        # all data sources share one engine and connection pool per database
+        self.db_engine = get_engine()
 
     def create_session(self):
         return sqlmodel.Session(
@@ -197,11 +198,22 @@ class SQLModelDataSourceMixin:
             expire_on_commit=False,
         )
 
-    def query(self, entity_type: Type[sqlmodel.SQLModel]) -> List:
-        """Queries the database for all instances of the given entity type"""
-        logger.debug(f"querying {entity_type}")
+    def query(
+        self,
+        entity_type: Type[sqlmodel.SQLModel],
+        profile: Optional[str] = None,
+    ) -> List:
+        """Queries the database for all instances of the given entity type
+
+        The optional loading profile (see loading_profiles) selects which relationships are loaded along.
+        """
+        logger.debug(f"querying {entity_type} with loading profile {profile}")
         with self.create_session() as session:
-            entities = session.exec(sqlmodel.select(entity_type)).all()
+            entities = session.exec(
+                sqlmodel.select(entity_type).options(
+                    *get_loader_options(entity_type, profile)
+                )
+            ).all()
         if len(entities) == 0:
             logger.warning(f"No instances of {entity_type} found")
         else:
@@ -212,12 +224,15 @@ class SQLModelDataSourceMixin:
         self,
         entity_type: Type[sqlmodel.SQLModel],
         entity_id: int,
+        profile: Optional[str] = None,
     ) -> Optional[sqlmodel.SQLModel]:
         """Queries the database for an instance of the given entity type with the given id"""
         logger.debug(f"querying {entity_type} by id={entity_id}")
         with self.create_session() as session:
             entity = session.exec(
-                sqlmodel.select(entity_type).where(entity_type.id == entity_id)
+                sqlmodel.select(entity_type)
+                .where(entity_type.id == entity_id)
+                .options(*get_loader_options(entity_type, profile))
             ).one()
         if entity is None:
             logger.warning(f"No instance of {entity_type} found with id={entity_id}")
@@ -230,14 +245,15 @@ class SQLModelDataSourceMixin:
         entity_type: Type[sqlmodel.SQLModel],
         field_name: str,
         field_value: Any,
+        profile: Optional[str] = None,
     ) -> List:
         """Queries the database for all instances of the given entity type that have the given field value"""
         logger.debug(f"querying {entity_type} by {field_name}={field_value}")
         with self.create_session() as session:
             entities = session.exec(
-                sqlmodel.select(entity_type).where(
-                    getattr(entity_type, field_name) == field_value
-                )
+                sqlmodel.select(entity_type)
+                .where(getattr(entity_type, field_name) == field_value)
+                .options(*get_loader_options(entity_type, profile))
             ).all()
         if len(entities) == 0:
             logger.warning(f"No instances of {entity_type} found")
@@ -245,6 +261,113 @@ class SQLModelDataSourceMixin:
             logger.info(f"Found {len(entities)} instances of {entity_type}")
         return entities
 
+    def query_page(
+        self,
+        entity_type: Type[sqlmodel.SQLModel],
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        order_by: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        descending: bool = False,
+        profile: Optional[str] = None,
+    ) -> List:
+        """Queries one page of instances of the given entity type using keyset pagination
+
+        Args:
+            entity_type: the queried entity type
+            after_id: id of the last instance of the previous page, None for the first page
+            limit: maximum number of instances in the page
+            order_by: name of a non-null field to order by, ties are broken by id. Orders by id if None.
+            filters: field names and values the instances must have
+            descending: whether to order descending
+            profile: loading profile (see loading_profiles)
+
+        Returns:
+            List: the page, pass the id of its last instance as after_id to get the next page
+        """
+        logger.debug(
+            f"querying page of {entity_type} after id={after_id}, limit={limit}, order_by={order_by}"
+        )
+        id_column = entity_type.id
+        statement = sqlmodel.select(entity_type)
+        if filters:
+            for field_name, field_value in filters.items():
+                statement = statement.where(
+                    getattr(entity_type, field_name) == field_value
+                )
+        if order_by is None or order_by == "id":
+            order_columns = [id_column]
+            if after_id is not None:
+                if descending:
+                    statement = statement.where(id_column < after_id)
+                else:
+                    statement = statement.where(id_column > after_id)
+        else:
+            order_column = getattr(entity_type, order_by)
+            order_columns = [order_column, id_column]
+            if after_id is not None:
+                # continue after the position of the last row of the previous page
+                after_value = (
+                    sqlmodel.select(order_column)
+                    .where(id_column == after_id)
+                    .scalar_subquery()
+                )
+                if descending:
+                    keyset = sqlmodel.or_(
+                        order_column < after_value,
+                        sqlmodel.and_(
+                            order_column == after_value, id_column < after_id
+                        ),
+                    )
+                else:
+                    keyset = sqlmodel.or_(
+                        order_column > after_value,
+                        sqlmodel.and_(
+                            order_column == after_value, id_column > after_id
+                        ),
+                    )
+                statement = statement.where(keyset)
+        if descending:
+            order_columns = [column.desc() for column in order_columns]
+        statement = (
+            statement.order_by(*order_columns)
+            .limit(limit)
+            .options(*get_loader_options(entity_type, profile))
+        )
+        with self.create_session() as session:
+            entities = session.exec(statement).all()
+        logger.debug(f"Found {len(entities)} instances of {entity_type}")
+        return entities
+
+    def query_iter(
+        self,
+        entity_type: Type[sqlmodel.SQLModel],
+        batch_size: int = 500,
+        order_by: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        descending: bool = False,
+        profile: Optional[str] = None,
+    ) -> Iterator[sqlmodel.SQLModel]:
+        """Iterates over all instances of the given entity type, fetching them page by page
+
+        Takes the same arguments as query_page. At most batch_size instances are held in memory at a time.
+        """
+        after_id = None
+        while True:
+            page = self.query_page(
+                entity_type,
+                after_id=after_id,
+                limit=batch_size,
+                order_by=order_by,
+                filters=filters,
+                descending=descending,
+                profile=profile,
+            )
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_id = page[-1].id
+
     def query_the_only(self, entity_type: Type[sqlmodel.SQLModel]) -> sqlmodel.SQLModel:
         """Queries the database for the only instance of the given entity type. Raises an error if there are more than one"""
         entities = self.query(entity_type)
@@ -263,6 +386,92 @@ class SQLModelDataSourceMixin:
             session.commit()
             session.refresh(entity)
 
+    def store_many(
+        self,
+        entities: List[sqlmodel.SQLModel],
+        session: Optional[sqlmodel.Session] = None,
+    ) -> List[int]:
+        """Stores many entities of the same type in a single transaction
+
+        Entities without an id are inserted, entities with an id are inserted or updated,
+        each group with a single executemany. Only column values are written: related entities
+        are not cascaded and must be referenced by their foreign key columns.
+        Generated ids are set on the entities without refreshing them.
+        On databases other than SQLite, new entities are inserted one at a time to get their ids,
+        and entities with an id are only updated.
+
+        Args:
+            entities: the entities to store
+            session: a session to write in as part of its transaction, which the caller commits.
+                By default the entities are written and committed in a session of their own.
+
+        Returns:
+            List[int]: the ids of the entities, in order
+        """
+        if session is None:
+            with self.create_session() as session:
+                ids = self.store_many(entities, session=session)
+                session.commit()
+            return ids
+        if len(entities) == 0:
+            return []
+        entity_type = type(entities[0])
+        table = entity_type.__table__
+        logger.debug(f"storing {len(entities)} instances of {entity_type}")
+        new_entities = [entity for entity in entities if entity.id is None]
+        existing_entities = [entity for entity in entities if entity.id is not None]
+        is_sqlite = session.get_bind().dialect.name == "sqlite"
+
+        def as_row(entity):
+            return {
+                column.name: getattr(entity, column.name) for column in table.columns
+            }
+
+        if new_entities and is_sqlite:
+            # inserting the first row takes the write lock, so the ids
+            # following the generated one remain free until commit
+            first_row = as_row(new_entities[0])
+            del first_row["id"]
+            result = session.execute(sqlalchemy.insert(table).values(first_row))
+            first_id = result.inserted_primary_key[0]
+            for offset, entity in enumerate(new_entities):
+                entity.id = first_id + offset
+            if len(new_entities) > 1:
+                session.execute(
+                    sqlalchemy.insert(table),
+                    [as_row(entity) for entity in new_entities[1:]],
+                )
+        elif new_entities:
+            # generated ids are not guaranteed to be consecutive
+            for entity in new_entities:
+                row = as_row(entity)
+                del row["id"]
+                result = session.execute(sqlalchemy.insert(table).values(row))
+                entity.id = result.inserted_primary_key[0]
+        if existing_entities and is_sqlite:
+            upsert = sqlite_insert(table)
+            upsert = upsert.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={
+                    column.name: upsert.excluded[column.name]
+                    for column in table.columns
+                    if not column.primary_key
+                },
+            )
+            session.execute(upsert, [as_row(entity) for entity in existing_entities])
+        elif existing_entities:
+            # the SET clause is made of the columns in the rows
+            update = sqlalchemy.update(table).where(
+                table.c.id == sqlalchemy.bindparam("_id")
+            )
+            rows = []
+            for entity in existing_entities:
+                row = as_row(entity)
+                row["_id"] = row.pop("id")
+                rows.append(row)
+            session.execute(update, rows)
+        return [entity.id for entity in entities]
+
     def delete_by_id(self, entity_type: Type[sqlmodel.SQLModel], entity_id: int):
         """Deletes the entity of the given type with the given id from the database"""
         logger.debug(f"deleting {entity_type} with id={entity_id}")
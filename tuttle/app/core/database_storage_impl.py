@@ -1,13 +1,22 @@
-from typing import Callable
+from typing import Callable, Set
 
 from pathlib import Path
 
+import sqlalchemy
 import sqlmodel
 from loguru import logger
+from sqlalchemy.schema import CreateColumn
 
-from ... import demo
+from ... import demo, money
+from ...model import Invoice
+from ..invoicing.data_source import InvoicingDataSource
 
 from .abstractions import DatabaseStorage
+from .db_engine import dispose_engine, get_db_url, get_engine
+
+# version of the database schema, kept in the user_version of the database file
+# 1: amounts of money stored as integer minor units, rates as basis points
+SCHEMA_VERSION = 1
 
 
 class DatabaseStorageImpl(DatabaseStorage):
@@ -18,32 +27,125 @@ class DatabaseStorageImpl(DatabaseStorage):
         super().__init__()
         self.app_dir = self.ensure_app_dir()
         self.db_path = self.app_dir / "tuttle.db"
+        self.db_url = get_db_url(self.db_path)
         self.store_demo_dataframe_callback = store_demo_timetracking_dataframe
         self.debug_mode = debug_mode
 
     def create_model(self):
         logger.info("Creating database model")
         sqlmodel.SQLModel.metadata.create_all(self.db_engine, checkfirst=True)
+        with self.db_engine.begin() as connection:
+            self._set_schema_version(connection, SCHEMA_VERSION)
+
+    @staticmethod
+    def _get_schema_version(connection) -> int:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+    @staticmethod
+    def _set_schema_version(connection, version: int):
+        connection.exec_driver_sql(f"PRAGMA user_version = {version}")
 
     def ensure_database(self):
         if not self.db_path.exists():
-            self.db_engine = sqlmodel.create_engine(
-                f"sqlite:///{self.db_path}", echo=True
-            )
+            self.db_engine = get_engine(self.db_url, echo=self.debug_mode)
             self.create_model()
         else:
             logger.info("Database exists, skipping creation")
+            self.db_engine = get_engine(self.db_url, echo=self.debug_mode)
+            self.upgrade_model()
+
+    def upgrade_model(self):
+        """Brings a database created by an earlier version up to date.
+
+        Adds the tables, columns and indexes introduced since, and converts the
+        stored data.
+        """
+        inspector = sqlalchemy.inspect(self.db_engine)
+        existing_tables = set(inspector.get_table_names())
+        existing_columns = {
+            f"{table_name}.{column['name']}"
+            for table_name in existing_tables
+            for column in inspector.get_columns(table_name)
+        }
+        with self.db_engine.connect() as connection:
+            schema_version = self._get_schema_version(connection)
+        self.create_model()
+        with self.db_engine.begin() as connection:
+            for table in sqlmodel.SQLModel.metadata.sorted_tables:
+                for column in table.columns:
+                    if f"{table.name}.{column.name}" in existing_columns:
+                        continue
+                    if table.name not in existing_tables:
+                        # created along with its columns
+                        continue
+                    logger.info(f"Adding column {table.name}.{column.name}")
+                    column_definition = CreateColumn(column).compile(
+                        dialect=self.db_engine.dialect
+                    )
+                    connection.execute(
+                        sqlalchemy.text(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column_definition}"
+                        )
+                    )
+                # create_all only creates the indexes of new tables
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+            if schema_version < 1:
+                self._convert_money_to_integers(connection, existing_columns)
+        if (
+            f"{Invoice.__tablename__}.total_amount" not in existing_columns
+            or schema_version < 1
+        ):
+            InvoicingDataSource().update_invoice_totals()
+
+    @staticmethod
+    def _convert_money_to_integers(connection, existing_columns: Set[str]):
+        """Converts amounts of money stored as decimals to minor units, and rates to basis points."""
+        for table in sqlmodel.SQLModel.metadata.sorted_tables:
+            for column in table.columns:
+                if isinstance(column.type, money.MinorUnits):
+                    convert = money.to_minor_units
+                elif isinstance(column.type, money.BasisPoints):
+                    convert = money.to_basis_points
+                else:
+                    continue
+                if f"{table.name}.{column.name}" not in existing_columns:
+                    continue
+                logger.info(f"Converting column {table.name}.{column.name}")
+                # converted in Python, so that the stored decimals are rounded like new values
+                key_names = [key.name for key in table.primary_key.columns]
+                rows = connection.execute(
+                    sqlalchemy.text(
+                        f"SELECT {', '.join(key_names)}, {column.name} "
+                        f"FROM {table.name} WHERE {column.name} IS NOT NULL"
+                    )
+                ).all()
+                if not rows:
+                    continue
+                key_condition = " AND ".join(f"{name} = :{name}" for name in key_names)
+                connection.execute(
+                    sqlalchemy.text(
+                        f"UPDATE {table.name} SET {column.name} = :_value "
+                        f"WHERE {key_condition}"
+                    ),
+                    [
+                        dict(zip(key_names, row[:-1]), _value=convert(row[-1]))
+                        for row in rows
+                    ],
+                )
 
     def reset_database(self):
         logger.info("Clearing database")
+        # release pooled connections before the files are removed
+        dispose_engine(self.db_url)
         try:
             self.db_path.unlink()
         except FileNotFoundError:
             logger.info("Database file not found, skipping delete")
-        self.db_engine = sqlmodel.create_engine(
-            f"sqlite:///{self.db_path}",
-            echo=self.debug_mode,
-        )
+        # write-ahead log and shared memory index of the database
+        for suffix in ("-wal", "-shm"):
+            self.db_path.with_name(self.db_path.name + suffix).unlink(missing_ok=True)
+        self.db_engine = get_engine(self.db_url, echo=self.debug_mode)
         self.create_model()
 
     def install_demo_data(
@@ -0,0 +1,102 @@
+"""Process-wide registry of database engines."""
+
+from typing import Dict, Optional
+
+import threading
+from pathlib import Path
+
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+from sqlalchemy import pool
+
+# applied to every new SQLite connection of a registered engine
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,  # bytes
+    "cache_size": -64 * 1024,  # negative values are in KiB
+}
+
+_engines: Dict[str, sqlalchemy.engine.Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_default_db_path() -> Path:
+    """Path to the database file of the app."""
+    return Path.home() / ".tuttle" / "tuttle.db"
+
+
+def get_db_url(db_path: Optional[Path] = None) -> str:
+    """Database URL for a database file, the app database by default."""
+    if db_path is None:
+        db_path = get_default_db_path()
+    return f"sqlite:///{db_path}"
+
+
+def _is_in_memory(db_url: str) -> bool:
+    return db_url in ("sqlite://", "sqlite:///", "sqlite:///:memory:")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure a freshly opened SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+def _create_engine(db_url: str, echo: bool) -> sqlalchemy.engine.Engine:
+    if not db_url.startswith("sqlite"):
+        return sqlmodel.create_engine(db_url, echo=echo)
+    if _is_in_memory(db_url):
+        # an in-memory database lives only as long as its single connection
+        poolclass = pool.StaticPool
+    else:
+        poolclass = pool.QueuePool
+    engine = sqlmodel.create_engine(
+        db_url,
+        echo=echo,
+        connect_args={"check_same_thread": False},
+        poolclass=poolclass,
+    )
+    sqlalchemy.event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def get_engine(
+    db_url: Optional[str] = None,
+    echo: Optional[bool] = None,
+) -> sqlalchemy.engine.Engine:
+    """Get the shared engine for a database URL, creating it on first use.
+
+    All callers asking for the same URL share one engine and its connection pool.
+    If echo is given, SQL logging is switched on or off for the shared engine,
+    also when it already exists. Otherwise it is left as it is, off for a new engine.
+    """
+    if db_url is None:
+        db_url = get_db_url()
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            logger.debug(f"Creating database engine for {db_url}")
+            engine = _create_engine(db_url, echo=bool(echo))
+            _engines[db_url] = engine
+        elif echo is not None:
+            engine.echo = echo
+    return engine
+
+
+def dispose_engine(db_url: Optional[str] = None):
+    """Close all pooled connections of a registered engine.
+
+    The engine stays registered and opens new connections on next use,
+    e.g. after the database file has been deleted and recreated.
+    """
+    if db_url is None:
+        db_url = get_db_url()
+    with _engines_lock:
+        engine = _engines.get(db_url)
+    if engine is not None:
+        logger.debug(f"Disposing database engine for {db_url}")
+        engine.dispose()
@@ -0,0 +1,139 @@
+"""Named eager-loading profiles for querying the object model.
+
+A profile lists the relationship paths that are loaded together with an entity.
+Relationships outside of these paths are not loaded and raise on access,
+so that a query for a list screen does not pull in the whole object graph.
+"""
+
+from typing import Dict, List, Optional, Type
+
+import sqlmodel
+from sqlalchemy.orm import raiseload, selectinload
+
+from ...model import Client, Contact, Contract, Invoice, Project, Timesheet
+
+# Profile names
+LIST = "list"
+DETAIL = "detail"
+RENDER = "render"
+
+_ADDRESSED_CLIENT = "client.invoicing_contact.address"
+
+LOADING_PROFILES: Dict[Type[sqlmodel.SQLModel], Dict[str, List[str]]] = {
+    Invoice: {
+        # the list shows the totals stored with the invoices instead of their items
+        LIST: [
+            "contract.client.invoicing_contact",
+            "project",
+        ],
+        DETAIL: [
+            f"contract.{_ADDRESSED_CLIENT}",
+            "project",
+            "items",
+            "timesheets",
+        ],
+        RENDER: [
+            f"contract.{_ADDRESSED_CLIENT}",
+            "project",
+            "items",
+            "timesheets.items",
+            f"timesheets.project.contract.{_ADDRESSED_CLIENT}",
+        ],
+    },
+    Timesheet: {
+        LIST: [
+            "project",
+        ],
+        DETAIL: [
+            "project.contract.client",
+            "items",
+            "invoice",
+        ],
+        RENDER: [
+            f"project.contract.{_ADDRESSED_CLIENT}",
+            "items",
+        ],
+    },
+    Project: {
+        LIST: [
+            f"contract.{_ADDRESSED_CLIENT}",
+        ],
+        DETAIL: [
+            f"contract.{_ADDRESSED_CLIENT}",
+            "timesheets",
+            "invoices",
+        ],
+        # invoicing a project renders its client's invoicing address
+        RENDER: [
+            f"contract.{_ADDRESSED_CLIENT}",
+            "timesheets",
+        ],
+    },
+    Contract: {
+        LIST: [
+            _ADDRESSED_CLIENT,
+        ],
+        DETAIL: [
+            _ADDRESSED_CLIENT,
+            "projects",
+            "invoices",
+        ],
+    },
+    Client: {
+        LIST: [
+            "invoicing_contact.address",
+        ],
+        DETAIL: [
+            "invoicing_contact.address",
+            "contracts",
+        ],
+    },
+    Contact: {
+        LIST: [
+            "address",
+        ],
+        DETAIL: [
+            "address",
+            "invoicing_contact_of",
+        ],
+    },
+}
+
+
+def get_loader_options(
+    entity_type: Type[sqlmodel.SQLModel],
+    profile: Optional[str] = None,
+) -> List:
+    """Translate a loading profile into query options.
+
+    Args:
+        entity_type: the queried entity type
+        profile: name of a profile defined for the entity type, or None to use
+            the loading strategies declared on the model
+
+    Returns:
+        List: loader options to pass to Select.options
+    """
+    if profile is None:
+        return []
+    try:
+        paths = LOADING_PROFILES[entity_type][profile]
+    except KeyError:
+        raise ValueError(
+            f"No loading profile '{profile}' defined for {entity_type.__name__}"
+        )
+    options = [raiseload("*")]
+    for path in paths:
+        attributes = []
+        owner = entity_type
+        for attribute_name in path.split("."):
+            attribute = getattr(owner, attribute_name)
+            attributes.append(attribute)
+            owner = attribute.property.mapper.class_
+            # load the relationship, but none of the relationships of its target
+            loader = selectinload(attributes[0])
+            for nested_attribute in attributes[1:]:
+                loader = loader.selectinload(nested_attribute)
+            options.append(loader)
+            options.append(loader.raiseload("*"))
+    return options
@@ -1,19 +1,35 @@
-from typing import List, Optional, Type, Union
+from typing import Dict, List, Optional, Type, Union
 
+import contextlib
 import datetime
+from decimal import Decimal
 
 from loguru import logger
+import sqlalchemy
 import sqlmodel
+from sqlalchemy.orm.attributes import set_committed_value
 
-from ..core.abstractions import SQLModelDataSourceMixin
+from ..core import loading_profiles
+from ..core.abstractions import DEFAULT_PAGE_SIZE, SQLModelDataSourceMixin
 from ..core.intent_result import IntentResult
 
-from ...model import Invoice, Project, Timesheet
+from ... import money
+from ...model import (
+    INVOICE_NUMBER_SCOPE,
+    Invoice,
+    InvoiceItem,
+    InvoiceNumberSequence,
+    Project,
+    Timesheet,
+)
 
 
 class InvoicingDataSource(SQLModelDataSourceMixin):
     """Handles manipulation of the Invoice model in the database"""
 
+    # invoice numbers are counted per scope, the invoice date in this format
+    invoice_number_scope = INVOICE_NUMBER_SCOPE
+
     def __init__(self):
         super().__init__()
 
@@ -50,7 +66,7 @@ class InvoicingDataSource(SQLModelDataSourceMixin):
                 exception : Exception if an exception occurs
         """
         try:
-            invoices = self.query(Invoice)
+            invoices = self.query(Invoice, profile=loading_profiles.LIST)
             return IntentResult(
                 was_intent_successful=True,
                 data=invoices,
@@ -62,6 +78,41 @@ class InvoicingDataSource(SQLModelDataSourceMixin):
                 exception=ex,
             )
 
+    def get_invoices_page(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> IntentResult[List[Invoice]]:
+        """Fetches one page of invoices, most recent date first
+
+        Args:
+            after_id : id of the last invoice of the previous page, None for the first page
+            limit : maximum number of invoices in the page
+
+        Returns:
+            IntentResult:
+                was_intent_successful : bool
+                data :  list[Invoice] if was_intent_successful else None
+                log_message  : str  if an error or exception occurs
+                exception : Exception if an exception occurs
+        """
+        try:
+            invoices = self.query_page(
+                Invoice,
+                after_id=after_id,
+                limit=limit,
+                order_by="date",
+                descending=True,
+                profile=loading_profiles.LIST,
+            )
+            return IntentResult(was_intent_successful=True, data=invoices)
+        except Exception as e:
+            return IntentResult(
+                was_intent_successful=False,
+                log_message=f"An exception was raised @InvoicingDataSource.get_invoices_page {e.__class__.__name__}",
+                exception=e,
+            )
+
     def delete_invoice_by_id(self, invoice_id):
         """Deletes an invoice by id
 
@@ -78,9 +129,163 @@ class InvoicingDataSource(SQLModelDataSourceMixin):
         logger.info(f"Saving invoice {invoice}")
         self.store(invoice)
 
+    def save_new_invoices(self, invoices: List[Invoice]):
+        """Numbers and stores new invoices, with their timesheets, in a single transaction"""
+        logger.info(f"Saving {len(invoices)} new invoices")
+        with self.create_session() as session:
+            invoices_by_date = {}
+            for invoice in invoices:
+                invoices_by_date.setdefault(invoice.date, []).append(invoice)
+            for date, invoices_of_date in invoices_by_date.items():
+                numbers = self._allocate_invoice_numbers(
+                    session, date, len(invoices_of_date)
+                )
+                for invoice, number in zip(invoices_of_date, numbers):
+                    invoice.number = number
+            timesheets = [
+                timesheet for invoice in invoices for timesheet in invoice.timesheets
+            ]
+            with self._items_stored_in_bulk(session, timesheets):
+                session.add_all(invoices)
+                session.flush()
+            session.commit()
+
+    @contextlib.contextmanager
+    def _items_stored_in_bulk(
+        self, session: sqlmodel.Session, timesheets: List[Timesheet]
+    ):
+        """Writes the items of new timesheets with store_many, after the timesheets are flushed
+
+        A timesheet generated from a calendar can have thousands of items, which the unit
+        of work would insert one by one to get their ids.
+        """
+        items_of_timesheets = [
+            (timesheet, list(timesheet.items))
+            for timesheet in timesheets
+            if timesheet.id is None
+        ]
+        for timesheet, _ in items_of_timesheets:
+            # hide the items from the unit of work
+            set_committed_value(timesheet, "items", [])
+        try:
+            yield
+            for timesheet, items in items_of_timesheets:
+                for item in items:
+                    item.timesheet_id = timesheet.id
+            self.store_many(
+                [item for _, items in items_of_timesheets for item in items],
+                session=session,
+            )
+        finally:
+            for timesheet, items in items_of_timesheets:
+                set_committed_value(timesheet, "items", items)
+
+    def save_rendered_flags(self, invoices: List[Invoice]):
+        """Updates the rendered flags of stored invoices and their timesheets"""
+        timesheets = [
+            timesheet for invoice in invoices for timesheet in invoice.timesheets
+        ]
+        with self.create_session() as session:
+            for entities in (invoices, timesheets):
+                if not entities:
+                    continue
+                table = type(entities[0]).__table__
+                session.execute(
+                    sqlalchemy.update(table).where(
+                        table.c.id == sqlalchemy.bindparam("_id")
+                    ),
+                    [
+                        {"_id": entity.id, "rendered": entity.rendered}
+                        for entity in entities
+                    ],
+                )
+            session.commit()
+
+    def get_billable_projects(self) -> List[Project]:
+        """Get the active projects, with the timesheets already generated for them"""
+        projects = self.query(Project, profile=loading_profiles.RENDER)
+        return [project for project in projects if project.is_active()]
+
     def save_timesheet(self, timesheet: Timesheet):
-        """Creates or updates a timesheet"""
-        self.store(timesheet)
+        """Creates or updates a timesheet, writing the items of a new one in bulk"""
+        if timesheet.id is not None:
+            self.store(timesheet)
+            return
+        with self.create_session() as session:
+            with self._items_stored_in_bulk(session, [timesheet]):
+                session.add(timesheet)
+                session.flush()
+            session.commit()
+
+    def update_invoice_totals(self):
+        """Recomputes the stored totals of all invoices from their items, in SQL"""
+        invoice = Invoice.__table__
+        item = InvoiceItem.__table__
+        # the stored integers: amounts in minor units, rates in basis points
+        unit_price = sqlalchemy.type_coerce(item.c.unit_price, sqlalchemy.Integer)
+        VAT_rate = sqlalchemy.type_coerce(item.c.VAT_rate, sqlalchemy.Integer)
+        subtotal = (
+            sqlalchemy.select(
+                sqlalchemy.func.coalesce(
+                    sqlalchemy.func.sum(item.c.quantity * unit_price), 0
+                )
+            )
+            .where(item.c.invoice_id == invoice.c.id)
+            .scalar_subquery()
+        )
+        VAT_total = (
+            sqlalchemy.select(
+                # rounded like the totals computed in Python
+                money.divide_rounded_in_sql(
+                    sqlalchemy.func.coalesce(
+                        sqlalchemy.func.sum(item.c.quantity * unit_price * VAT_rate),
+                        0,
+                    ),
+                    money.BASIS_POINTS,
+                )
+            )
+            .where(item.c.invoice_id == invoice.c.id)
+            .scalar_subquery()
+        )
+        with self.create_session() as session:
+            session.execute(
+                sqlalchemy.update(invoice).values(
+                    subtotal_amount=subtotal,
+                    VAT_amount=VAT_total,
+                    total_amount=subtotal + VAT_total,
+                )
+            )
+            session.commit()
+
+    def get_invoice_totals(
+        self,
+        start_date: Optional[datetime.date] = None,
+        end_date: Optional[datetime.date] = None,
+    ) -> Dict[str, Decimal]:
+        """Sums up the stored totals of the invoices dated in a period, leaving out cancelled ones
+
+        Returns:
+            Dict[str, Decimal]: the number of invoices as count, and their sum, VAT_total and total
+        """
+        query = sqlalchemy.select(
+            sqlalchemy.func.count(Invoice.id).label("count"),
+            sqlalchemy.func.coalesce(
+                sqlalchemy.func.sum(Invoice.subtotal_amount), 0
+            ).label("sum"),
+            sqlalchemy.func.coalesce(sqlalchemy.func.sum(Invoice.VAT_amount), 0).label(
+                "VAT_total"
+            ),
+            sqlalchemy.func.coalesce(
+                sqlalchemy.func.sum(Invoice.total_amount), 0
+            ).label("total"),
+        ).where(Invoice.cancelled.isnot(True))
+        if start_date is not None:
+            query = query.where(Invoice.date >= start_date)
+        if end_date is not None:
+            query = query.where(Invoice.date <= end_date)
+        with self.create_session() as session:
+            totals = session.execute(query).one()
+        return dict(totals._mapping)
 
     def get_timesheet_for_invoice(self, invoice: Invoice) -> Timesheet:
         """Get the timesheet associated with an invoice
@@ -91,32 +296,43 @@ class InvoicingDataSource(SQLModelDataSourceMixin):
         Returns:
             Optional[Timesheet]: the timesheet associated with the invoice
         """
-        if not len(invoice.timesheets) > 0:
+        # invoices from list queries come without their timesheets loaded
+        timesheets = self.query_where(
+            Timesheet,
+            "invoice_id",
+            invoice.id,
+            profile=loading_profiles.LIST,
+        )
+        if not len(timesheets) > 0:
             raise ValueError(
                 f"invoice {invoice.id} has no timesheets associated with it"
             )
-        if len(invoice.timesheets) > 1:
+        if len(timesheets) > 1:
             raise ValueError(
-                f"invoice {invoice.id} has more than one timesheet associated with it: {invoice.timesheets}"
+                f"invoice {invoice.id} has more than one timesheet associated with it: {timesheets}"
             )
-        timesheet = invoice.timesheets[0]
+        timesheet = timesheets[0]
         return timesheet
 
-    def generate_invoice_number(self, date: datetime.date) -> str:
-        """Generate a new valid invoice number"""
-        # invoice number scheme: YYYY-MM-DD-XX
-        prefix = date.strftime("%Y-%m-%d")
+    def _allocate_invoice_numbers(
+        self,
+        session: sqlmodel.Session,
+        date: datetime.date,
+        count: int,
+    ) -> List[str]:
+        """Allocates consecutive invoice numbers in the scope of the date
+
+        See InvoiceNumberSequence.allocate.
+        """
+        scope = date.strftime(self.invoice_number_scope)
+        return InvoiceNumberSequence.allocate(session, scope, count)
 
-        # where XX is the number of invoices for the day
-        # if there are no invoices for the day, start at 1
-        # if there are invoices for the day, start at the last invoice number + 1
-        # count the number of invoices for the day
+    def reserve_invoice_numbers(self, date: datetime.date, count: int) -> List[str]:
+        """Reserves a range of consecutive invoice numbers in the scope of the date
+
+        The numbers are used up even if no invoices are saved with them.
+        """
         with self.create_session() as session:
-            invoices = session.exec(
-                sqlmodel.select(Invoice).where(Invoice.date == date)
-            ).all()
-            invoice_count = len(invoices)
-            if invoice_count == 0:
-                return f"{prefix}-01"
-            else:
-                return f"{prefix}-{invoice_count + 1}"
+            numbers = self._allocate_invoice_numbers(session, date, count)
+            session.commit()
+        return numbers
@@ -1,11 +1,11 @@
-from typing import Mapping, Optional, Type, Union
+from typing import Callable, List, Mapping, Optional, Type, Union
 
 import textwrap
 from datetime import date
 from pathlib import Path
 
 from ..auth.data_source import UserDataSource
-from ..core.abstractions import ClientStorage, Intent
+from ..core.abstractions import DEFAULT_PAGE_SIZE, ClientStorage, Intent
 from ..core.intent_result import IntentResult
 from loguru import logger
 from pandas import DataFrame
@@ -72,6 +72,26 @@ class InvoicingIntent(Intent):
             result.log_message_if_any()
             return {}
 
+    def get_invoices_page_as_map(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Mapping[int, Invoice]:
+        """Get one page of invoices as a map of invoice_id to invoice object, most recent first
+
+        Pass the last key of a page as after_id to get the next page.
+        """
+        result = self._invoicing_data_source.get_invoices_page(
+            after_id=after_id, limit=limit
+        )
+        if result.was_intent_successful:
+            invoices = result.data
+            invoices_map = {invoice.id: invoice for invoice in invoices}
+            return invoices_map
+        else:
+            result.log_message_if_any()
+            return {}
+
     def delete_invoice_by_id(self, invoice_id) -> IntentResult[None]:
         """Delete an invoice by id."""
         try:
@@ -97,8 +117,14 @@ class InvoicingIntent(Intent):
         logger.info(f"⚙️ Creating invoice for {project.title}...")
         user = self._user_data_source.get_user()
         try:
-            # get the time tracking data
-            timetracking_data = self._timetracking_data_source.get_data_frame()
+            # get the time tracking data of the period
+            timetracking_data = (
+                self._timetracking_data_source.get_data_frame_for_period(
+                    from_date,
+                    to_date,
+                    tag=project.tag,
+                )
+            )
             # generate timesheet
             timesheet: Timesheet = timetracking.generate_timesheet(
                 timetracking_data,
@@ -107,13 +133,9 @@ class InvoicingIntent(Intent):
                 to_date,
             )
 
-            invoice_number = self._invoicing_data_source.generate_invoice_number(
-                invoice_date
-            )
-
             invoice: Invoice = invoicing.generate_invoice(
                 date=invoice_date,
-                number=invoice_number,
+                number=None,
                 timesheets=[
                     timesheet,
                 ],
@@ -121,42 +143,15 @@ class InvoicingIntent(Intent):
                 project=project,
             )
 
-            if render:
-                # render timesheet
-                try:
-                    logger.info(f"⚙️ Rendering timesheet for {project.title}...")
-                    rendering.render_timesheet(
-                        user=user,
-                        timesheet=timesheet,
-                        out_dir=Path.home() / ".tuttle" / "Timesheets",
-                        only_final=True,
-                    )
-                    logger.info(f"✅ rendered timesheet for {project.title}")
-                except Exception as ex:
-                    logger.error(
-                        f"❌ Error rendering timesheet for {project.title}: {ex}"
-                    )
-                    logger.exception(ex)
-                # render invoice
-                try:
-                    logger.info(f"⚙️ Rendering invoice for {project.title}...")
-                    rendering.render_invoice(
-                        user=user,
-                        invoice=invoice,
-                        out_dir=Path.home() / ".tuttle" / "Invoices",
-                        only_final=True,
-                    )
-                    logger.info(f"✅ rendered invoice for {project.title}")
-                except Exception as ex:
-                    logger.error(f"❌ Error rendering invoice for {project.title}: {ex}")
-                    logger.exception(ex)
-
-            # save invoice and timesheet
+            # save invoice and timesheet, numbering the invoice in the same transaction
             timesheet.invoice = invoice
             assert timesheet.invoice is not None
             assert len(invoice.timesheets) == 1
-            # self._invoicing_data_source.save_timesheet(timesheet)
-            self._invoicing_data_source.save_invoice(invoice)
+            self._invoicing_data_source.save_new_invoices([invoice])
+
+            if render:
+                self._render_documents(user, invoice, timesheets=[timesheet])
+                self._invoicing_data_source.save_rendered_flags([invoice])
             return IntentResult(
                 was_intent_successful=True,
                 data=invoice,
@@ -177,6 +172,116 @@ class InvoicingIntent(Intent):
                 error_msg=error_message,
             )
 
+    def _render_documents(
+        self,
+        user: User,
+        invoice: Invoice,
+        timesheets: List[Timesheet],
+    ):
+        """Renders the timesheets and the invoice, logging rendering errors"""
+        project = invoice.project
+        for timesheet in timesheets:
+            try:
+                logger.info(f"⚙️ Rendering timesheet for {project.title}...")
+                rendering.render_timesheet(
+                    user=user,
+                    timesheet=timesheet,
+                    out_dir=Path.home() / ".tuttle" / "Timesheets",
+                    only_final=True,
+                )
+                logger.info(f"✅ rendered timesheet for {project.title}")
+            except Exception as ex:
+                logger.error(f"❌ Error rendering timesheet for {project.title}: {ex}")
+                logger.exception(ex)
+        try:
+            logger.info(f"⚙️ Rendering invoice for {project.title}...")
+            rendering.render_invoice(
+                user=user,
+                invoice=invoice,
+                out_dir=Path.home() / ".tuttle" / "Invoices",
+                only_final=True,
+            )
+            logger.info(f"✅ rendered invoice for {project.title}")
+        except Exception as ex:
+            logger.error(f"❌ Error rendering invoice for {project.title}: {ex}")
+            logger.exception(ex)
+
+    def _render_batch(
+        self,
+        invoices: List[Invoice],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        """Renders the invoices and their timesheets in parallel, logging rendering errors"""
+        user = self._user_data_source.get_user()
+        timesheets = [
+            timesheet for invoice in invoices for timesheet in invoice.timesheets
+        ]
+        futures = rendering.get_rendering_service().render_batch(
+            user=user,
+            invoices=invoices,
+            timesheets=timesheets,
+            invoice_dir=Path.home() / ".tuttle" / "Invoices",
+            timesheet_dir=Path.home() / ".tuttle" / "Timesheets",
+            on_progress=on_progress,
+            only_final=True,
+        )
+        for document, future in zip(invoices + timesheets, futures):
+            try:
+                future.result()
+            except Exception as ex:
+                logger.error(f"❌ Error rendering {document.prefix}: {ex}")
+                logger.exception(ex)
+        self._invoicing_data_source.save_rendered_flags(invoices)
+
+    def create_due_invoices(
+        self,
+        invoice_date: date,
+        render: bool = True,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> IntentResult[List[Invoice]]:
+        """Create the invoices of all active projects for their last complete billing period.
+
+        The time tracking data of all billing periods is loaded once, the invoices are
+        numbered and saved in one transaction, and their documents rendered in parallel.
+        on_progress is called with the number of rendered and of all documents.
+        """
+        logger.info(f"⚙️ Creating due invoices for {invoice_date}...")
+        try:
+            projects = self._invoicing_data_source.get_billable_projects()
+            if not projects:
+                return IntentResult(was_intent_successful=True, data=[])
+            periods = [
+                project.contract.billing_cycle.last_period(invoice_date)
+                for project in projects
+            ]
+            timetracking_data = (
+                self._timetracking_data_source.get_data_frame_for_period(
+                    min(period_start for (period_start, _) in periods),
+                    max(period_end for (_, period_end) in periods),
+                )
+            )
+            invoices = invoicing.generate_due_invoices(
+                timetracking_data,
+                projects,
+                date=invoice_date,
+            )
+            if not invoices:
+                return IntentResult(was_intent_successful=True, data=[])
+            self._invoicing_data_source.save_new_invoices(invoices)
+            if render:
+                self._render_batch(invoices, on_progress=on_progress)
+            logger.info(f"✅ created {len(invoices)} invoices")
+            return IntentResult(was_intent_successful=True, data=invoices)
+        except Exception as ex:
+            error_message = "Failed to create the due invoices. "
+            logger.error(error_message)
+            logger.exception(ex)
+            return IntentResult(
+                was_intent_successful=False,
+                error_msg=error_message,
+                exception=ex,
+            )
+
     def update_invoice(
         self,
         invoice: Invoice,
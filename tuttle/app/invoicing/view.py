@@ -1,5 +1,6 @@
 from typing import Callable, Optional
 
+import threading
 from datetime import datetime, timedelta
 
 from flet import (
@@ -144,6 +145,7 @@ class InvoicingListView(TView, UserControl):
         self.editor = None
         self.time_tracking_data: DataFrame = None
         self.user: User = None
+        self.creating_due_invoices = False
 
     def load_user_data(
         self,
@@ -327,6 +329,52 @@ class InvoicingListView(TView, UserControl):
         self.loading_indicator.visible = False
         self.update_self()
 
+    def on_create_due_invoices(self, e):
+        """Called when the user clicks on the button to create the due invoices"""
+        if self.is_user_missing_payment_info():
+            return  # can't create invoices without payment info
+        if self.creating_due_invoices:
+            return  # a batch is already being created
+        self.creating_due_invoices = True
+        self.loading_indicator.visible = True
+        self.update_self()
+        # rendering the batch takes a while, don't hold the event handler meanwhile
+        threading.Thread(target=self.create_due_invoices, daemon=True).start()
+
+    def create_due_invoices(self):
+        """Creates and renders the due invoices, runs in a background thread"""
+        try:
+            result: IntentResult = self.intent.create_due_invoices(
+                invoice_date=datetime.today().date(),
+                on_progress=self.on_rendering_progress,
+            )
+            if not result.was_intent_successful:
+                self.show_snack(result.error_msg, True)
+            else:
+                for invoice in result.data:
+                    self.invoices_to_display[invoice.id] = invoice
+                self.no_invoices_control.visible = len(self.invoices_to_display) == 0
+                self.refresh_invoices()
+                self.show_snack(
+                    f"{len(result.data)} invoices have been created", False
+                )
+        finally:
+            self.creating_due_invoices = False
+            self.loading_indicator.value = None
+            self.loading_indicator.visible = False
+            self.update_self()
+
+    def on_rendering_progress(self, rendered: int, total: int):
+        """Shows the progress of rendering the documents of new invoices
+
+        Called from the thread collecting the rendered documents, so the
+        indicator is sent through the page, which serializes the updates.
+        """
+        self.loading_indicator.value = rendered / total
+        page = self.page
+        if page is not None:
+            page.update(self.loading_indicator)
+
     def toggle_paid_status(self, invoice: Invoice):
         """toggle the paid status of the invoice"""
         result: IntentResult = self.intent.toggle_invoice_paid_status(invoice)
@@ -397,6 +445,11 @@ class InvoicingListView(TView, UserControl):
                     col={"xs": 12},
                     controls=[
                         views.THeading(title="Invoicing", size=fonts.HEADLINE_4_SIZE),
+                        views.TSecondaryButton(
+                            label="Create due invoices",
+                            icon=icons.PLAYLIST_ADD,
+                            on_click=self.on_create_due_invoices,
+                        ),
                         self.loading_indicator,
                         self.no_invoices_control,
                     ],
@@ -56,6 +56,8 @@ class PreferencesIntent(Intent):
                 preferences.cloud_acc_provider = preference_item_result.data
             elif item.value == PreferencesStorageKeys.language_key.value:
                 preferences.language = preference_item_result.data
+            elif item.value == PreferencesStorageKeys.time_zone_key.value:
+                preferences.time_zone = preference_item_result.data
 
         return IntentResult(
             was_intent_successful=True,
@@ -82,6 +84,10 @@ class PreferencesIntent(Intent):
                 PreferencesStorageKeys.language_key,
                 preferences.language,
             )
+            self.set_preference_key_value_pair(
+                PreferencesStorageKeys.time_zone_key,
+                preferences.time_zone,
+            )
         except Exception as e:
             result = IntentResult(
                 was_intent_successful=False,
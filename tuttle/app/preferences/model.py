@@ -9,6 +9,7 @@ class Preferences:
     cloud_acc_provider: str = ""
     default_currency: str = ""
     language: str = ""
+    time_zone: str = ""
 
 
 class PreferencesStorageKeys(Enum):
@@ -19,6 +20,7 @@ class PreferencesStorageKeys(Enum):
     cloud_provider_key = "preferred_cloud_acc_provider"
     default_currency_key = "preferred_default_currency"
     language_key = "preferred_language"
+    time_zone_key = "preferred_time_zone"
 
     def __str__(self) -> str:
         return str(self.value)
@@ -2,6 +2,7 @@ from typing import Optional, Callable
 
 
 from loguru import logger
+import pytz
 
 from flet import (
     Column,
@@ -67,6 +68,11 @@ class PreferencesScreen(TView, UserControl):
             return
         self.preferences.default_currency = e.control.value
 
+    def on_time_zone_selected(self, e):
+        if not self.preferences:
+            return
+        self.preferences.time_zone = e.control.value
+
     def on_cloud_account_id_changed(self, e):
         if not self.preferences:
             return
@@ -85,6 +91,7 @@ class PreferencesScreen(TView, UserControl):
         self.cloud_account_id_control.value = self.preferences.cloud_acc_id
         self.currencies_control.update_value(self.preferences.default_currency)
         self.languages_control.update_value(self.preferences.language)
+        self.time_zones_control.update_value(self.preferences.time_zone)
 
     def on_theme_changed(self, e):
         if not self.preferences:
@@ -203,6 +210,12 @@ class PreferencesScreen(TView, UserControl):
                 "English",
             ],
         )
+        self.time_zones_control = views.TDropDown(
+            label="Time Zone",
+            hint="Time zone of your time tracking data",
+            on_change=self.on_time_zone_selected,
+            items=pytz.common_timezones,
+        )
 
         # a reset button for the app with a warning sign, warning color and a confirmation dialog
         self.reset_button = views.TDangerButton(
@@ -245,6 +258,7 @@ class PreferencesScreen(TView, UserControl):
                     [
                         self.languages_control,
                         self.currencies_control,
+                        self.time_zones_control,
                     ],
                 ),
             ],
@@ -1,6 +1,7 @@
-from typing import List,  Union
+from typing import List, Optional, Union
 
-from ..core.abstractions import SQLModelDataSourceMixin
+from ..core import loading_profiles
+from ..core.abstractions import DEFAULT_PAGE_SIZE, SQLModelDataSourceMixin
 from ..core.intent_result import IntentResult
 
 from ...model import  Project
@@ -25,7 +26,7 @@ class ProjectDataSource(SQLModelDataSourceMixin):
                 exception : Exception if an exception occurs
         """
         try:
-            projects = self.query(Project)
+            projects = self.query(Project, profile=loading_profiles.LIST)
             return IntentResult(was_intent_successful=True, data=projects)
         except Exception as e:
             return IntentResult(
@@ -34,6 +35,41 @@ class ProjectDataSource(SQLModelDataSourceMixin):
                 exception=e,
             )
 
+    def get_projects_page(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> IntentResult[List[Project]]:
+        """Fetches one page of projects, most recent start date first
+
+        Args:
+            after_id : id of the last project of the previous page, None for the first page
+            limit : maximum number of projects in the page
+
+        Returns:
+            IntentResult:
+                was_intent_successful : bool
+                data :  list[Project] if was_intent_successful else None
+                log_message  : str  if an error or exception occurs
+                exception : Exception if an exception occurs
+        """
+        try:
+            projects = self.query_page(
+                Project,
+                after_id=after_id,
+                limit=limit,
+                order_by="start_date",
+                descending=True,
+                profile=loading_profiles.LIST,
+            )
+            return IntentResult(was_intent_successful=True, data=projects)
+        except Exception as e:
+            return IntentResult(
+                was_intent_successful=False,
+                log_message=f"An exception was raised @ProjectDataSource.get_projects_page {e.__class__.__name__}",
+                exception=e,
+            )
+
     def save_project(
         self,
         project: Project,
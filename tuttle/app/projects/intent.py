@@ -1,13 +1,17 @@
-from typing import Mapping, Optional, Union
+from typing import List, Mapping, Optional, Union
 
 import datetime
 
+from pandas import DataFrame
+
 from ..clients.intent import ClientsIntent
 from ..contracts.intent import ContractsIntent
 from ..core.intent_result import IntentResult
-from ..core.abstractions import Intent
+from ..core.abstractions import DEFAULT_PAGE_SIZE, Intent
 
+from ... import timetracking
 from ...model import Client, Contract, Project
+from ..timetracking.data_source import TimeTrackingDataFrameSource
 
 from .data_source import ProjectDataSource
 
@@ -19,6 +23,7 @@ class ProjectsIntent(Intent):
         self,
     ):
         self._data_source = ProjectDataSource()
+        self._timetracking_data_source = TimeTrackingDataFrameSource()
         self._clients_intent = ClientsIntent()
         self._contracts_intent = ContractsIntent()
 
@@ -122,6 +127,24 @@ class ProjectsIntent(Intent):
             result.log_message_if_any()
             return {}
 
+    def get_projects_page_as_map(
+        self,
+        after_id: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Mapping[int, Project]:
+        """Get one page of projects as a map of project_id to project object, most recent first
+
+        Pass the last key of a page as after_id to get the next page.
+        """
+        result = self._data_source.get_projects_page(after_id=after_id, limit=limit)
+        if result.was_intent_successful:
+            projects = result.data
+            projects_map = {project.id: project for project in projects}
+            return projects_map
+        else:
+            result.log_message_if_any()
+            return {}
+
     def get_completed_projects_as_map(self) -> Mapping[int, Project]:
         """Get all completed projects as a map of project_id to project object"""
         _all_projects = self.get_all_projects_as_map()
@@ -154,6 +177,28 @@ class ProjectsIntent(Intent):
                 _upcoming_projects[key] = p
         return _upcoming_projects
 
+    def get_progress_of_projects(
+        self, projects: List[Project]
+    ) -> IntentResult[Optional[DataFrame]]:
+        """Get the time tracked on projects against the volume of their contracts
+
+        Returns:
+            IntentResult:
+                data : DataFrame indexed by project tag, see timetracking.progress_of_projects
+        """
+        try:
+            tracked_time = self._timetracking_data_source.get_tracked_time_by_tag()
+            return IntentResult(
+                was_intent_successful=True,
+                data=timetracking.progress_of_projects(projects, tracked_time),
+            )
+        except Exception as ex:
+            return IntentResult(
+                was_intent_successful=False,
+                log_message=f"An exception was raised @ProjectsIntent.get_progress_of_projects {ex.__class__.__name__}",
+                exception=ex,
+            )
+
     def delete_project_by_id(self, project_id: str) -> IntentResult[None]:
         """
         Delete the project by id
@@ -1,34 +1,100 @@
 from typing import Type, Union, Any, Optional
 
+import datetime
 from pathlib import Path
 
 from loguru import logger
 import icloudpy
 
 from ..core.abstractions import SQLModelDataSourceMixin
+from ..core.db_engine import get_engine
 from ..core.intent_result import IntentResult
 from pandas import DataFrame
 
-from ...calendar import ICSCalendar, ICloudCalendar, CloudCalendar
+from ...calendar import Calendar, ICSCalendar, ICloudCalendar, CloudCalendar
 from ...dev import singleton
+from ...timetracking_store import SyncResult, TimeTrackingStore
 from ...cloud import CloudConnector, CloudProvider
 from ... import timetracking
 
 
 @singleton
 class TimeTrackingDataFrameSource:
-    """Provides get or edit access to the data frame in memory"""
+    """Provides get or edit access to the time tracking data, persisted in the app database"""
 
     def __init__(self):
         super().__init__()
+        self.store = TimeTrackingStore(get_engine())
+        # complete time tracking data, loaded on first access
         self.data: Optional[DataFrame] = None
-
-    def get_data_frame(self) -> DataFrame:
+        # time tracked per tag, computed on first access
+        self.tracked_time: Optional[DataFrame] = None
+        # time tracked per day and tag, loaded on first access
+        self.rollup: Optional[DataFrame] = None
+        # revision of the stored data that the cached data belongs to
+        self.revision: Optional[str] = None
+
+    def _check_revision(self):
+        """Discards the cached data if the stored data was changed, e.g. by another source"""
+        revision = self.store.get_revision()
+        if revision != self.revision:
+            self.data = None
+            self.tracked_time = None
+            self.rollup = None
+            self.revision = revision
+
+    def get_data_frame(self) -> Optional[DataFrame]:
+        self._check_revision()
+        if self.data is None and self.store.count() > 0:
+            self.data = self.store.load()
         return self.data
 
+    def get_rollup(self) -> DataFrame:
+        """Time tracked per day and tag, cached until the stored data changes"""
+        self._check_revision()
+        if self.rollup is None:
+            self.rollup = self.store.load_rollup()
+        return self.rollup
+
+    def get_tracked_time_by_tag(self) -> DataFrame:
+        """Time tracked per tag, cached until the stored data changes"""
+        rollup = self.get_rollup()
+        if self.tracked_time is None:
+            self.tracked_time = rollup.groupby("tag").agg(
+                {"duration": "sum", "all_day_count": "sum"}
+            )
+        return self.tracked_time
+
+    def get_data_frame_for_period(
+        self,
+        start: datetime.date,
+        end: datetime.date,
+        tag: Optional[str] = None,
+    ) -> DataFrame:
+        """Loads only the time tracking data of a period, optionally only for one tag"""
+        return self.store.load(start=start, end=end, tag=tag)
+
     def store_data_frame(self, data: DataFrame):
+        """Replaces the stored time tracking data"""
+        if data is self.data:
+            # already stored, e.g. the result of a calendar sync
+            return
+        self.store.replace(data)
+        self._check_revision()
         self.data = data
 
+    def append_data_frame(self, data: DataFrame):
+        """Adds to the stored time tracking data"""
+        self.store.append(data)
+        self.data = None
+
+    def sync_calendar(self, calendar: Calendar) -> SyncResult:
+        """Writes only the changed events of a calendar to the stored time tracking data"""
+        result = timetracking.sync_calendar(calendar, self.store)
+        if result.added or result.updated or result.deleted:
+            self.data = None
+        return result
+
 
 class TimeTrackingSpreadsheetSource:
     """Processes spreadsheets"""
@@ -49,9 +115,10 @@ class TimeTrackingSpreadsheetSource:
             DataFrame: time tracking data
         """
         logger.info(f"Loading time tracking data from {file_path}...")
+        preset = timetracking.detect_spreadsheet_preset(file_path)
         timetracking_data: DataFrame = timetracking.import_from_spreadsheet(
             path=file_path,
-            preset=timetracking.TogglPreset,
+            preset=preset,
         )
         return timetracking_data
 
@@ -62,27 +129,40 @@ class TimeTrackingFileCalendarSource:
     def __init__(self) -> None:
         super().__init__()
 
-    def load_data(
+    def load_calendar(
         self,
         ics_file_path,
-    ) -> DataFrame:
-        """loads time tracking data from a .ics file
+        time_zone: Optional[str] = None,
+    ) -> ICSCalendar:
+        """loads a calendar from a .ics file
 
         Args:
-            ics_file_path : path to an uploaded ics or spreadsheet file
+            ics_file_path : path to an uploaded ics file
+            time_zone : the user's time zone, events are converted to it
 
         Returns:
-            IntentResult:
-                was_intent_successful : bool
-                data : Calendar if was_intent_successful else None
-                log_message  : str  if an error or exception occurs
-                exception : Exception if an exception occurs
+            ICSCalendar: the calendar, named after the file
         """
         file_calendar: ICSCalendar = ICSCalendar(
             name=ics_file_path.name,
             path=ics_file_path,
+            time_zone=time_zone,
         )
-        calendar_data: DataFrame = file_calendar.to_data()
+        return file_calendar
+
+    def load_data(
+        self,
+        ics_file_path,
+    ) -> DataFrame:
+        """loads time tracking data from a .ics file
+
+        Args:
+            ics_file_path : path to an uploaded ics or spreadsheet file
+
+        Returns:
+            DataFrame: time tracking data
+        """
+        calendar_data: DataFrame = self.load_calendar(ics_file_path).to_data()
         return calendar_data
 
 
@@ -92,12 +172,13 @@ class TimeTrackingCloudCalendarSource:
     def __init__(self):
         super().__init__()
 
-    def load_data(
+    def load_calendar(
         self,
         calendar_name: str,
         cloud_connector: CloudConnector,
-    ) -> DataFrame:
-        """Loads data from a cloud calendar"""
+        time_zone: Optional[str] = None,
+    ) -> CloudCalendar:
+        """Connects to a cloud calendar, converting events to the user's time zone"""
         calendar = None
         if cloud_connector.provider == CloudProvider.ICloud.value:
             icloud_connector: icloudpy.ICloudPyService = (
@@ -106,10 +187,22 @@ class TimeTrackingCloudCalendarSource:
             calendar: CloudCalendar = ICloudCalendar(
                 name=calendar_name,
                 icloud_connector=icloud_connector,
+                time_zone=time_zone,
             )
         else:
             raise NotImplementedError
+        return calendar
 
+    def load_data(
+        self,
+        calendar_name: str,
+        cloud_connector: CloudConnector,
+    ) -> DataFrame:
+        """Loads data from a cloud calendar"""
+        calendar = self.load_calendar(
+            calendar_name=calendar_name,
+            cloud_connector=cloud_connector,
+        )
         calendar_data: DataFrame = calendar.to_data()
         return calendar_data
 
@@ -1,4 +1,4 @@
-from typing import Optional, Type, Union
+from typing import List, Optional, Type, Union
 
 from pathlib import Path
 
@@ -19,6 +19,8 @@ from .data_source import (
 )
 from ...cloud import CloudConnector, CloudProvider
 from ...calendar import Calendar
+from ...model import Project
+from ... import timetracking
 
 
 class TimeTrackingIntent(Intent):
@@ -55,6 +57,15 @@ class TimeTrackingIntent(Intent):
             was_intent_successful=True, data=[provider_result.data, acc_result.data]
         )
 
+    def _get_preferred_time_zone(self) -> Optional[str]:
+        """The user's time zone, None if not set"""
+        result = self._preferences_intent.get_preference_by_key(
+            PreferencesStorageKeys.time_zone_key
+        )
+        if not result.was_intent_successful or not result.data:
+            return None
+        return result.data
+
     def process_timetracking_file(self, file_path: Path) -> IntentResult[DataFrame]:
         """processes a time tracking spreadsheet or ics file in the uploads folder
 
@@ -67,17 +78,30 @@ class TimeTrackingIntent(Intent):
         # check the file extension. file_path is a Path object
         is_calendar = file_path.suffix == ".ics"
         if is_calendar:
-            timetracking_data: DataFrame = self._file_calendar_source.load_data(
+            calendar = self._file_calendar_source.load_calendar(
                 ics_file_path=file_path,
+                time_zone=self._get_preferred_time_zone(),
+            )
+            self._timetracking_data_frame_source.sync_calendar(calendar)
+            timetracking_data: DataFrame = (
+                self._timetracking_data_frame_source.get_data_frame()
             )
             return IntentResult(
                 was_intent_successful=True,
                 data=timetracking_data,
             )
         else:
-            timetracking_data: DataFrame = self._spreadsheet_source.load_data(
-                file_path=file_path,
-            )
+            try:
+                timetracking_data: DataFrame = self._spreadsheet_source.load_data(
+                    file_path=file_path,
+                )
+            except ValueError as ex:
+                logger.exception(ex)
+                return IntentResult(
+                    was_intent_successful=False,
+                    error_msg="The spreadsheet format was not recognized",
+                    exception=ex,
+                )
             return IntentResult(
                 was_intent_successful=True,
                 data=timetracking_data,
@@ -126,11 +150,21 @@ class TimeTrackingIntent(Intent):
         cloud_connector: CloudConnector,
         calendar_name: str,
     ) -> IntentResult[DataFrame]:
-        """Loads time tracking data from a cloud calendar using a cloud connector"""
+        """Synchronizes the stored time tracking data with a cloud calendar using a cloud connector
+
+        Returns:
+            IntentResult
+                data : all stored time tracking data after the sync
+        """
         try:
-            calendar_data: DataFrame = self._cloud_calendar_source.load_data(
+            calendar = self._cloud_calendar_source.load_calendar(
                 cloud_connector=cloud_connector,
                 calendar_name=calendar_name,
+                time_zone=self._get_preferred_time_zone(),
+            )
+            self._timetracking_data_frame_source.sync_calendar(calendar)
+            calendar_data: DataFrame = (
+                self._timetracking_data_frame_source.get_data_frame()
             )
             return IntentResult(
                 was_intent_successful=True,
@@ -176,3 +210,35 @@ class TimeTrackingIntent(Intent):
                 exception=ex,
                 data=None,
             )
+
+    def get_total_time_tracked(
+        self,
+        by: Union[str, List[str]],
+        projects: List[Project],
+    ) -> IntentResult[Optional[DataFrame]]:
+        """Totals the tracked time by project, client, contract, tag, period or billable
+
+        Returns:
+            IntentResult
+                data : the totals as a pandas DataFrame indexed by the dimensions
+        """
+        try:
+            totals = timetracking.total_time_tracked(
+                by=by,
+                rollup=self._timetracking_data_frame_source.get_rollup(),
+                projects=projects,
+            )
+            return IntentResult(
+                was_intent_successful=True,
+                data=totals,
+            )
+        except Exception as ex:
+            error_msg = "Failed to total the tracked time"
+            logger.error(error_msg)
+            logger.exception(ex)
+            return IntentResult(
+                was_intent_successful=False,
+                error_msg=error_msg,
+                exception=ex,
+                data=None,
+            )
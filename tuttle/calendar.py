@@ -1,7 +1,8 @@
 """Calendar integration."""
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from pathlib import Path
+import functools
 import io
 import re
 import calendar
@@ -10,8 +11,11 @@ from loguru import logger
 import ics
 import icloudpy
 import getpass
+import numpy
 import pandas
 import datetime
+import pytz
+from dateutil import tz as dateutil_tz
 
 from pandera.typing import DataFrame
 from pandera import check_io
@@ -19,27 +23,220 @@ from pandas import DataFrame
 
 from . import schema
 
+HASHTAG_PATTERN = r"(#\S+)"
+
+# time zone calendar data is converted to, unless the calendar is given one
+DEFAULT_TIME_ZONE = "CET"
+
+
+# Olson names of the Windows time zones used by Outlook and Exchange
+WINDOWS_TIME_ZONES = {
+    "Dateline Standard Time": "Etc/GMT+12",
+    "Hawaiian Standard Time": "Pacific/Honolulu",
+    "Alaskan Standard Time": "America/Anchorage",
+    "Pacific Standard Time": "America/Los_Angeles",
+    "US Mountain Standard Time": "America/Phoenix",
+    "Mountain Standard Time": "America/Denver",
+    "Central America Standard Time": "America/Guatemala",
+    "Central Standard Time": "America/Chicago",
+    "Central Standard Time (Mexico)": "America/Mexico_City",
+    "Canada Central Standard Time": "America/Regina",
+    "SA Pacific Standard Time": "America/Bogota",
+    "Eastern Standard Time": "America/New_York",
+    "US Eastern Standard Time": "America/Indianapolis",
+    "Atlantic Standard Time": "America/Halifax",
+    "Newfoundland Standard Time": "America/St_Johns",
+    "E. South America Standard Time": "America/Sao_Paulo",
+    "Argentina Standard Time": "America/Buenos_Aires",
+    "UTC": "Etc/UTC",
+    "GMT Standard Time": "Europe/London",
+    "Greenwich Standard Time": "Atlantic/Reykjavik",
+    "W. Europe Standard Time": "Europe/Berlin",
+    "Central Europe Standard Time": "Europe/Budapest",
+    "Romance Standard Time": "Europe/Paris",
+    "Central European Standard Time": "Europe/Warsaw",
+    "W. Central Africa Standard Time": "Africa/Lagos",
+    "GTB Standard Time": "Europe/Bucharest",
+    "E. Europe Standard Time": "Europe/Chisinau",
+    "FLE Standard Time": "Europe/Kiev",
+    "Israel Standard Time": "Asia/Jerusalem",
+    "Egypt Standard Time": "Africa/Cairo",
+    "South Africa Standard Time": "Africa/Johannesburg",
+    "Turkey Standard Time": "Europe/Istanbul",
+    "Russian Standard Time": "Europe/Moscow",
+    "Arab Standard Time": "Asia/Riyadh",
+    "Arabian Standard Time": "Asia/Dubai",
+    "Iran Standard Time": "Asia/Tehran",
+    "Pakistan Standard Time": "Asia/Karachi",
+    "India Standard Time": "Asia/Calcutta",
+    "Nepal Standard Time": "Asia/Katmandu",
+    "Bangladesh Standard Time": "Asia/Dhaka",
+    "SE Asia Standard Time": "Asia/Bangkok",
+    "China Standard Time": "Asia/Shanghai",
+    "Singapore Standard Time": "Asia/Singapore",
+    "Taipei Standard Time": "Asia/Taipei",
+    "Tokyo Standard Time": "Asia/Tokyo",
+    "Korea Standard Time": "Asia/Seoul",
+    "Cen. Australia Standard Time": "Australia/Adelaide",
+    "AUS Central Standard Time": "Australia/Darwin",
+    "E. Australia Standard Time": "Australia/Brisbane",
+    "AUS Eastern Standard Time": "Australia/Sydney",
+    "W. Australia Standard Time": "Australia/Perth",
+    "New Zealand Standard Time": "Pacific/Auckland",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_time_zone(name: str) -> Optional[datetime.tzinfo]:
+    """Look up a time zone by Olson or Windows name, None if unknown.
+
+    Time zone objects are built once per name and then reused.
+    """
+    try:
+        return pytz.timezone(WINDOWS_TIME_ZONES.get(name, name))
+    except pytz.UnknownTimeZoneError:
+        return None
+
+
+def parse_vtimezones(definitions: Dict[str, str]) -> Dict[str, datetime.tzinfo]:
+    """Build time zones from the VTIMEZONE components of a calendar.
+
+    Args:
+        definitions: the text of each VTIMEZONE component, by TZID
+
+    Returns:
+        the time zones that could be built, by TZID
+    """
+    time_zones = {}
+    for tzid, definition in definitions.items():
+        try:
+            time_zones[tzid] = dateutil_tz.tzical(io.StringIO(definition)).get()
+        except ValueError as ex:
+            logger.warning(f"Invalid definition of time zone {tzid}: {ex}")
+    return time_zones
+
+
+def _localize_with_tzinfo(
+    times: numpy.ndarray, time_zone: datetime.tzinfo
+) -> numpy.ndarray:
+    """Convert wall clock times in any tzinfo to UTC nanoseconds, once per distinct time."""
+    distinct, inverse = numpy.unique(times, return_inverse=True)
+    offsets = numpy.array(
+        [
+            time_zone.utcoffset(time.to_pydatetime())
+            for time in pandas.DatetimeIndex(distinct)
+        ],
+        dtype="timedelta64[ns]",
+    )
+    return (distinct - offsets).view("int64")[inverse]
+
+
+def localize_times(
+    times: numpy.ndarray,
+    time_zones: Optional[pandas.Series],
+    default_time_zone: str,
+    calendar_time_zones: Optional[Dict[str, datetime.tzinfo]] = None,
+) -> pandas.DatetimeIndex:
+    """Convert wall clock times, each in its own time zone, to UTC.
+
+    Times are converted in bulk, one group of times per time zone. A time that
+    occurs twice when the clocks are turned back is taken as its first occurrence,
+    a time skipped when the clocks are turned forward is shifted forward.
+
+    Args:
+        times: wall clock times as datetime64 values
+        time_zones: name of the time zone of each time, None for the default
+        default_time_zone: time zone of floating times and unknown time zones
+        calendar_time_zones: time zones defined by the calendar, by name, for names
+            that are neither Olson nor Windows names (see parse_vtimezones)
+
+    Returns:
+        the times in UTC
+    """
+    if time_zones is None:
+        time_zones = pandas.Series([None] * len(times), dtype=object)
+    if calendar_time_zones is None:
+        calendar_time_zones = {}
+    time_zone_names = pandas.Series(time_zones, dtype=object).fillna(default_time_zone)
+    utc = numpy.empty(len(times), dtype="int64")
+    for name, positions in time_zone_names.groupby(time_zone_names).indices.items():
+        time_zone = get_time_zone(name)
+        if time_zone is None and name in calendar_time_zones:
+            utc[positions] = _localize_with_tzinfo(
+                times[positions], calendar_time_zones[name]
+            )
+            continue
+        if time_zone is None:
+            logger.warning(
+                f"Unknown time zone {name}, interpreting as {default_time_zone}"
+            )
+            time_zone = get_time_zone(default_time_zone)
+        localized = pandas.DatetimeIndex(times[positions]).tz_localize(
+            time_zone,
+            ambiguous=numpy.ones(len(positions), dtype=bool),
+            nonexistent="shift_forward",
+        )
+        utc[positions] = localized.asi8
+    return pandas.DatetimeIndex(utc, tz="UTC")
+
 
 def extract_hashtag(string) -> str:
     """Extract the first hashtag from a string."""
-    match = re.search(r"(#\S+)", string)
+    match = re.search(HASHTAG_PATTERN, string)
     if match:
         return match.group(1)
     else:
         return ""
 
 
+def extract_hashtags(strings: pandas.Series) -> pandas.Series:
+    """Extract the first hashtag from each of a series of strings."""
+    return (
+        strings.fillna("")
+        .astype(str)
+        .str.extract(HASHTAG_PATTERN, expand=False)
+        .fillna("")
+    )
+
+
 def parse_pyicloud_datetime(dt_list):
     """Parse the dates returned by pyicloud."""
     _, year, month, day, hour, minute, _ = dt_list
     return datetime.datetime(year, month, day, hour, minute)
 
 
+def parse_pyicloud_datetimes(dt_lists: pandas.Series) -> pandas.Series:
+    """Parse a series of dates returned by pyicloud."""
+    if dt_lists.empty:
+        return pandas.Series([], index=dt_lists.index, dtype="datetime64[ns]")
+    parts = numpy.array(dt_lists.tolist(), dtype="int64")
+    year, month, day, hour, minute = (parts[:, i] for i in range(1, 6))
+    times = _compose_datetimes(year, month, day, hour, minute)
+    return pandas.Series(times, index=dt_lists.index)
+
+
+def _compose_datetimes(year, month, day, hour, minute, second=0) -> numpy.ndarray:
+    """Compose arrays of date and time fields to datetime64 values."""
+    months = (year - 1970) * 12 + month - 1
+    times = (
+        months.astype("datetime64[M]").astype("datetime64[s]")
+        + (day - 1).astype("timedelta64[D]")
+        + numpy.asarray(hour).astype("timedelta64[h]")
+        + numpy.asarray(minute).astype("timedelta64[m]")
+        + numpy.asarray(second).astype("timedelta64[s]")
+    )
+    return times.astype("datetime64[ns]")
+
+
 class Calendar:
-    """Abstract base class for calendars."""
+    """Abstract base class for calendars.
+
+    Event times are converted to the calendar's time zone, the user's time zone.
+    """
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, time_zone: Optional[str] = None):
         self.name = name
+        self.time_zone = time_zone or DEFAULT_TIME_ZONE
 
     @check_io(out=schema.time_tracking)
     def to_data(self) -> DataFrame:
@@ -53,6 +250,265 @@ class CloudCalendar(Calendar):
     pass
 
 
+# STREAMING ICS PARSER
+
+# characters read from an .ics file at a time
+ICS_CHUNK_SIZE = 1024 * 1024
+# events converted to a DataFrame at a time
+ICS_BATCH_SIZE = 10000
+
+# properties of an event that are kept, by name
+ICS_EVENT_PROPERTIES = {"UID", "SUMMARY", "DESCRIPTION", "DTSTART", "DTEND", "DURATION"}
+
+_ICS_ESCAPES = re.compile(r"\\([\\;,nN])")
+
+# parameters and value of a property that is not given
+_NO_PROPERTY = ({}, None)
+
+
+def _unescape_ics_texts(values: List[Optional[str]]) -> pandas.Series:
+    """Resolve the escape sequences of ICS text values."""
+    texts = pandas.Series(values, dtype=object)
+    escaped = texts.str.contains("\\", regex=False).fillna(False).astype(bool)
+    if escaped.any():
+        texts[escaped] = texts[escaped].str.replace(
+            _ICS_ESCAPES,
+            lambda match: "\n" if match.group(1) in "nN" else match.group(1),
+            regex=True,
+        )
+    return texts
+
+
+_ICS_FOLD = re.compile(r"\r?\n[ \t]")
+
+
+def _unfold_ics_lines(text: str) -> List[str]:
+    return _ICS_FOLD.sub("", text).replace("\r", "").split("\n")
+
+
+def iter_ics_lines(chunks: Iterator[str]) -> Iterator[str]:
+    """Split chunks of ICS text into unfolded content lines."""
+    remainder = ""
+    for chunk in chunks:
+        text = remainder + chunk
+        # hold back the lines that may be continued in the next chunk
+        cut = text.rfind("\n")
+        while cut != -1 and text[cut + 1 : cut + 2] in ("", " ", "\t"):
+            cut = text.rfind("\n", 0, cut)
+        if cut == -1:
+            remainder = text
+            continue
+        remainder = text[cut + 1 :]
+        yield from _unfold_ics_lines(text[:cut])
+    if remainder:
+        lines = _unfold_ics_lines(remainder)
+        if not lines[-1]:
+            lines.pop()
+        yield from lines
+
+
+def _parse_ics_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Split a content line into property name, parameters and value."""
+    head, _, value = line.partition(":")
+    if ";" not in head:
+        return head.upper(), {}, value
+    if '"' in head:
+        # a quoted parameter value may contain a colon
+        in_quotes = False
+        for position, character in enumerate(line):
+            if character == '"':
+                in_quotes = not in_quotes
+            elif character == ":" and not in_quotes:
+                head, value = line[:position], line[position + 1 :]
+                break
+    name, *parameters = head.split(";")
+    params = {}
+    for parameter in parameters:
+        key, _, parameter_value = parameter.partition("=")
+        params[key.upper()] = parameter_value.strip('"')
+    return name.upper(), params, value
+
+
+def iter_ics_events(
+    chunks: Iterator[str],
+    time_zone_definitions: Optional[Dict[str, str]] = None,
+) -> Iterator[Dict[str, Tuple[Dict[str, str], str]]]:
+    """Tokenize ICS text into events, one at a time.
+
+    Args:
+        chunks: the text of an .ics file in chunks of any size
+        time_zone_definitions: if given, the text of the VTIMEZONE components is
+            added to it by TZID, as soon as they have been read
+
+    Yields:
+        dict: the properties of an event (see ICS_EVENT_PROPERTIES) by name,
+            as tuples of parameters and value
+    """
+    event = None
+    # depth of components nested in the current event, e.g. alarms
+    nesting = 0
+    # lines of the VTIMEZONE component being read
+    vtimezone = None
+    for line in iter_ics_lines(chunks):
+        head, _, value = line.partition(":")
+        if vtimezone is not None:
+            vtimezone.append(line)
+            if head == "END" and value == "VTIMEZONE":
+                tzids = [
+                    entry[len("TZID:") :]
+                    for entry in vtimezone
+                    if entry.startswith("TZID:")
+                ]
+                if tzids and time_zone_definitions is not None:
+                    time_zone_definitions[tzids[0]] = "\n".join(vtimezone)
+                vtimezone = None
+            continue
+        if event is None:
+            if head == "BEGIN" and value == "VEVENT":
+                event = {}
+            elif head == "BEGIN" and value == "VTIMEZONE":
+                vtimezone = [line]
+            continue
+        if head == "BEGIN":
+            nesting += 1
+        elif head == "END":
+            if nesting == 0:
+                yield event
+                event = None
+            else:
+                nesting -= 1
+        elif nesting == 0:
+            name = head.split(";", 1)[0].upper()
+            if name in ICS_EVENT_PROPERTIES:
+                if name != head:
+                    name, params, value = _parse_ics_property(line)
+                    event[name] = (params, value)
+                else:
+                    event[name] = ({}, value)
+
+
+def _read_chunks(text_file, chunk_size: int) -> Iterator[str]:
+    while True:
+        chunk = text_file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_ics_date_times(values: numpy.ndarray, is_date: numpy.ndarray):
+    """Parse ICS dates (YYYYMMDD) and date-times (YYYYMMDDTHHMMSS) from their digits."""
+    characters = numpy.array(values, dtype="S15").view(numpy.uint8).reshape(-1, 15)
+    digits = characters.astype("int64") - ord("0")
+
+    def number(start, stop):
+        result = digits[:, start]
+        for position in range(start + 1, stop):
+            result = result * 10 + digits[:, position]
+        return result
+
+    hour, minute, second = (
+        numpy.where(is_date, 0, number(start, start + 2)) for start in (9, 11, 13)
+    )
+    return _compose_datetimes(
+        number(0, 4), number(4, 6), number(6, 8), hour, minute, second
+    )
+
+
+def _ics_times_to_utc(
+    values: List[str],
+    time_zones: List[Optional[str]],
+    default_time_zone: str,
+    calendar_time_zones: Optional[Dict[str, datetime.tzinfo]] = None,
+) -> Tuple[pandas.DatetimeIndex, numpy.ndarray]:
+    """Convert ICS date or date-time values to UTC.
+
+    Args:
+        values: values like 20220101, 20220101T100000 or 20220101T100000Z
+        time_zones: TZID of each value, None if not given
+        default_time_zone: time zone of floating times and dates
+        calendar_time_zones: time zones defined by the calendar, by TZID
+
+    Returns:
+        the times in UTC, and which of them are dates
+    """
+    raw = pandas.DataFrame(
+        {
+            "value": pandas.Series(values, dtype=object),
+            "tz": pandas.Series(time_zones, dtype=object),
+        }
+    )
+    raw["tz"] = raw["tz"].where(~raw["value"].str.endswith("Z"), "UTC")
+    raw["value"] = raw["value"].str.rstrip("Z")
+    lengths = raw["value"].str.len()
+    is_date = (lengths == 8).to_numpy()
+    if lengths.isin([8, 15]).all():
+        times = _parse_ics_date_times(raw["value"].to_numpy(), is_date)
+    else:
+        # not in basic format: let pandas figure it out
+        times = pandas.to_datetime(raw["value"]).to_numpy()
+    # dates are days in the user's time zone
+    raw.loc[is_date, "tz"] = None
+    utc = localize_times(times, raw["tz"], default_time_zone, calendar_time_zones)
+    return utc, is_date
+
+
+def _ics_events_to_data(
+    events: List[Dict[str, Tuple[Dict[str, str], str]]],
+    time_zone: str,
+    calendar_time_zones: Optional[Dict[str, datetime.tzinfo]] = None,
+) -> DataFrame:
+    """Convert a batch of tokenized events to time tracking data in a time zone."""
+    # collect the raw values, then convert them column by column
+    uids, titles, descriptions = [], [], []
+    begin_values, begin_time_zones = [], []
+    end_values, end_time_zones, has_end = [], [], []
+    durations = []
+    for event in events:
+        uids.append(event.get("UID", _NO_PROPERTY)[1])
+        titles.append(event.get("SUMMARY", _NO_PROPERTY)[1])
+        descriptions.append(event.get("DESCRIPTION", _NO_PROPERTY)[1])
+        params, value = event.get("DTSTART", _NO_PROPERTY)
+        begin_values.append(value)
+        begin_time_zones.append(params.get("TZID"))
+        params, value = event.get("DTEND", _NO_PROPERTY)
+        has_end.append(value is not None)
+        if value is not None:
+            end_values.append(value)
+            end_time_zones.append(params.get("TZID"))
+        else:
+            durations.append(event.get("DURATION", _NO_PROPERTY)[1])
+
+    begin, all_day = _ics_times_to_utc(
+        begin_values, begin_time_zones, time_zone, calendar_time_zones
+    )
+    has_end = numpy.array(has_end, dtype=bool)
+    end = begin.asi8.copy()
+    if end_values:
+        end[has_end] = _ics_times_to_utc(
+            end_values, end_time_zones, time_zone, calendar_time_zones
+        )[0].asi8
+    if durations:
+        # events without end: DURATION if given, else a day or an instant
+        default_durations = numpy.where(all_day[~has_end], "P1D", "PT0S")
+        durations = pandas.Series(durations, dtype=object).fillna(
+            pandas.Series(default_durations)
+        )
+        end[~has_end] += pandas.to_timedelta(durations).to_numpy().view("int64")
+    end = pandas.DatetimeIndex(end).tz_localize("UTC")
+    data = pandas.DataFrame(
+        {
+            "title": _unescape_ics_texts(titles),
+            "description": _unescape_ics_texts(descriptions),
+            "begin": begin.tz_convert(time_zone),
+            "end": end.tz_convert(time_zone),
+            "all_day": all_day,
+            "uid": uids,
+        }
+    )
+    data["duration"] = data["end"] - data["begin"]
+    return data
+
+
 class ICSCalendar(Calendar):
     """An ICS data format based calendar."""
 
@@ -62,23 +518,47 @@ class ICSCalendar(Calendar):
         path: Optional[str] = None,
         content: Optional[bytes] = None,
         ics_calendar: Optional[ics.Calendar] = None,
+        time_zone: Optional[str] = None,
     ):
-        super().__init__(name)
+        super().__init__(name, time_zone=time_zone)
+        self._ical = ics_calendar
         if path is not None:
             self.path = path
-            with open(self.path, "r") as cal_file:
-                self.ical = ics.Calendar(cal_file.read())
         elif content is not None:
             self.content = content
-            with io.TextIOWrapper(io.BytesIO(content), encoding="utf-8") as cal_file:
-                self.ical = ics.Calendar(cal_file.read())
-        elif ics_calendar is not None:
-            self.ical = ics_calendar
-        else:
+        elif ics_calendar is None:
             raise ValueError(
                 "Either a path to or the content of an .ics file must be passed."
             )
 
+    @property
+    def ical(self) -> ics.Calendar:
+        """The calendar as ics.Calendar, parsed on first access"""
+        if self._ical is None:
+            with self._open() as cal_file:
+                self._ical = ics.Calendar(cal_file.read())
+        return self._ical
+
+    def _open(self):
+        """Open the calendar's .ics text for reading"""
+        if hasattr(self, "path"):
+            return open(self.path, "r", encoding="utf-8")
+        elif hasattr(self, "content"):
+            return io.TextIOWrapper(io.BytesIO(self.content), encoding="utf-8")
+        else:
+            return io.StringIO(self._ical.serialize())
+
+    def iter_events(
+        self,
+        chunk_size: int = ICS_CHUNK_SIZE,
+        time_zone_definitions: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Dict[str, Tuple[Dict[str, str], str]]]:
+        """Stream the calendar's events, see iter_ics_events"""
+        with self._open() as cal_file:
+            yield from iter_ics_events(
+                _read_chunks(cal_file, chunk_size), time_zone_definitions
+            )
+
     def to_raw_data(self) -> DataFrame:
         """Convert .ics calendar events to DataFrame"""
         events = [event for event in self.ical.events]
@@ -89,29 +569,41 @@ class ICSCalendar(Calendar):
         return event_data_raw
 
     @check_io(out=schema.time_tracking)
-    def to_data(self) -> DataFrame:
-        """Convert ics.Calendar to pandas.DataFrame"""
-        # TODO: handle errors from data transformation here
-        event_data = pandas.DataFrame(
-            [
-                (
-                    event.name,
-                    event.description,
-                    pandas.to_datetime(event.begin.datetime).tz_convert("CET"),
-                    pandas.to_datetime(event.end.datetime).tz_convert("CET"),
-                    event.all_day,
-                    # TODO: handle time zones
-                    # pandas.to_datetime(event.begin.datetime).tz_convert("CET"),
-                    # pandas.to_datetime(event.end.datetime).tz_convert("CET"),
-                )
-                for event in self.ical.events
-            ],
-            columns=["title", "description", "begin", "end", "all_day"],
-        )
-        event_data["duration"] = event_data["end"] - event_data["begin"]
-        # apply the function extract_hashtag to the column title to derive the column tag
-        event_data["tag"] = event_data["title"].apply(extract_hashtag)
-        # event_data["time"] = event_data["begin"]
+    def to_data(self, batch_size: int = ICS_BATCH_SIZE) -> DataFrame:
+        """Convert the calendar's events to time tracking data.
+
+        The file is streamed and converted in batches of events,
+        so the whole file is never held in memory. Times with a TZID are
+        interpreted in that time zone, floating times and dates in the
+        calendar's time zone. A TZID that is neither an Olson nor a Windows
+        name is looked up in the VTIMEZONE components read so far.
+        """
+        time_zone = self.time_zone
+        definitions = {}
+        calendar_time_zones = {}
+        parsed = set()
+
+        def convert(events):
+            new_definitions = {
+                tzid: definition
+                for tzid, definition in definitions.items()
+                if tzid not in parsed
+            }
+            parsed.update(new_definitions)
+            calendar_time_zones.update(parse_vtimezones(new_definitions))
+            return _ics_events_to_data(events, time_zone, calendar_time_zones)
+
+        batches = []
+        events = []
+        for event in self.iter_events(time_zone_definitions=definitions):
+            events.append(event)
+            if len(events) == batch_size:
+                batches.append(convert(events))
+                events = []
+        if events or not batches:
+            batches.append(convert(events))
+        event_data = pandas.concat(batches, ignore_index=True)
+        event_data["tag"] = extract_hashtags(event_data["title"])
         event_data = event_data.set_index("begin")
         return event_data
 
@@ -123,8 +615,9 @@ class ICloudCalendar(CloudCalendar):
         self,
         icloud_connector: icloudpy.ICloudPyService,
         name: str,
+        time_zone: Optional[str] = None,
     ):
-        super().__init__(name)
+        super().__init__(name, time_zone=time_zone)
         self.icloud = icloud_connector
         calendars = icloud_connector.calendar.calendars()
         calendars_df = pandas.DataFrame(calendars)
@@ -138,42 +631,87 @@ class ICloudCalendar(CloudCalendar):
         except KeyError:
             raise ValueError(f"iCloud calendar {self.name} not found")
 
-    def to_raw_data(self) -> DataFrame:
-        """Convert iCloud calendar events to DataFrame"""
-        all_events = self.icloud.calendar.events(
-            from_dt=datetime.datetime(1, 1, 1), to_dt=datetime.datetime(2100, 1, 1)
-        )
+    def to_raw_data(
+        self,
+        from_dt: Optional[datetime.datetime] = None,
+        to_dt: Optional[datetime.datetime] = None,
+    ) -> DataFrame:
+        """Convert iCloud calendar events to DataFrame, by default all events"""
+        if from_dt is None:
+            from_dt = datetime.datetime(1, 1, 1)
+        if to_dt is None:
+            to_dt = datetime.datetime(2100, 1, 1)
+        all_events = self.icloud.calendar.events(from_dt=from_dt, to_dt=to_dt)
         event_data_raw = pandas.DataFrame(all_events)
         return event_data_raw
 
     @check_io(out=schema.time_tracking)
-    def to_data(self) -> DataFrame:
+    def to_data(
+        self,
+        from_dt: Optional[datetime.datetime] = None,
+        to_dt: Optional[datetime.datetime] = None,
+    ) -> DataFrame:
         """Convert iCloud calendar events to time tracking data format."""
 
-        event_data_raw = self.to_raw_data()
-        guid = self.guid
-        event_data = event_data_raw.query("pGuid == @guid")
-        timetracking_data = pandas.DataFrame().assign(
-            **{
-                "begin": event_data["startDate"].apply(parse_pyicloud_datetime),
-                "end": event_data["endDate"].apply(parse_pyicloud_datetime),
-                "title": event_data["title"],
-                # TODO: extract tag
-                "tag": extract_hashtag(event_data["title"]),
-                "description": event_data["description"],
-                "all_day": event_data["allDay"],
-            }
+        event_data_raw = self.to_raw_data(from_dt=from_dt, to_dt=to_dt)
+        event_data = event_data_raw
+        if not event_data.empty:
+            guid = self.guid
+            event_data = event_data_raw.query("pGuid == @guid")
+        return _icloud_events_to_data(event_data, self.time_zone)
+
+
+def _icloud_events_to_data(
+    event_data: DataFrame,
+    time_zone: str = DEFAULT_TIME_ZONE,
+) -> DataFrame:
+    """Convert iCloud calendar events to time tracking data format in a time zone.
+
+    Times are interpreted in the event's own time zone (tz) if it has one,
+    floating times and all-day events in the given time zone.
+    """
+    if event_data.empty:
+        event_data = pandas.DataFrame(
+            columns=[
+                "startDate",
+                "endDate",
+                "title",
+                "description",
+                "allDay",
+                "guid",
+                "duration",
+            ]
         )
-        # TODO: handle timezones
-        timetracking_data = timetracking_data.assign(
-            **{
-                "duration": event_data["duration"].apply(
-                    lambda m: datetime.timedelta(minutes=m)
-                )
-            }
+    all_day = event_data["allDay"].astype(bool)
+    event_time_zones = None
+    if "tz" in event_data:
+        event_time_zones = (
+            event_data["tz"]
+            .astype(object)
+            .where((event_data["tz"] != "floating") & ~all_day, None)
         )
-        timetracking_data = timetracking_data.set_index("begin")
-        return timetracking_data
+
+    def to_time_zone(dt_lists):
+        wall_times = parse_pyicloud_datetimes(dt_lists).to_numpy()
+        times = localize_times(wall_times, event_time_zones, time_zone)
+        return times.tz_convert(time_zone)
+
+    timetracking_data = pandas.DataFrame(
+        {
+            "begin": to_time_zone(event_data["startDate"]),
+            "end": to_time_zone(event_data["endDate"]),
+            "title": event_data["title"].to_numpy(),
+            "tag": extract_hashtags(event_data["title"]).to_numpy(),
+            "description": event_data["description"].to_numpy(),
+            "all_day": all_day.to_numpy(),
+            "uid": event_data["guid"].to_numpy(),
+            "duration": pandas.to_timedelta(
+                event_data["duration"].astype("int64").to_numpy(), unit="m"
+            ),
+        }
+    )
+    timetracking_data = timetracking_data.set_index("begin")
+    return timetracking_data
 
 
 class GoogleCalendar(CloudCalendar):
@@ -4,7 +4,6 @@ import datetime
 import random
 from datetime import date, timedelta
 from pathlib import Path
-from decimal import Decimal
 
 import faker
 import ics
@@ -13,7 +12,7 @@ import sqlalchemy
 from loguru import logger
 from sqlmodel import Field, Session, SQLModel, create_engine, select
 
-from tuttle import rendering
+from tuttle import money, rendering
 from tuttle.calendar import Calendar, ICSCalendar
 from tuttle.model import (
     Address,
@@ -22,8 +21,10 @@ from tuttle.model import (
     Contact,
     Contract,
     Cycle,
+    INVOICE_NUMBER_SCOPE,
     Invoice,
     InvoiceItem,
+    InvoiceNumberSequence,
     Timesheet,
     TimeTrackingItem,
     Project,
@@ -121,7 +122,7 @@ def create_fake_contract(
         start_date=fake.date_this_year(after_today=True),
         rate=rate,
         currency="EUR",  # TODO: Use actual currency
-        VAT_rate=Decimal(round(random.uniform(0.05, 0.2), 2)),
+        VAT_rate=money.from_basis_points(100 * random.randint(5, 20)),
         unit=unit,
         units_per_workday=random.randint(1, 12),
         volume=fake.random_int(1, 1000),
@@ -211,6 +212,7 @@ def create_fake_invoice(
     project: Optional[Project] = None,
     user: Optional[User] = None,
     render: bool = True,
+    number: Optional[str] = None,
 ) -> Invoice:
     """
     Create a fake invoice object with random values.
@@ -218,6 +220,7 @@ def create_fake_invoice(
     Args:
     project (Project): The project associated with the invoice.
     fake (faker.Faker): An instance of the Faker class to generate random values.
+    number (Optional[str]): The invoice number, e.g. reserved from the database. Counted in memory if not given.
 
     Returns:
     Invoice: A fake invoice object.
@@ -228,11 +231,13 @@ def create_fake_invoice(
     if user is None:
         user = create_fake_user(fake)
 
-    invoice_number = (
-        f"{datetime.date.today().strftime('%Y-%m-%d')}-{next(invoice_number_counter)}"
-    )
+    if number is None:
+        number = InvoiceNumberSequence.format_number(
+            datetime.date.today().strftime(INVOICE_NUMBER_SCOPE),
+            next(invoice_number_counter),
+        )
     invoice = Invoice(
-        number=invoice_number,
+        number=number,
         date=datetime.date.today(),
         sent=fake.pybool(),
         paid=fake.pybool(),
@@ -249,15 +254,15 @@ def create_fake_invoice(
             unit_price = abs(round(numpy.random.normal(50, 20), 2))
         elif unit == "days":
             unit_price = abs(round(numpy.random.normal(500, 200), 2))
-        vat_rate = round(numpy.random.uniform(0.05, 0.25), 2)
+        vat_rate = money.from_basis_points(100 * numpy.random.randint(5, 26))
         invoice_item = InvoiceItem(
             start_date=fake.date_this_decade(),
             end_date=fake.date_this_decade(),
             quantity=fake.random_int(min=1, max=10),
             unit=unit,
-            unit_price=Decimal(unit_price),
+            unit_price=money.from_minor_units(money.to_minor_units(unit_price)),
             description=fake.sentence(),
-            VAT_rate=Decimal(vat_rate),
+            VAT_rate=vat_rate,
             invoice=invoice,
         )
 
@@ -299,6 +304,7 @@ def create_fake_invoice(
 def create_fake_data(
     user: User,
     n: int = 10,
+    invoice_numbers: Optional[List[str]] = None,
 ):
     locales = [
         "de_DE",
@@ -324,8 +330,11 @@ def create_fake_data(
     contracts = [create_fake_contract(fake, client=client) for client in clients]
     projects = [create_fake_project(fake, contract=contract) for contract in contracts]
 
+    if invoice_numbers is None:
+        invoice_numbers = [None] * n
     invoices = [
-        create_fake_invoice(fake, project=project, user=user) for project in projects
+        create_fake_invoice(fake, project=project, user=user, number=number)
+        for project, number in zip(projects, invoice_numbers)
     ]
 
     return projects, invoices
@@ -416,8 +425,15 @@ def install_demo_data(
         session.commit()
         session.refresh(user)
 
+    # number the invoices like the app does, from the invoice number sequence
+    with Session(db_engine) as session:
+        invoice_numbers = InvoiceNumberSequence.allocate(
+            session, datetime.date.today().strftime(INVOICE_NUMBER_SCOPE), n_projects
+        )
+        session.commit()
+
     logger.info(f"Creating {n_projects} fake projects...")
-    projects, invoices = create_fake_data(user, n_projects)
+    projects, invoices = create_fake_data(user, n_projects, invoice_numbers)
 
     # create a fake calendar and add time tracking data from it
     logger.info("Creating a fake calendar...")
@@ -430,15 +446,9 @@ def install_demo_data(
     on_cache_timetracking_dataframe(time_tracking_data)
     logger.info("Demo data installed.")
 
-    # add fake invoices
-    logger.info("Adding fake invoices...")
+    # add fake invoices and projects in a single transaction
+    logger.info("Adding fake invoices and projects...")
     with Session(db_engine) as session:
-        for invoice in invoices:
-            session.add(invoice)
-            session.commit()
-
-    logger.info("Adding fake projects...")
-    with Session(db_engine) as session:
-        for project in projects:
-            session.add(project)
-            session.commit()
+        session.add_all(invoices)
+        session.add_all(projects)
+        session.commit()
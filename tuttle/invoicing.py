@@ -1,6 +1,6 @@
 """Invoicing."""
 
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 import datetime
 from pathlib import Path
 import shutil
@@ -9,8 +9,9 @@ import shutil
 import pandas
 import datetime
 
+from . import timetracking
 from .model import InvoiceItem, Invoice, Contract, User, Project
-from .timetracking import Timesheet
+from .timetracking import Timesheet, TimeTrackingIndex
 
 
 def generate_invoice(
@@ -30,8 +31,8 @@ def generate_invoice(
         total_hours = timesheet.total / pandas.Timedelta("1h")
         item = InvoiceItem(
             invoice=invoice,
-            start_date=timesheet.table["begin"].min().date(),
-            end_date=timesheet.table["end"].max().date(),
+            start_date=timesheet.begin.date(),
+            end_date=timesheet.end.date(),
             quantity=total_hours,
             unit="hour",
             unit_price=timesheet.project.contract.rate,
@@ -42,6 +43,55 @@ def generate_invoice(
     return invoice
 
 
+def generate_due_invoices(
+    timetracking_data: Union[pandas.DataFrame, TimeTrackingIndex],
+    projects: List[Project],
+    date: Optional[datetime.date] = None,
+) -> List[Invoice]:
+    """Generate the invoices of the projects for their last complete billing period.
+
+    The billing period of each project follows the billing cycle of its contract,
+    counted back from the invoice date, today by default.
+    Projects without time tracked in the period, or with a timesheet of the period
+    already, are skipped. The invoices are generated without a number and each has
+    its timesheet attached.
+    """
+    if date is None:
+        date = datetime.date.today()
+    if not isinstance(timetracking_data, TimeTrackingIndex):
+        timetracking_data = TimeTrackingIndex(timetracking_data)
+    invoices = []
+    for project in projects:
+        contract = project.contract
+        period_start, period_end = contract.billing_cycle.last_period(date)
+        if any(
+            (timesheet.period_start, timesheet.period_end) == (period_start, period_end)
+            for timesheet in project.timesheets
+        ):
+            continue
+        try:
+            timesheet = timetracking.generate_timesheet(
+                timetracking_data,
+                project,
+                period_start,
+                period_end,
+                date=date,
+            )
+        except ValueError:
+            # no time tracked in the period
+            continue
+        invoice = generate_invoice(
+            timesheets=[timesheet],
+            contract=contract,
+            project=project,
+            number=None,
+            date=date,
+        )
+        timesheet.invoice = invoice
+        invoices.append(invoice)
+    return invoices
+
+
 def generate_invoice_email(
     invoice: Invoice,
     user: User,
@@ -1,6 +1,6 @@
 """Object model."""
 
-from typing import Optional, List, Dict, Type
+from typing import Optional, List, Dict, Tuple, Type
 from pydantic import constr, BaseModel, condecimal
 from enum import Enum
 import datetime
@@ -11,6 +11,7 @@ import datetime
 import decimal
 import email
 import hashlib
+import itertools
 import string
 import textwrap
 import uuid
@@ -19,12 +20,14 @@ from enum import Enum
 
 import pandas
 import sqlalchemy
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # from pydantic import str
-from pydantic import BaseModel, condecimal, constr, validator
+from pydantic import BaseModel, PrivateAttr, condecimal, constr, validator
 from sqlmodel import SQLModel, Field, Relationship, Constraint
 
 
+from . import money
 from .dev import deprecated
 from .time import Cycle, TimeUnit
 
@@ -55,7 +58,7 @@ def OneToOneRelationship(back_populates):
     """Define a relationship as one-to-one."""
     return Relationship(
         back_populates=back_populates,
-        sa_relationship_kwargs={"uselist": False, "lazy": "subquery"},
+        sa_relationship_kwargs={"uselist": False, "lazy": "selectin"},
     )
 
 
@@ -129,7 +132,7 @@ class User(SQLModel, table=True):
     address_id: Optional[int] = Field(default=None, foreign_key="address.id")
     address: Optional[Address] = Relationship(
         back_populates="users",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     VAT_number: Optional[str] = Field(
         description="Value Added Tax number of the user, legally required for invoices.",
@@ -149,7 +152,7 @@ class User(SQLModel, table=True):
     bank_account_id: Optional[int] = Field(default=None, foreign_key="bankaccount.id")
     bank_account: Optional["BankAccount"] = Relationship(
         back_populates="user",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     # TODO: path to logo image
     # logo: Optional[str] = Field(default=None)
@@ -206,10 +209,10 @@ class Contact(SQLModel, table=True):
     email: Optional[str]
     address_id: Optional[int] = Field(default=None, foreign_key="address.id")
     address: Optional[Address] = Relationship(
-        back_populates="contacts", sa_relationship_kwargs={"lazy": "subquery"}
+        back_populates="contacts", sa_relationship_kwargs={"lazy": "selectin"}
     )
     invoicing_contact_of: List["Client"] = Relationship(
-        back_populates="invoicing_contact", sa_relationship_kwargs={"lazy": "subquery"}
+        back_populates="invoicing_contact", sa_relationship_kwargs={"lazy": "selectin"}
     )
     # post address
 
@@ -269,15 +272,15 @@ class Client(SQLModel, table=True):
     invoicing_contact_id: int = Field(default=None, foreign_key="contact.id")
     invoicing_contact: Contact = Relationship(
         back_populates="invoicing_contact_of",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     contracts: List["Contract"] = Relationship(
-        back_populates="client", sa_relationship_kwargs={"lazy": "subquery"}
+        back_populates="client", sa_relationship_kwargs={"lazy": "selectin"}
     )
     # non-invoice related contact person?
 
 
-CONTRACT_DEFAULT_VAT_RATE = 0.19
+CONTRACT_DEFAULT_VAT_RATE = Decimal("0.19")
 
 
 class Contract(SQLModel, table=True):
@@ -286,13 +289,14 @@ class Contract(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(description="Short description of the contract.")
     client: Client = Relationship(
-        back_populates="contracts", sa_relationship_kwargs={"lazy": "subquery"}
+        back_populates="contracts", sa_relationship_kwargs={"lazy": "selectin"}
     )
     signature_date: datetime.date = Field(
         description="Date on which the contract was signed",
     )
     start_date: datetime.date = Field(
         description="Date from which the contract is valid",
+        index=True,
     )
     end_date: Optional[datetime.date] = Field(
         description="Date until which the contract is valid",
@@ -305,6 +309,7 @@ class Contract(SQLModel, table=True):
     )
     rate: condecimal(decimal_places=2) = Field(
         description="Rate of remuneration",
+        sa_column=sqlalchemy.Column(money.MinorUnits, nullable=False),
     )
     is_completed: bool = Field(
         default=False, description="flag marking if contract has been completed"
@@ -313,6 +318,7 @@ class Contract(SQLModel, table=True):
     VAT_rate: Decimal = Field(
         description="VAT rate applied to the contractual rate.",
         default=CONTRACT_DEFAULT_VAT_RATE,  # TODO: configure by country?
+        sa_column=sqlalchemy.Column(money.BasisPoints, nullable=False),
     )
     unit: TimeUnit = Field(
         description="Unit of time tracked. The rate applies to this unit.",
@@ -335,10 +341,10 @@ class Contract(SQLModel, table=True):
         description="How often is an invoice sent?",
     )
     projects: List["Project"] = Relationship(
-        back_populates="contract", sa_relationship_kwargs={"lazy": "subquery"}
+        back_populates="contract", sa_relationship_kwargs={"lazy": "selectin"}
     )
     invoices: List["Invoice"] = Relationship(
-        back_populates="contract", sa_relationship_kwargs={"lazy": "subquery"}
+        back_populates="contract", sa_relationship_kwargs={"lazy": "selectin"}
     )
     # TODO: model contractual promises like "at least 2 days per week"
 
@@ -389,7 +395,7 @@ class Project(SQLModel, table=True):
         description="A unique tag, starting with a # symbol",
         sa_column_kwargs={"unique": True},
     )
-    start_date: datetime.date
+    start_date: datetime.date = Field(index=True)
     end_date: datetime.date
     is_completed: bool = Field(
         default=False, description="marks if the project is completed"
@@ -398,17 +404,17 @@ class Project(SQLModel, table=True):
     contract_id: Optional[int] = Field(default=None, foreign_key="contract.id")
     contract: Contract = Relationship(
         back_populates="projects",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     # Project 1:n Timesheet
     timesheets: List["Timesheet"] = Relationship(
         back_populates="project",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     # Project 1:n Invoice
     invoices: List["Invoice"] = Relationship(
         back_populates="project",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
 
     def __repr__(self):
@@ -500,7 +506,7 @@ class Timesheet(SQLModel, table=True):
     project_id: Optional[int] = Field(default=None, foreign_key="project.id")
     project: Project = Relationship(
         back_populates="timesheets",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     # invoice: "Invoice" = Relationship(back_populates="timesheet")
     # period: str
@@ -508,7 +514,7 @@ class Timesheet(SQLModel, table=True):
     items: List[TimeTrackingItem] = Relationship(
         back_populates="timesheet",
         sa_relationship_kwargs={
-            "lazy": "subquery",
+            "lazy": "selectin",
             "cascade": "all, delete",  # delete all items when deleting a timesheet
         },
     )
@@ -522,9 +528,13 @@ class Timesheet(SQLModel, table=True):
     invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id")
     invoice: Optional["Invoice"] = Relationship(
         back_populates="timesheets",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
 
+    # columnar view of the items and its aggregates, built on first use
+    _table: Optional[pandas.DataFrame] = PrivateAttr(default=None)
+    _aggregates: Optional[Dict] = PrivateAttr(default=None)
+
     # class Config:
     #     arbitrary_types_allowed = True
 
@@ -538,19 +548,80 @@ class Timesheet(SQLModel, table=True):
     @property
     def total(self) -> datetime.timedelta:
         """Sum of time in timesheet."""
-        total_time = self.table["duration"].sum()
-        return total_time
+        return self._get_aggregates()["total"]
+
+    @property
+    def begin(self) -> Optional[datetime.datetime]:
+        """Begin of the earliest item, None if the timesheet is empty."""
+        return self._get_aggregates()["begin"]
+
+    @property
+    def end(self) -> Optional[datetime.datetime]:
+        """End of the latest item, None if the timesheet is empty."""
+        return self._get_aggregates()["end"]
 
     @property
     def table(self) -> pandas.DataFrame:
-        """items as DataFrame"""
-        return to_dataframe(self.items)
+        """items as DataFrame, cached until the items change - not to be modified"""
+        # private attributes are not set on instances loaded from the database
+        table = getattr(self, "_table", None)
+        if table is None:
+            table = to_dataframe(self.items)
+            self._table = table
+        return table
+
+    def _get_aggregates(self) -> Dict:
+        aggregates = getattr(self, "_aggregates", None)
+        if aggregates is None:
+            table = self.table
+            if table.empty:
+                aggregates = dict(total=pandas.Timedelta(0), begin=None, end=None)
+            else:
+                aggregates = dict(
+                    total=table["duration"].sum(),
+                    begin=table["begin"].min(),
+                    end=table["end"].max(),
+                )
+            self._aggregates = aggregates
+        return aggregates
+
+    def invalidate_table(self):
+        """Discard the cached table of the items and its aggregates."""
+        self._table = None
+        self._aggregates = None
 
     @property
     def empty(self) -> bool:
         return len(self.items) == 0
 
 
+@sqlalchemy.event.listens_for(Timesheet.items, "append")
+@sqlalchemy.event.listens_for(Timesheet.items, "remove")
+def _on_timesheet_items_changed(timesheet, item, initiator):
+    timesheet.invalidate_table()
+
+
+@sqlalchemy.event.listens_for(Timesheet, "expire")
+@sqlalchemy.event.listens_for(Timesheet, "refresh")
+def _on_timesheet_reloaded(timesheet, *args):
+    # the instance may already have been garbage collected
+    if timesheet is not None:
+        timesheet.invalidate_table()
+
+
+@sqlalchemy.event.listens_for(TimeTrackingItem.begin, "set")
+@sqlalchemy.event.listens_for(TimeTrackingItem.end, "set")
+@sqlalchemy.event.listens_for(TimeTrackingItem.duration, "set")
+@sqlalchemy.event.listens_for(TimeTrackingItem.title, "set")
+@sqlalchemy.event.listens_for(TimeTrackingItem.tag, "set")
+@sqlalchemy.event.listens_for(TimeTrackingItem.description, "set")
+def _on_time_tracking_item_changed(item, value, old_value, initiator):
+    # only a timesheet that is already loaded can have cached the item
+    timesheet = item.__dict__.get("timesheet")
+    if timesheet is not None:
+        timesheet.invalidate_table()
+
+
 class Invoice(SQLModel, table=True):
     """An invoice is a bill for a client."""
 
@@ -559,6 +630,7 @@ class Invoice(SQLModel, table=True):
     # date and time
     date: datetime.date = Field(
         description="The date of the invoice",
+        index=True,
     )
 
     # RELATIONSHIPTS
@@ -567,19 +639,19 @@ class Invoice(SQLModel, table=True):
     contract_id: Optional[int] = Field(default=None, foreign_key="contract.id")
     contract: Contract = Relationship(
         back_populates="invoices",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     # Invoice n:1 Project
     project_id: Optional[int] = Field(default=None, foreign_key="project.id")
     project: Project = Relationship(
         back_populates="invoices",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
     # Invoice 1:n Timesheet
     timesheets: List[Timesheet] = Relationship(
         back_populates="invoice",
         sa_relationship_kwargs={
-            "lazy": "subquery",
+            "lazy": "selectin",
             "cascade": "all, delete",  # delete all timesheets when invoice is deleted
         },
     )
@@ -596,7 +668,7 @@ class Invoice(SQLModel, table=True):
     items: List["InvoiceItem"] = Relationship(
         back_populates="invoice",
         sa_relationship_kwargs={
-            "lazy": "subquery",
+            "lazy": "selectin",
             "cascade": "all, delete",  # delete all invoice items when invoice is deleted
         },
     )
@@ -604,28 +676,82 @@ class Invoice(SQLModel, table=True):
         default=False,
         description="Whether the invoice has been rendered as a PDF.",
     )
+    # totals of the items, stored when the invoice is flushed to the database
+    subtotal_amount: condecimal(decimal_places=2) = Field(
+        default=Decimal(0),
+        description="Sum over all invoice items, as stored.",
+        sa_column=sqlalchemy.Column(
+            money.MinorUnits, nullable=False, server_default="0"
+        ),
+    )
+    VAT_amount: condecimal(decimal_places=2) = Field(
+        default=Decimal(0),
+        description="Sum of VAT over all invoice items, as stored.",
+        sa_column=sqlalchemy.Column(
+            money.MinorUnits, nullable=False, server_default="0"
+        ),
+    )
+    total_amount: condecimal(decimal_places=2) = Field(
+        default=Decimal(0),
+        description="Total invoiced amount, as stored.",
+        sa_column=sqlalchemy.Column(
+            money.MinorUnits, nullable=False, server_default="0"
+        ),
+    )
 
     def __repr__(self):
         return f"Invoice(id={self.id}, number={self.number}, date={self.date})"
 
+    def _get_totals(self) -> Tuple[Decimal, Decimal, Decimal]:
+        # invoices loaded without their items report the totals stored with them
+        if self.id is not None and "items" not in self.__dict__:
+            return (self.subtotal_amount, self.VAT_amount, self.total_amount)
+        return self._compute_totals(self.items)
+
+    @staticmethod
+    def _compute_totals(
+        items: List["InvoiceItem"],
+    ) -> Tuple[Decimal, Decimal, Decimal]:
+        # in exact integer minor units, the VAT is rounded once over all items
+        subtotals = [money.to_minor_units(item.subtotal) for item in items]
+        subtotal = sum(subtotals)
+        VAT_total = money.apply_rates(
+            subtotals, [money.to_basis_points(item.VAT_rate) for item in items]
+        )
+        return (
+            money.from_minor_units(subtotal),
+            money.from_minor_units(VAT_total),
+            money.from_minor_units(subtotal + VAT_total),
+        )
+
+    def update_totals(self, excluded_items: List["InvoiceItem"] = ()):
+        """Store the totals of the items, leaving out items about to be deleted."""
+        items = [
+            item
+            for item in self.items
+            if not any(item is excluded for excluded in excluded_items)
+        ]
+        (
+            self.subtotal_amount,
+            self.VAT_amount,
+            self.total_amount,
+        ) = self._compute_totals(items)
+
     #
     @property
     def sum(self) -> Decimal:
         """Sum over all invoice items."""
-        s = sum([item.subtotal for item in self.items])
-        return Decimal(s)
+        return self._get_totals()[0]
 
     @property
     def VAT_total(self) -> Decimal:
         """Sum of VAT over all invoice items."""
-        s = sum(item.VAT for item in self.items)
-        return Decimal(round(s, 2))
+        return self._get_totals()[1]
 
     @property
     def total(self) -> Decimal:
         """Total invoiced amount."""
-        t = self.sum + self.VAT_total
-        return Decimal(t)
+        return self._get_totals()[2]
 
     @property
     def due_date(self) -> Optional[datetime.date]:
@@ -664,14 +790,18 @@ class InvoiceItem(SQLModel, table=True):
     #
     quantity: int
     unit: str
-    unit_price: Decimal
+    unit_price: Decimal = Field(
+        sa_column=sqlalchemy.Column(money.MinorUnits, nullable=False)
+    )
     description: str
-    VAT_rate: Decimal
+    VAT_rate: Decimal = Field(
+        sa_column=sqlalchemy.Column(money.BasisPoints, nullable=False)
+    )
     # invoice
     invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id")
     invoice: Invoice = Relationship(
         back_populates="items",
-        sa_relationship_kwargs={"lazy": "subquery"},
+        sa_relationship_kwargs={"lazy": "selectin"},
     )
 
     @property
@@ -685,6 +815,93 @@ class InvoiceItem(SQLModel, table=True):
         return self.subtotal * self.VAT_rate
 
 
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "before_flush")
+def _store_invoice_totals(session, flush_context, instances):
+    """Keep the stored totals of the invoices in line with their items."""
+    deleted_items = [obj for obj in session.deleted if isinstance(obj, InvoiceItem)]
+    invoices = {}
+    for obj in itertools.chain(session.new, session.dirty, deleted_items):
+        if isinstance(obj, Invoice):
+            invoice = obj
+        elif isinstance(obj, InvoiceItem):
+            invoice = obj.__dict__.get("invoice")
+        else:
+            continue
+        # without its items loaded, an invoice keeps the totals it was loaded with
+        if (
+            invoice is not None
+            and "items" in invoice.__dict__
+            and invoice not in session.deleted
+        ):
+            invoices[id(invoice)] = invoice
+    for invoice in invoices.values():
+        invoice.update_totals(excluded_items=deleted_items)
+
+
+# invoice numbers are counted per scope, by default the invoice date in this format
+INVOICE_NUMBER_SCOPE = "%Y-%m-%d"
+
+
+class InvoiceNumberSequence(SQLModel, table=True):
+    """Counter of the invoice numbers allocated in a scope, e.g. a day."""
+
+    scope: str = Field(primary_key=True)
+    last_number: int = Field(default=0)
+
+    @staticmethod
+    def format_number(scope: str, number: int) -> str:
+        """The invoice number with the given count in a scope, e.g. 2022-01-01-03."""
+        return f"{scope}-{number:02d}"
+
+    @classmethod
+    def allocate(
+        cls,
+        session,
+        scope: str,
+        count: int,
+    ) -> List[str]:
+        """Allocate consecutive invoice numbers in a scope.
+
+        The numbers are only allocated when the session commits. Updating the counter
+        takes the database write lock, so that concurrent transactions allocating in
+        the same scope wait for each other instead of allocating the same numbers.
+        """
+        sequence = cls.__table__
+        invoice = Invoice.__table__
+        prefix = f"{scope}-"
+        # start the counter of a new scope after the highest number already in use
+        highest_number = sqlalchemy.func.max(
+            sqlalchemy.cast(
+                sqlalchemy.func.substr(invoice.c.number, len(prefix) + 1),
+                sqlalchemy.Integer,
+            )
+        )
+        session.execute(
+            sqlite_insert(sequence)
+            .values(
+                scope=scope,
+                last_number=sqlalchemy.select(
+                    sqlalchemy.func.coalesce(highest_number, 0)
+                )
+                .where(invoice.c.number.like(f"{prefix}%"))
+                .scalar_subquery(),
+            )
+            .on_conflict_do_nothing(index_elements=[sequence.c.scope])
+        )
+        session.execute(
+            sqlalchemy.update(sequence)
+            .where(sequence.c.scope == scope)
+            .values(last_number=sequence.c.last_number + count)
+        )
+        last_number = session.execute(
+            sqlalchemy.select(sequence.c.last_number).where(sequence.c.scope == scope)
+        ).scalar_one()
+        return [
+            cls.format_number(scope, number)
+            for number in range(last_number - count + 1, last_number + 1)
+        ]
+
+
 # class Payment(SQLModel, table=True):
 #     id: Optional[int] = Field(default=None, primary_key=True)
 #     # invoice: Invoice = Relationship(back_populates="payment")
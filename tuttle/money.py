@@ -0,0 +1,120 @@
+"""Exact money arithmetic on integer minor units and integer basis point rates.
+
+All rounding is half away from zero: 0.5 rounds to 1 and -0.5 to -1, so that a
+credit mirrors the invoice it cancels. Conversions, divisions in Python and in
+SQL, and the conversion of databases that stored decimals follow this rule.
+"""
+
+from typing import Sequence, Union
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy
+import sqlalchemy
+
+# amounts are counted in hundredths of the currency unit, e.g. cents
+MINOR_UNIT_DIGITS = 2
+# rates are counted in hundredths of a percent
+BASIS_POINT_DIGITS = 4
+BASIS_POINTS = 10**BASIS_POINT_DIGITS
+
+Number = Union[int, float, str, Decimal]
+
+
+def _to_integer(value: Number, digits: int) -> int:
+    # floats go through their shortest representation, so that 0.19 stays 0.19
+    scaled = Decimal(str(value)).scaleb(digits)
+    return int(scaled.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_minor_units(amount: Number) -> int:
+    """An amount of money in minor units, rounded half away from zero."""
+    return _to_integer(amount, MINOR_UNIT_DIGITS)
+
+
+def from_minor_units(minor_units: int) -> Decimal:
+    """An amount of money in minor units as a Decimal in currency units."""
+    return Decimal(int(minor_units)).scaleb(-MINOR_UNIT_DIGITS)
+
+
+def to_basis_points(rate: Number) -> int:
+    """A rate, e.g. 0.19 for 19 %, in basis points, rounded half away from zero."""
+    return _to_integer(rate, BASIS_POINT_DIGITS)
+
+
+def from_basis_points(basis_points: int) -> Decimal:
+    """A rate in basis points as a Decimal fraction."""
+    return Decimal(int(basis_points)).scaleb(-BASIS_POINT_DIGITS)
+
+
+def divide_rounded(dividend, divisor: int):
+    """Integer division by a positive divisor rounded half away from zero.
+
+    Works element-wise on NumPy integer arrays as well as on integers.
+    """
+    quotient = (abs(dividend) + divisor // 2) // divisor
+    if isinstance(dividend, numpy.ndarray):
+        return numpy.where(dividend < 0, -quotient, quotient)
+    return -quotient if dividend < 0 else quotient
+
+
+def divide_rounded_in_sql(dividend, divisor: int):
+    """divide_rounded for SQL integer expressions.
+
+    Integer division in SQL truncates toward zero, so the magnitude is rounded
+    and the sign applied afterwards.
+    """
+    return sqlalchemy.case(
+        (dividend >= 0, (dividend + divisor // 2) / divisor),
+        else_=-((divisor // 2 - dividend) / divisor),
+    )
+
+
+def apply_rate(minor_units, basis_points):
+    """Amounts at a rate, e.g. the VAT of net amounts, rounded to minor units.
+
+    Works element-wise on NumPy int64 arrays as well as on integers.
+    """
+    return divide_rounded(minor_units * basis_points, BASIS_POINTS)
+
+
+def apply_rates(minor_units: Sequence[int], basis_points: Sequence[int]) -> int:
+    """Sum of amounts at their rates, rounded once to minor units at the end."""
+    exact = numpy.dot(
+        numpy.asarray(minor_units, dtype=numpy.int64),
+        numpy.asarray(basis_points, dtype=numpy.int64),
+    )
+    return int(divide_rounded(int(exact), BASIS_POINTS))
+
+
+class MinorUnits(sqlalchemy.types.TypeDecorator):
+    """Amounts of money as Decimal, stored as INTEGER minor units."""
+
+    impl = sqlalchemy.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_minor_units(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_minor_units(value)
+
+
+class BasisPoints(sqlalchemy.types.TypeDecorator):
+    """Rates as Decimal fractions, stored as INTEGER basis points."""
+
+    impl = sqlalchemy.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_basis_points(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_basis_points(value)
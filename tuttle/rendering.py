@@ -1,7 +1,15 @@
 """Document rendering."""
 
+from typing import Callable, List, Optional, Union
+
 import os
 import sys
+import functools
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import shutil
 import glob
@@ -11,8 +19,7 @@ import pandas
 from loguru import logger
 import base64
 import io
-import PyPDF2
-import PIL
+import PIL.Image
 
 
 from .model import User, Invoice, Timesheet, Project
@@ -26,6 +33,46 @@ def get_template_path(template_name) -> str:
     return template_path
 
 
+def get_cache_dir() -> Path:
+    """Directory of the rendering caches."""
+    return Path.home() / ".tuttle" / "cache"
+
+
+@jinja2.pass_context
+def _as_currency(context, number):
+    return format_currency(
+        number, currency=context["invoice"].contract.currency, locale="en_US"
+    )
+
+
+def _as_percentage(number):
+    return f"{number * 100:.1f} %"
+
+
+def _as_hours(td):
+    return td / pandas.Timedelta("1 hour")
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_env(template_name: str) -> jinja2.Environment:
+    """The Jinja environment of a template folder, shared by all renders.
+
+    Compiled templates are kept in memory and in a bytecode cache on disk. A template
+    is recompiled when its file changes.
+    """
+    bytecode_cache_dir = get_cache_dir() / "templates"
+    bytecode_cache_dir.mkdir(parents=True, exist_ok=True)
+    template_env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(get_template_path(template_name)),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(str(bytecode_cache_dir)),
+        auto_reload=True,
+    )
+    template_env.filters["as_currency"] = _as_currency
+    template_env.filters["as_percentage"] = _as_percentage
+    template_env.filters["as_hours"] = _as_hours
+    return template_env
+
+
 def convert_html_to_pdf(
     in_path,
     out_path,
@@ -78,16 +125,67 @@ def _convert_html_to_pdf_with_weasyprint(
     except ImportError:
         logger.error("Please install weasyprint")
         raise
-    css_paths = [Path(css_path).resolve() for css_path in css_paths]
-    logger.debug(f"css_paths: {css_paths}")
     (
         weasyprint.HTML(in_path).write_pdf(
             out_path,
-            stylesheets=css_paths,
+            stylesheets=_load_stylesheets(css_paths),
+            font_config=_get_font_config(),
         )
     )
 
 
+def convert_html_string_to_pdf(
+    html: str,
+    base_url: str,
+    out_path=None,
+    css_paths=[],
+) -> Optional[bytes]:
+    """Convert an HTML document given as a string to PDF, using weasyprint.
+
+    Relative links of the document are resolved against base_url, e.g. the URL of
+    the template folder, so that no assets need to be next to the document.
+
+    Returns:
+        Optional[bytes]: the PDF if no out_path is given
+    """
+    try:
+        import weasyprint
+    except ImportError:
+        logger.error("Please install weasyprint")
+        raise
+    logger.info(f"converting html to pdf: {out_path}")
+    return weasyprint.HTML(string=html, base_url=base_url).write_pdf(
+        out_path,
+        stylesheets=_load_stylesheets(css_paths),
+        font_config=_get_font_config(),
+    )
+
+
+def _load_stylesheets(css_paths) -> List:
+    css_paths = [Path(css_path).resolve() for css_path in css_paths]
+    logger.debug(f"css_paths: {css_paths}")
+    return [
+        _load_stylesheet(str(css_path), css_path.stat().st_mtime_ns)
+        for css_path in css_paths
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_font_config():
+    """The weasyprint font configuration shared by all conversions of the process."""
+    from weasyprint.text.fonts import FontConfiguration
+
+    return FontConfiguration()
+
+
+@functools.lru_cache(maxsize=64)
+def _load_stylesheet(css_path: str, modified: int):
+    """A parsed weasyprint stylesheet, cached per path and modification time."""
+    import weasyprint
+
+    return weasyprint.CSS(filename=css_path, font_config=_get_font_config())
+
+
 def _convert_html_to_pdf_with_QT(
     in_path,
     out_path,
@@ -114,6 +212,193 @@ def _convert_html_to_pdf_with_QT(
     app.exec()
 
 
+def _get_stylesheets(document_type: str, style: str) -> List[str]:
+    """Stylesheets of a style for a document type, e.g. invoice."""
+    if style == "anvil":
+        return [f"{document_type}.css"]
+    return []
+
+
+# size up to which the render cache keeps rendered documents
+RENDER_CACHE_MAX_SIZE = 256 * 1024 * 1024  # bytes
+
+
+class RenderCache:
+    """Rendered documents stored under a hash of everything they are rendered from.
+
+    The key covers the HTML rendered from the template, which contains all data
+    shown in the document, the files of the template folder it links to, by path,
+    modification time and size, and the document format. When
+    the cache grows beyond its maximum size, the least recently used documents
+    are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_size: int = RENDER_CACHE_MAX_SIZE,
+    ):
+        self.cache_dir = (
+            cache_dir if cache_dir is not None else get_cache_dir() / "documents"
+        )
+        self.max_size = max_size
+
+    def get_key(
+        self, html: str, template_files: List[Path], document_format: str
+    ) -> str:
+        content_hash = hashlib.sha256()
+        content_hash.update(document_format.encode())
+        content_hash.update(html.encode())
+        for template_file in template_files:
+            # stylesheets, images and fonts change with the version of the template
+            stat = Path(template_file).stat()
+            content_hash.update(
+                f"{template_file}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+            )
+        return content_hash.hexdigest()
+
+    def _get_path(self, key: str, document_format: str) -> Path:
+        return self.cache_dir / f"{key}.{document_format}"
+
+    def get(self, key: str, document_format: str) -> Optional[Path]:
+        """The path of the cached document, None if it is not cached."""
+        path = self._get_path(key, document_format)
+        try:
+            # the modification time records the last use
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, document_format: str, content: bytes) -> Path:
+        """Store a rendered document, evicting the least recently used if needed."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._get_path(key, document_format)
+        # written under a temporary name, so that no process reads a partial file
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(content)
+        os.replace(temp_path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove the least recently used documents beyond the maximum size."""
+        entries = []
+        for path in self.cache_dir.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total_size = sum(size for (_, size, _) in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+
+def _get_template_css_paths(template_path: Path, stylesheets: List[str]) -> List[Path]:
+    """Stylesheets of a template folder applied to a document, with those of its web assets."""
+    if not stylesheets:
+        return []
+    css_paths = [template_path / stylesheet for stylesheet in stylesheets]
+    css_paths += sorted(
+        Path(path)
+        for path in glob.glob(f"{template_path / 'web'}/**/*.css", recursive=True)
+    )
+    return css_paths
+
+
+def _get_template_files(template_path: Path) -> List[Path]:
+    """All files of a template folder, which a document rendered from it may link to."""
+    return sorted(path for path in Path(template_path).rglob("*") if path.is_file())
+
+
+def write_document(
+    html: str,
+    prefix: str,
+    template_name: str,
+    stylesheets: List[str],
+    out_dir,
+    document_format: str = "pdf",
+    only_final: bool = False,
+) -> Path:
+    """Write a rendered HTML document and convert it to the document format.
+
+    With only_final, the document is written straight to its final path, with links
+    resolved against the template folder. Otherwise a folder with the HTML, the
+    stylesheets and the web assets of the template is kept next to it.
+
+    Args:
+        html (str): the document rendered from the template
+        prefix (str): name of the document folder and files
+        template_name (str): the template, whose web assets the document links to
+        stylesheets (List[str]): stylesheets of the template applied to the document
+        only_final (bool, optional): Store only the final output. Defaults to False.
+
+    Returns:
+        Path: the path of the document
+    """
+    template_path = get_template_path(template_name)
+    css_paths = _get_template_css_paths(template_path, stylesheets)
+    if only_final:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        final_output_path = Path(out_dir) / Path(f"{prefix}.{document_format}")
+        if document_format == "pdf":
+            render_cache = RenderCache()
+            key = render_cache.get_key(
+                html, _get_template_files(template_path), document_format
+            )
+            cached_path = render_cache.get(key, document_format)
+            if cached_path is not None:
+                try:
+                    shutil.copyfile(cached_path, final_output_path)
+                    logger.info(f"Using cached rendering of {prefix}")
+                    return final_output_path
+                except FileNotFoundError:
+                    # evicted by another process since, rendered again below
+                    pass
+            pdf = convert_html_string_to_pdf(
+                html,
+                # a trailing slash, so that relative links resolve inside the folder
+                base_url=f"{template_path.as_uri()}/",
+                css_paths=css_paths,
+            )
+            with open(final_output_path, "wb") as document_file:
+                document_file.write(pdf)
+            render_cache.put(key, document_format, pdf)
+        else:
+            with open(final_output_path, "w") as document_file:
+                document_file.write(html)
+        return final_output_path
+
+    document_dir = Path(out_dir) / Path(prefix)
+    document_dir.mkdir(parents=True, exist_ok=True)
+    document_path = document_dir / Path(f"{prefix}.html")
+    with open(document_path, "w") as document_file:
+        document_file.write(html)
+    # copy stylsheets
+    if stylesheets:
+        for stylesheet_path in stylesheets:
+            stylesheet_path = template_path / stylesheet_path
+            shutil.copy(stylesheet_path, document_dir)
+        shutil.copytree(
+            template_path / "web",
+            document_dir / "web",
+            dirs_exist_ok=True,
+        )
+    if document_format == "pdf":
+        pdf_path = document_dir / Path(f"{prefix}.pdf")
+        convert_html_to_pdf(
+            in_path=str(document_path),
+            css_paths=css_paths,
+            out_path=pdf_path,
+        )
+        return pdf_path
+    return document_path
+
+
 def render_invoice(
     user: User,
     invoice: Invoice,
@@ -133,20 +418,8 @@ def render_invoice(
         str: [description]
     """
 
-    def as_currency(number):
-        return format_currency(
-            number, currency=invoice.contract.currency, locale="en_US"
-        )
-
-    def as_percentage(number):
-        return f"{number * 100:.1f} %"
-
     template_name = f"invoice-anvil"
-    template_path = get_template_path(template_name)
-    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_path))
-
-    template_env.filters["as_currency"] = as_currency
-    template_env.filters["as_percentage"] = as_percentage
+    template_env = get_template_env(template_name)
 
     invoice_template = template_env.get_template(f"invoice.html")
     html = invoice_template.render(
@@ -158,51 +431,15 @@ def render_invoice(
     if out_dir is None:
         return html
     else:
-        # write invoice html
-        invoice_dir = Path(out_dir) / Path(invoice.prefix)
-        invoice_dir.mkdir(parents=True, exist_ok=True)
-        invoice_path = invoice_dir / Path(f"{invoice.prefix}.html")
-        with open(invoice_path, "w") as invoice_file:
-            invoice_file.write(html)
-        # copy stylsheets
-        if style:
-            stylesheets = []
-            stylesheet_folders = []
-            if style == "anvil":
-                stylesheets = ["invoice.css"]
-                stylesheet_folders = [
-                    "web",
-                ]
-            for stylesheet_path in stylesheets:
-                stylesheet_path = template_path / stylesheet_path
-                shutil.copy(stylesheet_path, invoice_dir)
-            for stylesheet_folder_path in stylesheet_folders:
-                full_stylesheet_folder_path = template_path / stylesheet_folder_path
-                shutil.copytree(
-                    full_stylesheet_folder_path,
-                    invoice_dir / stylesheet_folder_path,
-                    dirs_exist_ok=True,
-                )
-        if document_format == "pdf":
-            css_paths = [
-                path for path in glob.glob(f"{invoice_dir}/**/*.css", recursive=True)
-            ]
-            convert_html_to_pdf(
-                in_path=str(invoice_path),
-                css_paths=css_paths,
-                out_path=invoice_dir / Path(f"{invoice.prefix}.pdf"),
-            )
-        if only_final:
-            final_output_path = out_dir / Path(f"{invoice.prefix}.{document_format}")
-            if document_format == "pdf":
-                shutil.move(
-                    invoice_dir / Path(f"{invoice.prefix}.pdf"), final_output_path
-                )
-            else:
-                shutil.move(
-                    invoice_dir / Path(f"{invoice.prefix}.html"), final_output_path
-                )
-            shutil.rmtree(invoice_dir)
+        write_document(
+            html=html,
+            prefix=invoice.prefix,
+            template_name=template_name,
+            stylesheets=_get_stylesheets("invoice", style),
+            out_dir=out_dir,
+            document_format=document_format,
+            only_final=only_final,
+        )
     # finally set the rendered flag
     invoice.rendered = True
 
@@ -226,10 +463,7 @@ def render_timesheet(
         str: [description]
     """
     template_name = "timesheet-anvil"
-    template_path = get_template_path(template_name)
-    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_path))
-    # filters
-    template_env.filters["as_hours"] = lambda td: td / pandas.Timedelta("1 hour")
+    template_env = get_template_env(template_name)
 
     timesheet_template = template_env.get_template("timesheet.html")
     html = timesheet_template.render(user=user, timesheet=timesheet, style=style)
@@ -237,92 +471,260 @@ def render_timesheet(
     if out_dir is None:
         return html
     else:
-        # write invoice html
-        prefix = timesheet.prefix
-        timesheet_dir = Path(out_dir) / Path(prefix)
-        timesheet_dir.mkdir(parents=True, exist_ok=True)
-        timesheet_path = timesheet_dir / Path(f"{prefix}.html")
-        with open(timesheet_path, "w") as timesheet_file:
-            timesheet_file.write(html)
-        # copy stylsheets
-        if style:
-            stylesheets = []
-            stylesheet_folders = []
-            if style == "anvil":
-                stylesheets = ["timesheet.css"]
-                stylesheet_folders = [
-                    "web",
-                ]
-            for stylesheet_path in stylesheets:
-                stylesheet_path = template_path / stylesheet_path
-                shutil.copy(stylesheet_path, timesheet_dir)
-            for stylesheet_folder_path in stylesheet_folders:
-                full_stylesheet_folder_path = template_path / stylesheet_folder_path
-                shutil.copytree(
-                    full_stylesheet_folder_path,
-                    timesheet_dir / stylesheet_folder_path,
-                    dirs_exist_ok=True,
-                )
-        if document_format == "pdf":
-            css_paths = [
-                path for path in glob.glob(f"{timesheet_dir}/**/*.css", recursive=True)
-            ]
-            convert_html_to_pdf(
-                in_path=str(timesheet_path),
-                css_paths=css_paths,
-                out_path=timesheet_dir / Path(f"{prefix}.pdf"),
-            )
-        if only_final:
-            final_output_path = out_dir / Path(f"{prefix}.{document_format}")
-            if document_format == "pdf":
-                shutil.move(timesheet_dir / Path(f"{prefix}.pdf"), final_output_path)
-            else:
-                shutil.move(timesheet_dir / Path(f"{prefix}.html"), final_output_path)
-            shutil.rmtree(timesheet_dir)
+        write_document(
+            html=html,
+            prefix=timesheet.prefix,
+            template_name=template_name,
+            stylesheets=_get_stylesheets("timesheet", style),
+            out_dir=out_dir,
+            document_format=document_format,
+            only_final=only_final,
+        )
     # finally set the rendered flag
     timesheet.rendered = True
 
 
-def generate_document_thumbnail(pdf_path: str, thumbnail_width: int) -> str:
+class RenderingService:
+    """Renders invoices and timesheets on a pool of worker processes.
+
+    The templates are rendered in the calling process, the workers write the HTML
+    and convert it to PDF. When a document has been rendered, its rendered flag is set.
     """
-    Generate a thumbnail image of a PDF document.
 
-    Parameters:
-        pdf_path (str): The path to the PDF file.
-        thumbnail_width (int): The width of the thumbnail image in pixels.
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._executor = self._create_executor()
 
-    Returns:
-        str: A base64-encoded string of the thumbnail image.
-    """
-    # Open the PDF file in memory
-    with open(pdf_path, "rb") as pdf_file:
-        # Create a PDF object
-        pdf_doc = PyPDF2.PdfFileReader(pdf_file)
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawned workers do not inherit the threads and connections of the app
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def submit(
+        self,
+        user: User,
+        document: Union[Invoice, Timesheet],
+        out_dir,
+        document_format: str = "pdf",
+        style: str = "anvil",
+        only_final: bool = True,
+    ) -> Future:
+        """Render an invoice or timesheet in the background.
+
+        Returns:
+            Future: resolves to the document once it is rendered and flagged as such
+        """
+        rendered = Future()
+        # templates are rendered here, only the HTML is sent to the workers
+        try:
+            if isinstance(document, Invoice):
+                html = render_invoice(user, document, out_dir=None, style=style)
+                template_name = "invoice-anvil"
+                stylesheets = _get_stylesheets("invoice", style)
+            else:
+                html = render_timesheet(user, document, out_dir=None, style=style)
+                template_name = "timesheet-anvil"
+                stylesheets = _get_stylesheets("timesheet", style)
+        except Exception as ex:
+            rendered.set_exception(ex)
+            return rendered
+
+        def on_done(future: Future):
+            if future.cancelled():
+                rendered.cancel()
+                # wakes up threads waiting for the future
+                rendered.set_running_or_notify_cancel()
+            elif future.exception() is not None:
+                rendered.set_exception(future.exception())
+            else:
+                document.rendered = True
+                rendered.set_result(document)
+
+        arguments = dict(
+            html=html,
+            prefix=document.prefix,
+            template_name=template_name,
+            stylesheets=stylesheets,
+            out_dir=out_dir,
+            document_format=document_format,
+            only_final=only_final,
+        )
+        future = self._submit_to_workers(write_document, **arguments)
+        future.add_done_callback(on_done)
+        return rendered
+
+    def _submit_to_workers(self, function: Callable, **kwargs) -> Future:
+        try:
+            return self._executor.submit(function, **kwargs)
+        except BrokenProcessPool:
+            logger.warning("Restarting the rendering worker processes")
+            self._executor = self._create_executor()
+            return self._executor.submit(function, **kwargs)
+
+    def submit_thumbnail(self, pdf_path, thumbnail_width: int) -> Future:
+        """Generate the thumbnail of a PDF document in the background.
+
+        Returns:
+            Future: resolves to the base64-encoded thumbnail image
+        """
+        # cached thumbnails are returned right away, without a round trip to the workers
+        try:
+            cached = _get_cached_thumbnail(pdf_path, thumbnail_width)
+        except Exception as ex:
+            cached = Future()
+            cached.set_exception(ex)
+            return cached
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        return self._submit_to_workers(
+            generate_document_thumbnail,
+            pdf_path=str(pdf_path),
+            thumbnail_width=thumbnail_width,
+        )
+
+    def generate_thumbnails(
+        self, pdf_paths: List, thumbnail_width: int
+    ) -> List[Future]:
+        """Generate thumbnails of PDF documents in parallel.
+
+        Returns:
+            List[Future]: a future per document, in the order of the paths
+        """
+        return [
+            self.submit_thumbnail(pdf_path, thumbnail_width) for pdf_path in pdf_paths
+        ]
+
+    def render_batch(
+        self,
+        user: User,
+        invoices: List[Invoice],
+        timesheets: List[Timesheet],
+        invoice_dir,
+        timesheet_dir,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        **kwargs,
+    ) -> List[Future]:
+        """Render invoices and timesheets in parallel.
+
+        Args:
+            on_progress: called with the number of finished and of all documents
+                whenever a document is finished, from a background thread
+            kwargs: passed on to submit
+
+        Returns:
+            List[Future]: a future per document, invoices first
+        """
+        futures = [
+            self.submit(user, invoice, invoice_dir, **kwargs) for invoice in invoices
+        ] + [
+            self.submit(user, timesheet, timesheet_dir, **kwargs)
+            for timesheet in timesheets
+        ]
+        if on_progress is not None:
+            lock = threading.Lock()
+            finished = [0]
+
+            def report_progress(future: Future):
+                with lock:
+                    finished[0] += 1
+                    on_progress(finished[0], len(futures))
+
+            for future in futures:
+                future.add_done_callback(report_progress)
+        return futures
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_rendering_service: Optional[RenderingService] = None
+_rendering_service_lock = threading.Lock()
+
+
+def get_rendering_service() -> RenderingService:
+    """The rendering service shared by the app, started on first use."""
+    global _rendering_service
+    with _rendering_service_lock:
+        if _rendering_service is None:
+            _rendering_service = RenderingService()
+        return _rendering_service
+
+
+# size up to which thumbnails of documents are kept on disk
+THUMBNAIL_CACHE_MAX_SIZE = 32 * 1024 * 1024  # bytes
+
+
+def _get_thumbnail_cache() -> RenderCache:
+    return RenderCache(
+        cache_dir=get_cache_dir() / "thumbnails", max_size=THUMBNAIL_CACHE_MAX_SIZE
+    )
 
-        # Get the first page
-        page = pdf_doc.getPage(0)
 
-        # Get the size of the page
-        page_width, page_height = page.mediaBox.upperRight
+def _get_thumbnail_key(pdf_path, thumbnail_width: int) -> str:
+    """Key of a thumbnail, which changes whenever the document is written again."""
+    pdf_path = Path(pdf_path).resolve()
+    modified = pdf_path.stat().st_mtime_ns
+    return hashlib.sha256(
+        f"{pdf_path}:{modified}:{thumbnail_width}".encode()
+    ).hexdigest()
+
+
+def _get_cached_thumbnail(pdf_path, thumbnail_width: int) -> Optional[str]:
+    cached_path = _get_thumbnail_cache().get(
+        _get_thumbnail_key(pdf_path, thumbnail_width), "jpg"
+    )
+    if cached_path is None:
+        return None
+    try:
+        thumbnail = cached_path.read_bytes()
+    except FileNotFoundError:
+        return None  # evicted by another process since
+    return base64.b64encode(thumbnail).decode()
 
-        # Calculate the aspect ratio of the page
-        aspect_ratio = page_width / page_height
 
-        # Calculate the size of the thumbnail image
-        thumbnail_height = thumbnail_width / aspect_ratio
-        thumbnail_size = (thumbnail_width, thumbnail_height)
+def _rasterize_first_page(pdf_path, thumbnail_width: int) -> bytes:
+    """Rasterize the first page of a PDF document at the given width as JPEG."""
+    try:
+        import fitz
+    except ImportError:
+        logger.error("Please install PyMuPDF")
+        raise
+    with fitz.open(pdf_path) as pdf_doc:
+        page = pdf_doc.load_page(0)
+        # scaled so that only the pixels of the thumbnail are rendered
+        scale = thumbnail_width / page.rect.width
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        image = PIL.Image.frombytes(
+            "RGB", (pixmap.width, pixmap.height), pixmap.samples
+        )
+    img_buffer = io.BytesIO()
+    image.save(img_buffer, format="JPEG")
+    return img_buffer.getvalue()
 
-        # Generate a thumbnail image
-        image = page.thumbnail(thumbnail_size)
 
-        # Save the image to a BytesIO object
-        img_buffer = io.BytesIO()
-        image.save(img_buffer, format="JPEG")
+def generate_document_thumbnail(pdf_path: str, thumbnail_width: int) -> str:
+    """
+    Generate a thumbnail image of a PDF document.
 
-        # Get the contents of the BytesIO object as a string
-        image_data = img_buffer.getvalue()
+    Thumbnails are cached on disk until the document is modified.
 
-        # Encode the image data as base64
-        base64_image = base64.b64encode(image_data).decode()
+    Parameters:
+        pdf_path (str): The path to the PDF file.
+        thumbnail_width (int): The width of the thumbnail image in pixels.
 
-    return base64_image
+    Returns:
+        str: A base64-encoded string of the thumbnail image.
+    """
+    thumbnail_cache = _get_thumbnail_cache()
+    key = _get_thumbnail_key(pdf_path, thumbnail_width)
+    cached_path = thumbnail_cache.get(key, "jpg")
+    if cached_path is not None:
+        image_data = cached_path.read_bytes()
+    else:
+        image_data = _rasterize_first_page(pdf_path, thumbnail_width)
+        thumbnail_cache.put(key, "jpg", image_data)
+    return base64.b64encode(image_data).decode()
@@ -1,6 +1,6 @@
 import enum
 import datetime
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class Cycle(enum.Enum):
@@ -14,7 +14,30 @@ class Cycle(enum.Enum):
     def __str__(self):
         return str(self.value)
 
-  
+    def last_period(self, date: datetime.date) -> Tuple[datetime.date, datetime.date]:
+        """The first and last day of the last complete cycle before the given date.
+
+        Cycles shorter than a day are billed by day.
+        """
+        if self in (Cycle.hourly, Cycle.daily):
+            end = date - datetime.timedelta(days=1)
+            return end, end
+        if self == Cycle.weekly:
+            end = date - datetime.timedelta(days=date.weekday() + 1)
+            return end - datetime.timedelta(days=6), end
+        if self == Cycle.monthly:
+            end = date.replace(day=1) - datetime.timedelta(days=1)
+            return end.replace(day=1), end
+        if self == Cycle.quarterly:
+            quarter_start = date.replace(month=3 * ((date.month - 1) // 3) + 1, day=1)
+            end = quarter_start - datetime.timedelta(days=1)
+            return end.replace(month=end.month - 2, day=1), end
+        if self == Cycle.yearly:
+            return (
+                datetime.date(date.year - 1, 1, 1),
+                datetime.date(date.year - 1, 12, 31),
+            )
+        raise ValueError(f"No billing period for cycle {self}")
 
 
 class TimeUnit(enum.Enum):
@@ -30,5 +53,3 @@ class TimeUnit(enum.Enum):
 
     def __str__(self):
         return str(self.value)
-
- 
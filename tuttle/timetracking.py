@@ -1,9 +1,14 @@
-from typing import Tuple, Union, Optional, List, Type
+from typing import Iterator, Tuple, Union, Optional, List, Type
 
 import datetime
+import functools
+import itertools
 from dataclasses import dataclass
+from pathlib import Path
 
+import numpy
 import pandas
+from loguru import logger
 from pandas import DataFrame
 from pandera import check_io
 from pandera.typing import DataFrame
@@ -13,10 +18,57 @@ from tuttle.dev import deprecated
 from . import schema
 from .calendar import Calendar, ICloudCalendar, ICSCalendar
 from .model import Project, Timesheet, TimeTrackingItem, User
+from .time import TimeUnit
+from .timetracking_store import SyncResult, TimeTrackingStore
+
+
+class TimeTrackingIndex:
+    """Index for looking up the time tracking entries of a tag in a period.
+
+    The entries are sorted once by tag and begin time, so that the entries of a tag
+    form a contiguous block sorted by begin time. A lookup finds the block of the tag
+    and the period within it by binary search, instead of scanning all entries.
+    """
+
+    def __init__(self, timetracking_data: DataFrame):
+        tags = pandas.Categorical(timetracking_data["tag"])
+        begin = timetracking_data.index.asi8
+        order = numpy.lexsort((begin, tags.codes))
+        self.data = timetracking_data.iloc[order]
+        self.time_zone = timetracking_data.index.tz
+        self._begin = begin[order]
+        self._tag_codes = {tag: code for (code, tag) in enumerate(tags.categories)}
+        # entries of the tag with code i are at positions _tag_bounds[i]:_tag_bounds[i + 1]
+        self._tag_bounds = numpy.searchsorted(
+            tags.codes[order], numpy.arange(len(tags.categories) + 1)
+        )
+
+    def _to_time(self, day: datetime.date) -> int:
+        return pandas.Timestamp(day).tz_localize(self.time_zone).value
+
+    def lookup(
+        self,
+        tag: str,
+        period_start: datetime.date,
+        period_end: Optional[datetime.date] = None,
+    ) -> DataFrame:
+        """Entries of the tag beginning on the days from period_start to period_end, both included."""
+        if period_end is None:
+            period_end = period_start
+        code = self._tag_codes.get(tag)
+        if code is None:
+            return self.data.iloc[:0]
+        lower, upper = self._tag_bounds[code], self._tag_bounds[code + 1]
+        begin = self._begin[lower:upper]
+        start = lower + numpy.searchsorted(begin, self._to_time(period_start))
+        end = lower + numpy.searchsorted(
+            begin, self._to_time(period_end + datetime.timedelta(days=1))
+        )
+        return self.data.iloc[start:end]
 
 
 def generate_timesheet(
-    timetracking_data: DataFrame,
+    timetracking_data: Union[DataFrame, TimeTrackingIndex],
     project: Project,
     period_start: datetime.date,
     period_end: datetime.date,
@@ -24,23 +76,22 @@ def generate_timesheet(
     comment: str = "",
     item_description: str = None,
 ) -> Timesheet:
-    """Create a timesheet from a dataframe of time tracking data."""
+    """Create a timesheet from a dataframe of time tracking data.
+
+    Pass a TimeTrackingIndex of the data when generating several timesheets from it.
+    """
+    if not isinstance(timetracking_data, TimeTrackingIndex):
+        timetracking_data = TimeTrackingIndex(timetracking_data)
+    ts_table = timetracking_data.lookup(project.tag, period_start, period_end).copy()
 
-    # convert period_start and period_end to strings that can be used as index for a DateTimeIndex
-    period_start = period_start.strftime("%Y-%m-%d")
-    period_end = period_end.strftime("%Y-%m-%d")
+    if not period_end:
+        period_end = period_start
+    period_str = f"{period_start:%Y-%m-%d} - {period_end:%Y-%m-%d}"
 
-    tag_query = f"tag == '{project.tag}'"
-    if period_end:
-        ts_table = (
-            timetracking_data.loc[period_start:period_end].query(tag_query).sort_index()
+    if ts_table.empty:
+        raise ValueError(
+            f"No time tracking data found for project {project.title} in period {period_str}"
         )
-        if ts_table.empty:
-            raise ValueError(
-                f"No time tracking data found for project {project.title} in period {period_start} - {period_end}"
-            )
-    else:
-        ts_table = timetracking_data.loc[period_start].query(tag_query).sort_index()
     # convert all-day entries
     ts_table.loc[ts_table["all_day"], "duration"] = (
         project.contract.unit.to_timedelta() * project.contract.units_per_workday
@@ -49,7 +100,6 @@ def generate_timesheet(
         # TODO: extract item description from calendar
         ts_table["description"] = item_description
 
-    period_str = f"{period_start} - {period_end}"
     ts = Timesheet(
         title=f"{project.title} - {period_str}",
         period_start=period_start,
@@ -91,13 +141,80 @@ def import_from_calendar(cal: Calendar) -> DataFrame:
         raise NotImplementedError()
 
 
+def get_sync_source(cal: Calendar) -> str:
+    """Name under which the records synchronized from a calendar are stored.
+
+    Calendar files are identified by their resolved path, so that files of calendars
+    with the same name do not replace each other's events.
+    """
+    if isinstance(cal, ICSCalendar) and hasattr(cal, "path"):
+        return str(Path(cal.path).resolve())
+    return cal.name
+
+
+def sync_calendar(
+    cal: Calendar,
+    store: TimeTrackingStore,
+    lookback: datetime.timedelta = datetime.timedelta(days=90),
+) -> SyncResult:
+    """Synchronize the stored time tracking data with a calendar.
+
+    Only new, changed and deleted events are written to the store. Cloud calendars
+    are fetched in full on the first sync; afterwards only events beginning later than
+    `lookback` before the last sync are fetched and compared.
+    """
+    if issubclass(type(cal), ICloudCalendar):
+        state = store.get_sync_state(cal.name)
+        window_start = None if state is None else state.synced_at - lookback
+        timetracking_data = cal.to_data(from_dt=window_start)
+        return store.sync(cal.name, timetracking_data, window_start=window_start)
+    elif issubclass(type(cal), ICSCalendar):
+        source = get_sync_source(cal)
+        if (
+            source != cal.name
+            and store.get_sync_state(source) is None
+            and store.get_sync_state(cal.name) is not None
+        ):
+            # synchronized before calendar files were identified by their path
+            store.rename_source(cal.name, source)
+        # a calendar file always contains all events
+        timetracking_data = cal.to_data()
+        return store.sync(source, timetracking_data)
+    else:
+        raise NotImplementedError()
+
+
+# rows of a spreadsheet read and converted at a time
+SPREADSHEET_CHUNK_SIZE = 100000
+
+# datetime formats tried when parsing spreadsheets, after those of the preset
+DATETIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %I:%M:%S %p",
+    "%Y-%m-%d %H:%M",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+]
+
+
 class TimetrackingSpreadsheetPreset:
     tag_col: str
     begin_col: Union[str, List[str]]
-    end_col: Union[str, List[str]]
+    # None if the end is not exported, it is then begin + duration
+    end_col: Optional[Union[str, List[str]]]
     duration_col: str
-    title_col: str
-    description_col: str
+    title_col: Optional[str] = None
+    description_col: Optional[str] = None
+    all_day_col: Optional[str] = None
+    # unit of numeric durations, e.g. "h" for decimal hours, None for durations like 01:30:00
+    duration_unit: Optional[str] = None
+    # formats of begin and end, with date and time joined by a space
+    datetime_formats: List[str] = []
 
 
 @dataclass
@@ -109,11 +226,289 @@ class TogglPreset(TimetrackingSpreadsheetPreset):
     title_col = "Task"
     description_col = "Description"
     all_day_col = None
+    datetime_formats = ["%Y-%m-%d %I:%M:%S %p", "%Y-%m-%d %H:%M:%S"]
+
+
+@dataclass
+class ClockifyPreset(TimetrackingSpreadsheetPreset):
+    tag_col = "Project"
+    begin_col = ["Start Date", "Start Time"]
+    end_col = ["End Date", "End Time"]
+    duration_col = "Duration (h)"
+    title_col = "Task"
+    description_col = "Description"
+    all_day_col = None
+    datetime_formats = ["%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M:%S"]
+
+
+@dataclass
+class HarvestPreset(TimetrackingSpreadsheetPreset):
+    tag_col = "Project"
+    begin_col = "Date"
+    end_col = None
+    duration_col = "Hours"
+    title_col = "Task"
+    description_col = "Notes"
+    all_day_col = None
+    duration_unit = "h"
+    datetime_formats = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%d.%m.%Y"]
+
+
+@dataclass
+class GenericPreset(TimetrackingSpreadsheetPreset):
+    """Columns named like those of the time tracking data, e.g. exported by tuttle."""
+
+    tag_col = "tag"
+    begin_col = "begin"
+    end_col = "end"
+    duration_col = "duration"
+    title_col = "title"
+    description_col = "description"
+    all_day_col = None
+
+
+# presets tried when inferring the preset of a spreadsheet
+SPREADSHEET_PRESETS: List[Type[TimetrackingSpreadsheetPreset]] = [
+    TogglPreset,
+    ClockifyPreset,
+    HarvestPreset,
+    GenericPreset,
+]
+
+# rows read to infer the preset of a spreadsheet
+PRESET_SAMPLE_SIZE = 100
+
+
+def _read_csv_chunks(
+    path, columns: Optional[List[str]], chunk_size: int, sep: str = ","
+) -> Iterator[DataFrame]:
+    """Read the given columns of a .csv file as text, in chunks of rows."""
+    return pandas.read_csv(
+        path,
+        sep=sep,
+        engine="c",
+        usecols=None if columns is None else (lambda column: column in columns),
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        chunksize=chunk_size,
+    )
+
+
+def _excel_cell_to_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time(0):
+            return value.strftime("%Y-%m-%d")
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    return str(value)
+
+
+def _read_excel_chunks(
+    path, columns: Optional[List[str]], chunk_size: int
+) -> Iterator[DataFrame]:
+    """Read the given columns of the first sheet of an .xlsx file as text, in chunks of rows."""
+    try:
+        import openpyxl
+    except ImportError:
+        logger.error("Please install openpyxl to import Excel files")
+        raise
+    # the read-only workbook streams rows instead of loading the whole sheet
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = [
+            i for (i, name) in enumerate(header) if columns is None or name in columns
+        ]
+        names = [header[i] for i in positions]
+        while True:
+            chunk = [
+                [
+                    _excel_cell_to_text(row[i]) if i < len(row) else None
+                    for i in positions
+                ]
+                for row in itertools.islice(rows, chunk_size)
+            ]
+            if not chunk:
+                return
+            yield pandas.DataFrame(chunk, columns=names, dtype=object)
+    finally:
+        workbook.close()
+
+
+def read_spreadsheet_chunks(
+    path,
+    columns: Optional[List[str]],
+    chunk_size: int = SPREADSHEET_CHUNK_SIZE,
+) -> Iterator[DataFrame]:
+    """Read the given columns of a spreadsheet file as text, in chunks of rows.
+
+    All columns are read if columns is None.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in (".xlsx", ".xlsm"):
+        return _read_excel_chunks(path, columns, chunk_size)
+    if suffix in (".xls", ".ods"):
+        # no streaming reader for these formats
+        raw_data = pandas.read_excel(
+            path,
+            usecols=None if columns is None else (lambda column: column in columns),
+            dtype=str,
+        )
+        return (
+            raw_data.iloc[i : i + chunk_size]
+            for i in range(0, max(len(raw_data), 1), chunk_size)
+        )
+    return _read_csv_chunks(
+        path, columns, chunk_size, sep="\t" if suffix == ".tsv" else ","
+    )
+
+
+def detect_datetime_format(
+    values: pandas.Series,
+    formats: List[str],
+    sample_size: int = 100,
+) -> Optional[str]:
+    """The first of the formats that parses a sample of the values, None if none does."""
+    sample = values.dropna().head(sample_size)
+    if sample.empty:
+        return None
+    for datetime_format in formats:
+        try:
+            pandas.to_datetime(sample, format=datetime_format)
+        except (ValueError, TypeError):
+            continue
+        return datetime_format
+    return None
+
+
+def _parse_datetimes(values: pandas.Series, datetime_format: Optional[str]):
+    if datetime_format is not None:
+        try:
+            return pandas.to_datetime(values, format=datetime_format, cache=True)
+        except (ValueError, TypeError):
+            logger.warning(
+                f"Datetimes do not all match {datetime_format}, inferring their format"
+            )
+    return pandas.to_datetime(values, cache=True)
+
+
+def _join_columns(raw_data: DataFrame, columns: Union[str, List[str]]):
+    """Values of a column, or of several columns joined by a space."""
+    if isinstance(columns, list):
+        joined = raw_data[columns[0]]
+        for column in columns[1:]:
+            joined = joined + " " + raw_data[column]
+        return joined
+    return raw_data[columns]
+
+
+def _as_list(columns: Union[str, List[str]]) -> List[str]:
+    return columns if isinstance(columns, list) else [columns]
+
+
+def _parse_durations(values: pandas.Series, unit: Optional[str]):
+    if unit is not None:
+        return pandas.to_timedelta(pandas.to_numeric(values), unit=unit)
+    return pandas.to_timedelta(values)
+
+
+def _preset_columns(preset: Type[TimetrackingSpreadsheetPreset]) -> List[str]:
+    return (
+        [preset.tag_col, preset.duration_col]
+        + _as_list(preset.begin_col)
+        + (_as_list(preset.end_col) if preset.end_col is not None else [])
+        + [
+            column
+            for column in (
+                preset.title_col,
+                preset.description_col,
+                preset.all_day_col,
+            )
+            if column is not None
+        ]
+    )
+
+
+def _score_spreadsheet_preset(
+    preset: Type[TimetrackingSpreadsheetPreset], sample: DataFrame
+) -> Optional[int]:
+    """Number of columns the preset maps, None if it does not fit the sample."""
+    columns = _preset_columns(preset)
+    if not set(columns).issubset(sample.columns):
+        return None
+    if not sample.empty:
+        begin = _join_columns(sample, preset.begin_col)
+        if (
+            detect_datetime_format(begin, preset.datetime_formats + DATETIME_FORMATS)
+            is None
+        ):
+            return None
+        try:
+            _parse_durations(sample[preset.duration_col].dropna(), preset.duration_unit)
+        except (ValueError, TypeError):
+            return None
+    return len(columns)
 
 
 def infer_spreadsheet_preset(data: DataFrame) -> Type[TimetrackingSpreadsheetPreset]:
-    """Infer the spreadsheet preset from the columns of the dataframe."""
-    raise NotImplementedError("TODO")
+    """Infer the spreadsheet preset from the columns and first rows of the dataframe.
+
+    A preset fits if the dataframe has all of its columns and their values parse
+    as begin times and durations. Of the presets that fit, the one mapping the
+    most columns is chosen.
+    """
+    scores = [
+        (score, preset)
+        for preset in SPREADSHEET_PRESETS
+        for score in [_score_spreadsheet_preset(preset, data)]
+        if score is not None
+    ]
+    if not scores:
+        raise ValueError(
+            f"No spreadsheet preset matches the columns {list(data.columns)}"
+        )
+    # max keeps the first of equal scores, so the registry order breaks ties
+    score, preset = max(scores, key=lambda scored: scored[0])
+    logger.info(f"Inferred spreadsheet preset {preset.__name__}")
+    return preset
+
+
+@functools.lru_cache(maxsize=32)
+def _detect_spreadsheet_preset(
+    path: str, size: int, modified: int, sample_size: int
+) -> Type[TimetrackingSpreadsheetPreset]:
+    # size and modification time are only part of the cache key
+    chunks = read_spreadsheet_chunks(path, None, chunk_size=sample_size)
+    try:
+        sample = next(iter(chunks), None)
+    finally:
+        chunks.close()
+    if sample is None:
+        sample = pandas.DataFrame()
+    return infer_spreadsheet_preset(sample)
+
+
+def detect_spreadsheet_preset(
+    path, sample_size: int = PRESET_SAMPLE_SIZE
+) -> Type[TimetrackingSpreadsheetPreset]:
+    """Infer the preset of a spreadsheet file from its header and first rows.
+
+    The result is cached per file signature (path, size and modification time).
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    return _detect_spreadsheet_preset(
+        str(path), stat.st_size, stat.st_mtime_ns, sample_size
+    )
 
 
 @check_io(
@@ -129,8 +524,20 @@ def import_from_spreadsheet(
     title_col: Optional[str] = None,
     description_col: Optional[str] = None,
     all_day_col: Optional[str] = None,
+    datetime_format: Optional[str] = None,
+    chunk_size: int = SPREADSHEET_CHUNK_SIZE,
 ) -> DataFrame:
-    """Import time tracking data from a .csv file."""
+    """Import time tracking data from a .csv or .xlsx file.
+
+    The file is read in chunks of rows, only the mapped columns and as text,
+    then converted to typed columns chunk by chunk. Begin and end times are
+    parsed with a format detected once from the first rows, unless one is given.
+    Without a preset or column mapping, the preset is inferred from the file.
+    """
+    datetime_formats = DATETIME_FORMATS
+    duration_unit = None
+    if preset is None and tag_col is None:
+        preset = detect_spreadsheet_preset(path)
     if preset:
         tag_col = preset.tag_col
         begin_col = preset.begin_col
@@ -138,58 +545,72 @@ def import_from_spreadsheet(
         duration_col = preset.duration_col
         title_col = preset.title_col
         description_col = preset.description_col
+        if preset.all_day_col is not None:
+            all_day_col = preset.all_day_col
+        duration_unit = preset.duration_unit
+        datetime_formats = preset.datetime_formats + DATETIME_FORMATS
 
     assert tag_col is not None
     assert begin_col is not None
-    assert end_col is not None
     assert duration_col is not None
 
-    raw_data = pandas.read_csv(
-        path,
-        engine="python",
-        dtype={
-            title_col: str,
-        },
+    columns = (
+        [tag_col, duration_col]
+        + _as_list(begin_col)
+        + (_as_list(end_col) if end_col is not None else [])
+        + [
+            column
+            for column in (title_col, description_col, all_day_col)
+            if column is not None
+        ]
     )
 
-    # combine date and time if separate
-    if isinstance(begin_col, list):
-        begin_date_col, begin_time_col = begin_col
-        raw_data["begin"] = raw_data[begin_date_col] + " " + raw_data[begin_time_col]
-        begin_col = "begin"
-    if isinstance(end_col, list):
-        end_date_col, end_time_col = end_col
-        raw_data["end"] = raw_data[end_date_col] + " " + raw_data[end_time_col]
-        end_col = "end"
-
-    raw_data[begin_col] = pandas.to_datetime(raw_data[begin_col])
-    raw_data[end_col] = pandas.to_datetime(raw_data[end_col])
-
-    timetracking_data = raw_data.rename(
-        columns={
-            title_col: "title",
-            tag_col: "tag",
-            duration_col: "duration",
-            description_col: "description",
-            begin_col: "begin",
-            end_col: "end",
-        }
-    )
-    timetracking_data["duration"] = pandas.to_timedelta(timetracking_data["duration"])
+    chunks = []
+    for raw_data in read_spreadsheet_chunks(path, columns, chunk_size=chunk_size):
+        begin = _join_columns(raw_data, begin_col)
+        if datetime_format is None:
+            datetime_format = detect_datetime_format(begin, datetime_formats)
+        begin = _parse_datetimes(begin, datetime_format)
+        duration = _parse_durations(raw_data[duration_col], duration_unit)
+        if end_col is not None:
+            end = _parse_datetimes(_join_columns(raw_data, end_col), datetime_format)
+        else:
+            end = begin + duration
+        timetracking_data = pandas.DataFrame(
+            {
+                "begin": begin,
+                "end": end,
+                "title": (
+                    raw_data[title_col].fillna("") if title_col is not None else ""
+                ),
+                "tag": raw_data[tag_col].fillna(""),
+                "description": (
+                    raw_data[description_col] if description_col is not None else ""
+                ),
+                "duration": duration,
+                "all_day": (
+                    raw_data[all_day_col].isin(["True", "true", "1", "Yes", "yes"])
+                    if all_day_col is not None
+                    else False
+                ),
+            }
+        )
+        chunks.append(timetracking_data)
 
-    if title_col is None:
-        timetracking_data["title"] = ""
+    if chunks:
+        timetracking_data = pandas.concat(chunks, ignore_index=True)
     else:
-        timetracking_data["title"] = timetracking_data["title"].fillna("")
-    if begin_col is None:
-        timetracking_data["begin"] = pandas.NaT
-    if end_col is None:
-        timetracking_data["end"] = pandas.NaT
-    if description_col is None:
-        timetracking_data["description"] = ""
-    if all_day_col is None:
-        timetracking_data["all_day"] = False
-
+        timetracking_data = pandas.DataFrame(
+            {
+                "begin": pandas.Series(dtype="datetime64[ns]"),
+                "end": pandas.Series(dtype="datetime64[ns]"),
+                "title": pandas.Series(dtype=object),
+                "tag": pandas.Series(dtype=object),
+                "description": pandas.Series(dtype=object),
+                "duration": pandas.Series(dtype="timedelta64[ns]"),
+                "all_day": pandas.Series(dtype=bool),
+            }
+        )
     timetracking_data = timetracking_data.set_index("begin")
     return timetracking_data
 
@@ -197,14 +618,193 @@ def import_from_spreadsheet(
 # ANALYSIS
 
 
-def total_time_tracked(by: str) -> DataFrame:
-    """Calculate the total time spent, grouped by project, client..."""
-    if by == "project":
-        raise NotImplementedError()
-    elif by == "client":
-        raise NotImplementedError()
-    else:
-        raise ValueError()
+# length of a work day, in which time is tracked for contracts billed by the day
+WORKDAY_DURATION = datetime.timedelta(hours=8)
+
+
+def _get_unit_duration(unit: TimeUnit) -> datetime.timedelta:
+    """Tracked time that makes up one unit of a contract."""
+    if unit == TimeUnit.day:
+        return WORKDAY_DURATION
+    return unit.to_timedelta()
+
+
+# dimensions by which tracked time can be totalled
+TIME_TRACKED_DIMENSIONS = [
+    "project",
+    "client",
+    "contract",
+    "tag",
+    "day",
+    "week",
+    "month",
+    "billable",
+]
+
+
+def rollup_by_day_and_tag(time_tracking_data: DataFrame) -> DataFrame:
+    """Time tracked per day and tag, in the format of TimeTrackingStore.load_rollup."""
+    all_day = time_tracking_data["all_day"].fillna(False).astype(bool)
+    begin = pandas.DatetimeIndex(time_tracking_data.index)
+    if begin.tz is not None:
+        begin = begin.tz_localize(None)
+    return (
+        DataFrame(
+            {
+                "day": begin.normalize(),
+                "tag": time_tracking_data["tag"].to_numpy(),
+                "duration": time_tracking_data["duration"]
+                .where(~all_day, pandas.Timedelta(0))
+                .to_numpy(),
+                "all_day_count": all_day.astype("int64").to_numpy(),
+                "entry_count": 1,
+            }
+        )
+        .groupby(["day", "tag"], as_index=False, dropna=False)
+        .agg({"duration": "sum", "all_day_count": "sum", "entry_count": "sum"})
+    )
+
+
+def total_time_tracked(
+    by: Union[str, List[str]],
+    rollup: DataFrame,
+    projects: List[Project] = (),
+) -> DataFrame:
+    """Calculate the total time spent, grouped by project, client...
+
+    The totals are calculated from the time tracked per day and tag, so that the
+    cost does not depend on the number of time tracking entries.
+
+    Args:
+        by: one or more of TIME_TRACKED_DIMENSIONS. Weeks start on Monday, weeks and
+            months are labelled by their first day. Time is billable if its tag
+            belongs to one of the projects.
+        rollup: time tracked per day and tag, see TimeTrackingStore.load_rollup and
+            rollup_by_day_and_tag
+        projects: projects with their contracts and clients, to which tags belong
+
+    Returns:
+        DataFrame: indexed by the dimensions, with the duration of the entries that
+            are not all-day, the number of all-day entries and of all entries, and
+            the tracked time, in which an all-day entry counts as a work day of the
+            project's contract, or WORKDAY_DURATION for tags without a project.
+    """
+    if isinstance(by, str):
+        by = [by]
+    unknown = [
+        dimension for dimension in by if dimension not in TIME_TRACKED_DIMENSIONS
+    ]
+    if unknown:
+        raise ValueError(f"Cannot total tracked time by {unknown}")
+    # attributes of the projects, looked up once per tag instead of per entry
+    tags = DataFrame(
+        {
+            "project": [project.title for project in projects],
+            "client": [project.contract.client.name for project in projects],
+            "contract": [project.contract.title for project in projects],
+            "workday": pandas.to_timedelta(
+                [
+                    _get_unit_duration(project.contract.unit)
+                    * project.contract.units_per_workday
+                    for project in projects
+                ]
+            ),
+        },
+        index=pandas.Index([project.tag for project in projects], name="tag"),
+    )
+    table = rollup.join(tags, on="tag")
+    table["billable"] = table["project"].notna()
+    table["tracked"] = table["duration"] + table["all_day_count"] * table[
+        "workday"
+    ].fillna(pandas.Timedelta(WORKDAY_DURATION))
+    if "week" in by:
+        table["week"] = table["day"] - pandas.to_timedelta(
+            table["day"].dt.weekday, unit="D"
+        )
+    if "month" in by:
+        table["month"] = table["day"].dt.to_period("M").dt.to_timestamp()
+    return table.groupby(by, dropna=False).agg(
+        {
+            "duration": "sum",
+            "all_day_count": "sum",
+            "entry_count": "sum",
+            "tracked": "sum",
+        }
+    )
+
+
+def tracked_time_by_tag(time_tracking_data: DataFrame) -> DataFrame:
+    """Time tracked per tag, in a single pass over the data.
+
+    Returns:
+        DataFrame: indexed by tag, with the summed duration of the entries that are
+            not all-day, and the number of all-day entries as all_day_count
+    """
+    all_day = time_tracking_data["all_day"].fillna(False).astype(bool)
+    return (
+        DataFrame(
+            {
+                "tag": time_tracking_data["tag"],
+                "duration": time_tracking_data["duration"].where(
+                    ~all_day, pandas.Timedelta(0)
+                ),
+                "all_day_count": all_day.astype("int64"),
+            }
+        )
+        .groupby("tag")
+        .agg({"duration": "sum", "all_day_count": "sum"})
+    )
+
+
+def progress_of_projects(
+    projects: List[Project],
+    tracked_time: DataFrame,
+) -> DataFrame:
+    """Progress of projects in the units of their contracts.
+
+    An all-day entry counts as a work day, the units_per_workday of the contract.
+    For contracts billed by the day, other entries count as fractions of a work day
+    of WORKDAY_DURATION.
+
+    Args:
+        projects: projects with their contracts
+        tracked_time: time tracked per tag, see tracked_time_by_tag
+
+    Returns:
+        DataFrame: indexed by project tag, with the tracked time, the tracked units,
+            the volume of the contract, the remaining units and the progress as the
+            fraction of the volume tracked. Volume, remaining and progress are NaN
+            for contracts without a volume.
+    """
+    tags = [project.tag for project in projects]
+    contracts = [project.contract for project in projects]
+    unit_duration = pandas.to_timedelta(
+        [_get_unit_duration(contract.unit) for contract in contracts]
+    )
+    units_per_workday = numpy.array(
+        [contract.units_per_workday for contract in contracts], dtype=float
+    )
+    volume = numpy.array(
+        [
+            numpy.nan if not contract.volume else contract.volume
+            for contract in contracts
+        ],
+        dtype=float,
+    )
+    tracked = tracked_time.reindex(tags)
+    tracked_units = (
+        tracked["duration"].fillna(pandas.Timedelta(0)).to_numpy() / unit_duration
+    ) + tracked["all_day_count"].fillna(0).to_numpy() * units_per_workday
+    return DataFrame(
+        {
+            "tracked": tracked_units * unit_duration,
+            "tracked_units": tracked_units,
+            "volume": volume,
+            "remaining_units": volume - tracked_units,
+            "progress": tracked_units / volume,
+        },
+        index=pandas.Index(tags, name="tag"),
+    )
 
 
 @check_io(
@@ -213,17 +813,11 @@ def total_time_tracked(by: str) -> DataFrame:
 def progress(
     project: Project,
     time_tracking_data: DataFrame,
-):
-    tag = project.tag
-    total_time = (
-        time_tracking_data.filter(["tag", "duration"])
-        .query(f"tag == @tag")
-        .groupby("tag")
-        .sum()
-    )
-    # TODO: work with project.unit
-    budget = project.contract.volume * datetime.timedelta(hours=1)
-    return total_time.loc[tag]["duration"] / budget
+) -> float:
+    """Fraction of the volume of the project's contract tracked so far."""
+    return progress_of_projects([project], tracked_time_by_tag(time_tracking_data)).loc[
+        project.tag, "progress"
+    ]
 
 
 @check_io(
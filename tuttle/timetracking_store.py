@@ -0,0 +1,634 @@
+"""Persistent storage of imported time tracking data."""
+
+from typing import Optional
+
+import datetime
+import json
+import uuid
+from dataclasses import dataclass
+
+import pandas
+import sqlalchemy
+from loguru import logger
+from pandas import DataFrame
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+metadata = sqlalchemy.MetaData()
+
+# Times are stored as integer nanoseconds: UTC epoch for time zone aware data,
+# wall clock time for naive data. The time zone of the data is stored in the settings table.
+time_tracking_table = sqlalchemy.Table(
+    "timetracking_data",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("begin", sqlalchemy.BigInteger, nullable=False),
+    sqlalchemy.Column("end", sqlalchemy.BigInteger),
+    sqlalchemy.Column("duration", sqlalchemy.BigInteger),
+    sqlalchemy.Column("title", sqlalchemy.String),
+    sqlalchemy.Column("tag", sqlalchemy.String, nullable=False),
+    sqlalchemy.Column("description", sqlalchemy.String),
+    sqlalchemy.Column("all_day", sqlalchemy.Boolean),
+    # calendar the record was synchronized from, None for imported data
+    sqlalchemy.Column("source", sqlalchemy.String),
+    # event id within the source
+    sqlalchemy.Column("uid", sqlalchemy.String),
+    # hash of the record's values, to detect changed events
+    sqlalchemy.Column("content_hash", sqlalchemy.BigInteger),
+    sqlalchemy.Index("ix_timetracking_data_begin", "begin"),
+    sqlalchemy.Index("ix_timetracking_data_tag_begin", "tag", "begin"),
+    sqlalchemy.Index("ix_timetracking_data_source_uid", "source", "uid"),
+)
+
+# time tracked per day and tag, in the time zone of the data, updated with every write
+rollup_table = sqlalchemy.Table(
+    "timetracking_rollup",
+    metadata,
+    sqlalchemy.Column("day", sqlalchemy.Date, primary_key=True),
+    sqlalchemy.Column("tag", sqlalchemy.String, primary_key=True),
+    # nanoseconds tracked in records that are not all-day
+    sqlalchemy.Column("duration", sqlalchemy.BigInteger, nullable=False),
+    sqlalchemy.Column("all_day_count", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("entry_count", sqlalchemy.Integer, nullable=False),
+)
+
+ROLLUP_COUNTS = ["duration", "all_day_count", "entry_count"]
+
+settings_table = sqlalchemy.Table(
+    "timetracking_settings",
+    metadata,
+    sqlalchemy.Column("key", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("value", sqlalchemy.String),
+)
+
+TEXT_COLUMNS = ["title", "tag", "description"]
+
+# the values that make up the content hash of a record
+HASHED_COLUMNS = ["begin", "end", "duration", "all_day"] + TEXT_COLUMNS
+
+# a single statement binds at most this many ids (SQLite variable limit)
+_DELETE_BATCH_SIZE = 500
+
+
+@dataclass
+class SyncState:
+    """What was synchronized from a source the last time."""
+
+    synced_at: datetime.datetime
+    window_start: Optional[datetime.datetime] = None
+    window_end: Optional[datetime.datetime] = None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                key: value.isoformat() if value is not None else None
+                for key, value in self.__dict__.items()
+            }
+        )
+
+    @classmethod
+    def from_json(cls, value: str) -> "SyncState":
+        return cls(
+            **{
+                key: datetime.datetime.fromisoformat(item) if item else None
+                for key, item in json.loads(value).items()
+            }
+        )
+
+
+@dataclass
+class SyncResult:
+    """Number of records changed by a synchronization."""
+
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+def _to_nanoseconds(values) -> pandas.Series:
+    """Convert datetimes or timedeltas to integer nanoseconds, None for missing values."""
+    values = pandas.Series(values)
+    if pandas.api.types.is_timedelta64_dtype(values):
+        nanoseconds = pandas.Series(values.array.asi8, index=values.index)
+    else:
+        nanoseconds = pandas.Series(
+            pandas.DatetimeIndex(values).asi8, index=values.index
+        )
+    return nanoseconds.astype(object).where(values.notna().to_numpy(), None)
+
+
+def _time_zone_name(index) -> Optional[str]:
+    """Name of the time zone of a DatetimeIndex, None if naive."""
+    tz = pandas.DatetimeIndex(index).tz
+    if tz is None:
+        return None
+    name = getattr(tz, "zone", None) or str(tz)
+    try:
+        pandas.Timestamp(0, tz=name)
+    except Exception:
+        # e.g. fixed offsets without a name: the stored UTC times remain exact
+        name = "UTC"
+    return name
+
+
+class TimeTrackingStore:
+    """Time tracking data stored in indexed tables of an SQL database.
+
+    Data goes in and comes out in the time tracking data format (see schema.time_tracking),
+    indexed by the begin time.
+    """
+
+    def __init__(self, db_engine: sqlalchemy.engine.Engine):
+        self.db_engine = db_engine
+
+    def ensure_tables(self):
+        """Create the tables if they do not exist, e.g. after the database was reset."""
+        metadata.create_all(self.db_engine, checkfirst=True)
+
+    def get_time_zone(self) -> Optional[str]:
+        """Time zone of the stored data, None for naive times."""
+        self.ensure_tables()
+        with self.db_engine.connect() as connection:
+            return connection.execute(
+                sqlalchemy.select(settings_table.c.value).where(
+                    settings_table.c.key == "time_zone"
+                )
+            ).scalar()
+
+    @staticmethod
+    def _get_setting(connection, key: str) -> Optional[str]:
+        return connection.execute(
+            sqlalchemy.select(settings_table.c.value).where(settings_table.c.key == key)
+        ).scalar()
+
+    @staticmethod
+    def _set_setting(connection, key: str, value: Optional[str]):
+        connection.execute(settings_table.delete().where(settings_table.c.key == key))
+        if value is not None:
+            connection.execute(settings_table.insert().values(key=key, value=value))
+
+    def _set_time_zone(self, connection, time_zone: Optional[str]):
+        self._set_setting(connection, "time_zone", time_zone)
+
+    @staticmethod
+    def _sync_state_key(source: str) -> str:
+        return f"sync_state:{source}"
+
+    def _clear_sync_states(self, connection):
+        connection.execute(
+            settings_table.delete().where(settings_table.c.key.like("sync_state:%"))
+        )
+
+    def get_sync_state(self, source: str) -> Optional[SyncState]:
+        """State of the last synchronization from a source, None if never synchronized."""
+        self.ensure_tables()
+        with self.db_engine.connect() as connection:
+            value = self._get_setting(connection, self._sync_state_key(source))
+        if value is None:
+            return None
+        return SyncState.from_json(value)
+
+    def rename_source(self, source: str, new_source: str):
+        """Move the records and the sync state of a source to a new name."""
+        self.ensure_tables()
+        table = time_tracking_table
+        with self.db_engine.begin() as connection:
+            connection.execute(
+                table.update().where(table.c.source == source).values(source=new_source)
+            )
+            state = self._get_setting(connection, self._sync_state_key(source))
+            self._set_setting(connection, self._sync_state_key(source), None)
+            self._set_setting(connection, self._sync_state_key(new_source), state)
+
+    def _new_revision(self, connection):
+        self._set_setting(connection, "revision", uuid.uuid4().hex)
+
+    def get_revision(self) -> Optional[str]:
+        """Identifier of the stored data, which changes with every write.
+
+        Data derived from the stored data can be cached until the revision changes.
+        None if nothing was ever written.
+        """
+        self.ensure_tables()
+        with self.db_engine.connect() as connection:
+            return self._get_setting(connection, "revision")
+
+    def _is_empty(self, connection) -> bool:
+        return (
+            connection.execute(
+                sqlalchemy.select(time_tracking_table.c.id).limit(1)
+            ).first()
+            is None
+        )
+
+    def _to_rows(
+        self,
+        data: DataFrame,
+        time_zone: Optional[str],
+        source: Optional[str] = None,
+    ) -> DataFrame:
+        """Convert time tracking data to rows of the table."""
+        begin = pandas.DatetimeIndex(data.index)
+        end = pandas.DatetimeIndex(data["end"]) if "end" in data else None
+        if time_zone is None and begin.tz is not None:
+            # store time zone aware data as wall clock time
+            begin = begin.tz_localize(None)
+            if end is not None:
+                end = end.tz_localize(None)
+        elif time_zone is not None and begin.tz is None:
+            begin = begin.tz_localize(time_zone)
+            if end is not None:
+                end = end.tz_localize(time_zone)
+        columns = {
+            "begin": _to_nanoseconds(begin),
+            "end": _to_nanoseconds(end) if end is not None else None,
+            "duration": _to_nanoseconds(data["duration"].to_numpy()),
+            "all_day": (
+                data["all_day"].fillna(False).astype(bool).to_numpy()
+                if "all_day" in data
+                else False
+            ),
+        }
+        for column in TEXT_COLUMNS:
+            # untagged records are stored under the empty tag, like calendar events
+            missing = "" if column == "tag" else None
+            if column in data:
+                columns[column] = (
+                    data[column]
+                    .astype(object)
+                    .where(data[column].notna(), missing)
+                    .to_numpy()
+                )
+            else:
+                columns[column] = missing
+        rows = pandas.DataFrame(columns, index=range(len(data))).astype(object)
+        rows["content_hash"] = (
+            pandas.util.hash_pandas_object(rows[HASHED_COLUMNS], index=False)
+            .to_numpy()
+            .view("int64")
+        )
+        rows["source"] = source
+        if "uid" in data:
+            rows["uid"] = data["uid"].astype(object).where(data["uid"].notna(), None)
+        else:
+            rows["uid"] = None
+        return rows.astype(object)
+
+    @staticmethod
+    def _insert(connection, rows: DataFrame):
+        if len(rows) > 0:
+            connection.execute(time_tracking_table.insert(), rows.to_dict("records"))
+
+    @staticmethod
+    def _to_rollup(rows: DataFrame, time_zone: Optional[str]) -> DataFrame:
+        """Aggregate rows of the table by day and tag."""
+        begin = pandas.to_datetime(
+            rows["begin"].astype("int64"), unit="ns", utc=time_zone is not None
+        )
+        if time_zone is not None:
+            begin = begin.dt.tz_convert(time_zone).dt.tz_localize(None)
+        all_day = rows["all_day"].fillna(False).astype(bool)
+        duration = rows["duration"].astype("Int64").fillna(0).astype("int64")
+        return (
+            DataFrame(
+                {
+                    "day": begin.dt.date,
+                    # untagged time is kept under the empty tag
+                    "tag": rows["tag"].fillna(""),
+                    "duration": duration.where(~all_day, 0),
+                    "all_day_count": all_day.astype("int64"),
+                    "entry_count": 1,
+                }
+            )
+            .groupby(["day", "tag"], as_index=False)
+            .sum()
+        )
+
+    def _rollup_is_complete(self, connection) -> bool:
+        # databases written before the rollup existed have to build it first
+        return self._get_setting(connection, "rollup") == "complete"
+
+    @staticmethod
+    def _add_to_rollup(connection, rollup: DataFrame, sign: int = 1):
+        """Add, or with sign -1 subtract, aggregated rows to the rollup table."""
+        if rollup.empty:
+            return
+        rollup = rollup.assign(
+            **{count: sign * rollup[count] for count in ROLLUP_COUNTS}
+        )
+        statement = sqlite_insert(rollup_table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[rollup_table.c.day, rollup_table.c.tag],
+            set_={
+                count: rollup_table.c[count] + statement.excluded[count]
+                for count in ROLLUP_COUNTS
+            },
+        )
+        connection.execute(statement, rollup.astype(object).to_dict("records"))
+        connection.execute(rollup_table.delete().where(rollup_table.c.entry_count <= 0))
+
+    def _rebuild_rollup(self, connection, time_zone: Optional[str]):
+        table = time_tracking_table
+        result = connection.execute(
+            sqlalchemy.select(
+                table.c.begin, table.c.duration, table.c.tag, table.c.all_day
+            )
+        )
+        rows = pandas.DataFrame(result.fetchall(), columns=list(result.keys()))
+        connection.execute(rollup_table.delete())
+        self._add_to_rollup(connection, self._to_rollup(rows, time_zone))
+        self._set_setting(connection, "rollup", "complete")
+
+    def _write(self, data: DataFrame, replace: bool):
+        self.ensure_tables()
+        with self.db_engine.begin() as connection:
+            if replace:
+                connection.execute(time_tracking_table.delete())
+                connection.execute(rollup_table.delete())
+                self._set_setting(connection, "rollup", "complete")
+                self._clear_sync_states(connection)
+            if replace or self._is_empty(connection):
+                time_zone = _time_zone_name(data.index)
+                self._set_time_zone(connection, time_zone)
+            else:
+                time_zone = self._get_setting(connection, "time_zone")
+            rows = self._to_rows(data, time_zone)
+            self._insert(connection, rows)
+            if self._rollup_is_complete(connection):
+                self._add_to_rollup(connection, self._to_rollup(rows, time_zone))
+            self._new_revision(connection)
+        logger.info(f"Stored {len(data)} time tracking records")
+
+    def replace(self, data: DataFrame):
+        """Replace all stored time tracking data."""
+        self._write(data, replace=True)
+
+    def append(self, data: DataFrame):
+        """Add time tracking data to the stored data."""
+        self._write(data, replace=False)
+
+    def clear(self):
+        """Delete all stored time tracking data."""
+        self.ensure_tables()
+        with self.db_engine.begin() as connection:
+            connection.execute(time_tracking_table.delete())
+            connection.execute(rollup_table.delete())
+            self._set_setting(connection, "rollup", "complete")
+            self._set_time_zone(connection, None)
+            self._clear_sync_states(connection)
+            self._new_revision(connection)
+
+    def sync(
+        self,
+        source: str,
+        data: DataFrame,
+        window_start: Optional[datetime.datetime] = None,
+        window_end: Optional[datetime.datetime] = None,
+    ) -> SyncResult:
+        """Synchronize the stored records of a source with its current events.
+
+        Events are identified by their uid and begin time, changes are detected by
+        comparing content hashes. Only new, changed and deleted events are written.
+
+        Args:
+            source: name of the calendar the data comes from
+            data: all events of the source within the window, with a uid column.
+                Events beginning outside of the window are ignored.
+            window_start: begin of the synchronized period, None for no lower bound
+            window_end: end of the synchronized period, None for no upper bound.
+                Stored events outside of the window are kept.
+
+        Returns:
+            SyncResult: number of added, updated and deleted records
+        """
+        self.ensure_tables()
+        table = time_tracking_table
+        with self.db_engine.begin() as connection:
+            if self._is_empty(connection):
+                time_zone = _time_zone_name(data.index)
+                self._set_time_zone(connection, time_zone)
+            else:
+                time_zone = self._get_setting(connection, "time_zone")
+            incoming = self._to_rows(data, time_zone, source=source)
+            # sources may return events overlapping the window, e.g. the whole first
+            # day: compare only the events beginning in it on both sides
+            in_window = pandas.Series(True, index=incoming.index)
+            if window_start is not None:
+                in_window &= incoming["begin"].astype("int64") >= self._time_bound(
+                    window_start, time_zone
+                )
+            if window_end is not None:
+                in_window &= incoming["begin"].astype("int64") < self._time_bound(
+                    window_end, time_zone
+                )
+            incoming = incoming[in_window].reset_index(drop=True)
+            statement = sqlalchemy.select(
+                table.c.id,
+                table.c.uid,
+                table.c.begin,
+                table.c.content_hash,
+                table.c.duration,
+                table.c.tag,
+                table.c.all_day,
+            ).where(table.c.source == source)
+            if window_start is not None:
+                statement = statement.where(
+                    table.c.begin >= self._time_bound(window_start, time_zone)
+                )
+            if window_end is not None:
+                statement = statement.where(
+                    table.c.begin < self._time_bound(window_end, time_zone)
+                )
+            result = connection.execute(statement)
+            stored = pandas.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+            incoming_keys = pandas.DataFrame(
+                {
+                    "position": range(len(incoming)),
+                    "uid": incoming["uid"],
+                    "begin": incoming["begin"].astype("int64"),
+                    "content_hash": incoming["content_hash"].astype("int64"),
+                }
+            )
+            stored = stored.astype({"begin": "int64"})
+            keys = ["uid", "begin"]
+            incoming_index = pandas.MultiIndex.from_frame(incoming_keys[keys])
+            stored_index = pandas.MultiIndex.from_frame(stored[keys])
+            matched = incoming_keys.merge(
+                stored, on=keys, how="inner", suffixes=("", "_stored")
+            )
+            changed = matched[matched["content_hash"] != matched["content_hash_stored"]]
+            added = incoming_keys[~incoming_index.isin(stored_index)]
+            deleted = stored[~stored_index.isin(incoming_index)]
+
+            obsolete_ids = deleted["id"].tolist() + changed["id"].tolist()
+            for i in range(0, len(obsolete_ids), _DELETE_BATCH_SIZE):
+                connection.execute(
+                    table.delete().where(
+                        table.c.id.in_(obsolete_ids[i : i + _DELETE_BATCH_SIZE])
+                    )
+                )
+            new_positions = added["position"].tolist() + changed["position"].tolist()
+            self._insert(connection, incoming.iloc[new_positions])
+            if self._rollup_is_complete(connection):
+                obsolete = stored[stored["id"].isin(obsolete_ids)]
+                self._add_to_rollup(
+                    connection, self._to_rollup(obsolete, time_zone), sign=-1
+                )
+                self._add_to_rollup(
+                    connection,
+                    self._to_rollup(incoming.iloc[new_positions], time_zone),
+                )
+            if obsolete_ids or new_positions:
+                self._new_revision(connection)
+            self._set_setting(
+                connection,
+                self._sync_state_key(source),
+                SyncState(
+                    synced_at=datetime.datetime.now(),
+                    window_start=window_start,
+                    window_end=window_end,
+                ).to_json(),
+            )
+        sync_result = SyncResult(
+            added=len(added), updated=len(changed), deleted=len(deleted)
+        )
+        logger.info(f"Synchronized time tracking records from {source}: {sync_result}")
+        return sync_result
+
+    def count(self) -> int:
+        """Number of stored time tracking records."""
+        self.ensure_tables()
+        with self.db_engine.connect() as connection:
+            return connection.execute(
+                sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                    time_tracking_table
+                )
+            ).scalar()
+
+    def load(
+        self,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+        tag: Optional[str] = None,
+    ) -> DataFrame:
+        """Load time tracking data, optionally only a period and a tag.
+
+        Args:
+            start: first day of the period
+            end: last day of the period (inclusive)
+            tag: only load data with this tag
+
+        Returns:
+            DataFrame: time tracking data indexed by begin time, ordered by begin time
+        """
+        time_zone = self.get_time_zone()
+        table = time_tracking_table
+        statement = sqlalchemy.select(
+            table.c.begin,
+            table.c.end,
+            table.c.duration,
+            table.c.title,
+            table.c.tag,
+            table.c.description,
+            table.c.all_day,
+        ).order_by(table.c.begin, table.c.id)
+        if start is not None:
+            statement = statement.where(
+                table.c.begin >= self._day_bound(start, time_zone)
+            )
+        if end is not None:
+            statement = statement.where(
+                table.c.begin
+                < self._day_bound(end + datetime.timedelta(days=1), time_zone)
+            )
+        if tag is not None:
+            statement = statement.where(table.c.tag == tag)
+        with self.db_engine.connect() as connection:
+            result = connection.execute(statement)
+            rows = pandas.DataFrame(result.fetchall(), columns=list(result.keys()))
+        return self._to_data(rows, time_zone)
+
+    def load_rollup(
+        self,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+    ) -> DataFrame:
+        """Load the time tracked per day and tag, optionally only in a period.
+
+        Returns:
+            DataFrame: with the columns day, tag, duration of the records that are
+                not all-day, all_day_count and entry_count, ordered by day and tag
+        """
+        self.ensure_tables()
+        with self.db_engine.begin() as connection:
+            if not self._rollup_is_complete(connection):
+                logger.info("Building the time tracking rollup")
+                self._rebuild_rollup(
+                    connection, self._get_setting(connection, "time_zone")
+                )
+            statement = sqlalchemy.select(rollup_table).order_by(
+                rollup_table.c.day, rollup_table.c.tag
+            )
+            if start is not None:
+                statement = statement.where(rollup_table.c.day >= start)
+            if end is not None:
+                statement = statement.where(rollup_table.c.day <= end)
+            result = connection.execute(statement)
+            rows = pandas.DataFrame(result.fetchall(), columns=list(result.keys()))
+        return DataFrame(
+            {
+                "day": pandas.to_datetime(rows["day"]),
+                "tag": rows["tag"].astype(object).where(rows["tag"] != "", None),
+                "duration": pandas.to_timedelta(
+                    rows["duration"].astype("int64"), unit="ns"
+                ),
+                "all_day_count": rows["all_day_count"].astype("int64"),
+                "entry_count": rows["entry_count"].astype("int64"),
+            }
+        )
+
+    @staticmethod
+    def _day_bound(day: datetime.date, time_zone: Optional[str]) -> int:
+        """Start of a day in stored nanoseconds."""
+        timestamp = pandas.Timestamp(day)
+        if time_zone is not None:
+            timestamp = timestamp.tz_localize(time_zone)
+        return timestamp.value
+
+    @staticmethod
+    def _time_bound(time: datetime.datetime, time_zone: Optional[str]) -> int:
+        """A point in time in stored nanoseconds."""
+        timestamp = pandas.Timestamp(time)
+        if time_zone is None:
+            if timestamp.tz is not None:
+                timestamp = timestamp.tz_localize(None)
+        elif timestamp.tz is None:
+            timestamp = timestamp.tz_localize(time_zone)
+        return timestamp.value
+
+    @staticmethod
+    def _to_data(rows: DataFrame, time_zone: Optional[str]) -> DataFrame:
+        """Convert rows of the table to time tracking data."""
+
+        def to_datetime(nanoseconds):
+            times = pandas.to_datetime(
+                nanoseconds.astype("Int64"), unit="ns", utc=time_zone is not None
+            )
+            if time_zone is not None:
+                times = times.dt.tz_convert(time_zone)
+            return times
+
+        data = pandas.DataFrame(
+            {
+                "begin": to_datetime(rows["begin"]),
+                "end": to_datetime(rows["end"]),
+                "duration": pandas.to_timedelta(
+                    rows["duration"].astype("Int64"), unit="ns"
+                ),
+                "title": rows["title"].astype(object),
+                "tag": rows["tag"].astype(object),
+                "description": rows["description"].astype(object),
+                "all_day": rows["all_day"].fillna(False).astype(bool),
+            }
+        )
+        return data.set_index("begin")
@@ -2,7 +2,18 @@
 
 from pathlib import Path
 
-from tuttle.calendar import ICSCalendar, extract_hashtag
+import pandas
+
+from tuttle.calendar import (
+    ICSCalendar,
+    extract_hashtag,
+    extract_hashtags,
+    get_time_zone,
+    iter_ics_events,
+    localize_times,
+    parse_pyicloud_datetime,
+    parse_pyicloud_datetimes,
+)
 
 
 def test_file_calendar():
@@ -15,3 +26,216 @@ def test_file_calendar():
 def test_extract_hashtag():
     assert extract_hashtag("#hashtag string") == "#hashtag"
     assert extract_hashtag("no hashtags") == ""
+
+
+ICS_TEXT = "\r\n".join(
+    [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "BEGIN:VEVENT",
+        "UID:1",
+        "DTSTART;TZID=Europe/Lisbon:20220120T081500",
+        "DTEND;TZID=Europe/Lisbon:20220120T101500",
+        "SUMMARY:Meeting\\, long title for #Project",
+        "DESCRIPTION:first line\\nsecond",
+        "  line",
+        "BEGIN:VALARM",
+        "DESCRIPTION:alarm",
+        "END:VALARM",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:2",
+        "DTSTART;VALUE=DATE:20220218",
+        "SUMMARY:#Holiday",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:3",
+        "DTSTART:20220301T100000Z",
+        "DURATION:PT1H30M",
+        "SUMMARY:No tag",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]
+)
+
+
+def test_iter_ics_events_independent_of_chunk_size():
+    for chunk_size in (1, 5, 64, len(ICS_TEXT)):
+        chunks = (
+            ICS_TEXT[i : i + chunk_size] for i in range(0, len(ICS_TEXT), chunk_size)
+        )
+        events = list(iter_ics_events(chunks))
+        assert [event["UID"][1] for event in events] == ["1", "2", "3"]
+        assert events[0]["DTSTART"] == (
+            {"TZID": "Europe/Lisbon"},
+            "20220120T081500",
+        )
+        assert events[0]["DESCRIPTION"][1] == "first line\\nsecond line"
+
+
+def test_ics_content_to_data():
+    cal = ICSCalendar(name="Test", content=ICS_TEXT.encode("utf-8"))
+    data = cal.to_data(batch_size=2).set_index("uid")
+    assert data.loc["1", "title"] == "Meeting, long title for #Project"
+    assert data.loc["1", "description"] == "first line\nsecond line"
+    assert data.loc["1", "tag"] == "#Project"
+    assert data.loc["1", "duration"] == pandas.Timedelta(hours=2)
+    assert data.loc["2", "all_day"]
+    assert data.loc["2", "duration"] == pandas.Timedelta(days=1)
+    assert data.loc["3", "duration"] == pandas.Timedelta(minutes=90)
+    assert data.loc["3", "tag"] == ""
+
+
+def test_ics_file_to_data_matches_ics_library():
+    cal = ICSCalendar(
+        path=Path("tuttle_tests/data/TuttleDemo-TimeTracking.ics"), name="Test"
+    )
+    data = cal.to_data().reset_index().set_index("uid").sort_index()
+    assert len(data) == len(cal.ical.events)
+    for event in cal.ical.events:
+        assert data.loc[event.uid, "all_day"] == event.all_day
+        if event.all_day:
+            # dates are days in the calendar's time zone
+            assert data.loc[event.uid, "begin"] == pandas.Timestamp(
+                event.begin.date(), tz=cal.time_zone
+            )
+            continue
+        assert data.loc[event.uid, "begin"] == pandas.Timestamp(event.begin.datetime)
+        assert data.loc[event.uid, "end"] == pandas.Timestamp(event.end.datetime)
+        assert data.loc[event.uid, "title"] == event.name
+
+
+def test_extract_hashtags():
+    titles = pandas.Series(["#hashtag string", "no hashtags", None, "two #a #b"])
+    assert extract_hashtags(titles).tolist() == ["#hashtag", "", "", "#a"]
+
+
+def test_parse_pyicloud_datetimes():
+    dt_lists = pandas.Series(
+        [[20220228, 2022, 2, 28, 23, 59, 1439], [19991231, 1999, 12, 31, 0, 1, 1]]
+    )
+    assert parse_pyicloud_datetimes(dt_lists).tolist() == [
+        parse_pyicloud_datetime(dt_list) for dt_list in dt_lists
+    ]
+
+
+def test_ics_time_zones():
+    cal = ICSCalendar(
+        name="Test", content=ICS_TEXT.encode("utf-8"), time_zone="America/New_York"
+    )
+    data = cal.to_data().reset_index().set_index("uid")
+    assert str(data["begin"].dt.tz) == "America/New_York"
+    # the event's own TZID is honored
+    assert data.loc["1", "begin"] == pandas.Timestamp(
+        "2022-01-20 08:15", tz="Europe/Lisbon"
+    )
+    # dates start at midnight in the calendar's time zone
+    assert data.loc["2", "begin"] == pandas.Timestamp(
+        "2022-02-18", tz="America/New_York"
+    )
+    assert data.loc["3", "begin"] == pandas.Timestamp("2022-03-01 10:00", tz="UTC")
+
+
+def test_localize_times():
+    times = pandas.to_datetime(["2022-07-01 12:00"] * 3).to_numpy()
+    time_zones = pandas.Series(["Europe/Berlin", None, "Not/AZone"])
+    utc = localize_times(times, time_zones, "America/New_York")
+    assert list(utc.hour) == [10, 16, 16]
+    assert get_time_zone("Europe/Berlin") is get_time_zone("Europe/Berlin")
+    assert get_time_zone("Not/AZone") is None
+
+
+def test_ics_times_at_daylight_saving_transitions():
+    ics_text = "\r\n".join(
+        [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "BEGIN:VEVENT",
+            "UID:ambiguous",
+            "DTSTART;TZID=Europe/Berlin:20221030T023000",
+            "DTEND;TZID=Europe/Berlin:20221030T040000",
+            "SUMMARY:Night shift #Project",
+            "END:VEVENT",
+            "BEGIN:VEVENT",
+            "UID:nonexistent",
+            "DTSTART;TZID=Europe/Berlin:20220327T023000",
+            "DTEND;TZID=Europe/Berlin:20220327T040000",
+            "SUMMARY:Night shift #Project",
+            "END:VEVENT",
+            "END:VCALENDAR",
+        ]
+    )
+    cal = ICSCalendar(name="Test", content=ics_text.encode("utf-8"))
+    data = cal.to_data().reset_index().set_index("uid")
+    # a repeated time is its first occurrence, in summer time
+    assert data.loc["ambiguous", "begin"] == pandas.Timestamp("2022-10-30 02:30+02:00")
+    assert data.loc["ambiguous", "duration"] == pandas.Timedelta(hours=2, minutes=30)
+    # a skipped time is shifted to the end of the gap
+    assert data.loc["nonexistent", "begin"] == pandas.Timestamp(
+        "2022-03-27 03:00+02:00"
+    )
+    assert data.loc["nonexistent", "duration"] == pandas.Timedelta(hours=1)
+
+
+VTIMEZONE_TEXT = "\r\n".join(
+    [
+        "BEGIN:VTIMEZONE",
+        "TZID:Custom Central European Time",
+        "BEGIN:STANDARD",
+        "DTSTART:16010101T030000",
+        "TZOFFSETFROM:+0200",
+        "TZOFFSETTO:+0100",
+        "RRULE:FREQ=YEARLY;INTERVAL=1;BYDAY=-1SU;BYMONTH=10",
+        "END:STANDARD",
+        "BEGIN:DAYLIGHT",
+        "DTSTART:16010101T020000",
+        "TZOFFSETFROM:+0100",
+        "TZOFFSETTO:+0200",
+        "RRULE:FREQ=YEARLY;INTERVAL=1;BYDAY=-1SU;BYMONTH=3",
+        "END:DAYLIGHT",
+        "END:VTIMEZONE",
+    ]
+)
+
+
+def test_ics_time_zones_defined_by_calendar():
+    ics_text = "\r\n".join(
+        [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            VTIMEZONE_TEXT,
+            "BEGIN:VEVENT",
+            "UID:winter",
+            "DTSTART;TZID=Custom Central European Time:20220120T090000",
+            "DTEND;TZID=Custom Central European Time:20220120T110000",
+            "SUMMARY:#Project",
+            "END:VEVENT",
+            "BEGIN:VEVENT",
+            "UID:summer",
+            'DTSTART;TZID="Custom Central European Time":20220720T090000',
+            'DTEND;TZID="Custom Central European Time":20220720T110000',
+            "SUMMARY:#Project",
+            "END:VEVENT",
+            "BEGIN:VEVENT",
+            "UID:outlook",
+            "DTSTART;TZID=W. Europe Standard Time:20220720T090000",
+            "DTEND;TZID=W. Europe Standard Time:20220720T110000",
+            "SUMMARY:#Project",
+            "END:VEVENT",
+            "END:VCALENDAR",
+        ]
+    )
+    definitions = {}
+    list(iter_ics_events([ics_text], time_zone_definitions=definitions))
+    assert list(definitions) == ["Custom Central European Time"]
+
+    cal = ICSCalendar(
+        name="Test", content=ics_text.encode("utf-8"), time_zone="America/New_York"
+    )
+    data = cal.to_data(batch_size=1).reset_index().set_index("uid")
+    assert data.loc["winter", "begin"] == pandas.Timestamp("2022-01-20 09:00+01:00")
+    assert data.loc["summer", "begin"] == pandas.Timestamp("2022-07-20 09:00+02:00")
+    assert data.loc["summer", "duration"] == pandas.Timedelta(hours=2)
+    # Windows time zone names are mapped to Olson names
+    assert data.loc["outlook", "begin"] == pandas.Timestamp("2022-07-20 09:00+02:00")
+    assert get_time_zone("W. Europe Standard Time") is get_time_zone("Europe/Berlin")
@@ -0,0 +1,300 @@
+"""Tests for the SQLModel data source mixin."""
+
+import datetime
+from decimal import Decimal
+
+import pytest
+import sqlalchemy
+from sqlmodel import SQLModel
+
+from tuttle import money
+from tuttle.app.core import db_engine
+from tuttle.app.core.abstractions import SQLModelDataSourceMixin
+from tuttle.app.core.database_storage_impl import DatabaseStorageImpl
+from tuttle.app.invoicing.data_source import InvoicingDataSource
+from tuttle.model import Invoice, InvoiceItem, Timesheet, TimeTrackingItem
+
+
+@pytest.fixture
+def data_source(tmp_path):
+    data_source = SQLModelDataSourceMixin()
+    data_source.db_engine = db_engine.get_engine(
+        db_engine.get_db_url(tmp_path / "tuttle.db")
+    )
+    SQLModel.metadata.create_all(data_source.db_engine)
+    for i in range(10):
+        data_source.store(
+            Invoice(
+                number=f"2022-{i}",
+                # two invoices per day to test ordering ties
+                date=datetime.date(2022, 1, 1 + i // 2),
+                paid=(i % 3 == 0),
+            )
+        )
+    return data_source
+
+
+def test_query_page_by_id(data_source):
+    first_page = data_source.query_page(Invoice, limit=4)
+    assert [invoice.number for invoice in first_page] == [
+        "2022-0",
+        "2022-1",
+        "2022-2",
+        "2022-3",
+    ]
+    second_page = data_source.query_page(Invoice, after_id=first_page[-1].id, limit=4)
+    assert [invoice.number for invoice in second_page] == [
+        "2022-4",
+        "2022-5",
+        "2022-6",
+        "2022-7",
+    ]
+
+
+def test_query_page_ordered_descending(data_source):
+    numbers = []
+    after_id = None
+    while True:
+        page = data_source.query_page(
+            Invoice,
+            after_id=after_id,
+            limit=3,
+            order_by="date",
+            descending=True,
+        )
+        numbers += [invoice.number for invoice in page]
+        if len(page) < 3:
+            break
+        after_id = page[-1].id
+    assert numbers == [f"2022-{i}" for i in reversed(range(10))]
+
+
+def test_query_page_filters(data_source):
+    page = data_source.query_page(Invoice, filters={"paid": True})
+    assert [invoice.number for invoice in page] == [
+        "2022-0",
+        "2022-3",
+        "2022-6",
+        "2022-9",
+    ]
+
+
+def test_query_iter(data_source):
+    invoices = list(data_source.query_iter(Invoice, batch_size=3, order_by="date"))
+    assert [invoice.number for invoice in invoices] == [f"2022-{i}" for i in range(10)]
+
+
+def test_store_many(data_source):
+    begin = datetime.datetime(2022, 1, 1, 8)
+    items = [
+        TimeTrackingItem(
+            begin=begin + datetime.timedelta(days=i),
+            end=begin + datetime.timedelta(days=i, hours=1),
+            duration=datetime.timedelta(hours=1),
+            title=f"Task {i}",
+            tag="#HeatingEngineering",
+        )
+        for i in range(1000)
+    ]
+    ids = data_source.store_many(items)
+    assert len(set(ids)) == 1000
+    assert ids == [item.id for item in items]
+    stored = data_source.query_by_id(TimeTrackingItem, ids[-1])
+    assert stored.title == "Task 999"
+    # update existing items and insert a new one in one call
+    items[0].title = "Updated"
+    new_item = TimeTrackingItem(
+        begin=begin,
+        end=begin,
+        duration=datetime.timedelta(0),
+        title="New",
+        tag="#HeatingEngineering",
+    )
+    data_source.store_many([items[0], new_item])
+    assert data_source.query_by_id(TimeTrackingItem, items[0].id).title == "Updated"
+    assert new_item.id == ids[-1] + 1
+    assert len(data_source.query(TimeTrackingItem)) == 1001
+
+
+def test_save_new_invoices_with_timesheet_items(tmp_path):
+    data_source = InvoicingDataSource()
+    data_source.db_engine = db_engine.get_engine(
+        db_engine.get_db_url(tmp_path / "tuttle.db")
+    )
+    SQLModel.metadata.create_all(data_source.db_engine)
+    date = datetime.date(2022, 1, 31)
+    invoice = Invoice(date=date)
+    timesheet = Timesheet(
+        title="January",
+        date=date,
+        period_start=datetime.date(2022, 1, 1),
+        period_end=date,
+        invoice=invoice,
+    )
+    begin = datetime.datetime(2022, 1, 1, 8)
+    for i in range(100):
+        timesheet.items.append(
+            TimeTrackingItem(
+                begin=begin + datetime.timedelta(hours=i),
+                end=begin + datetime.timedelta(hours=i + 1),
+                duration=datetime.timedelta(hours=1),
+                title=f"Task {i}",
+                tag="#HeatingEngineering",
+            )
+        )
+    data_source.save_new_invoices([invoice])
+    assert len(timesheet.items) == 100
+    assert timesheet.total == datetime.timedelta(hours=100)
+    stored = data_source.query_where(TimeTrackingItem, "timesheet_id", timesheet.id)
+    assert sorted(item.id for item in stored) == [item.id for item in timesheet.items]
+
+    invoice.rendered = True
+    timesheet.rendered = True
+    data_source.save_rendered_flags([invoice])
+    assert data_source.query_by_id(Invoice, invoice.id).rendered
+    assert data_source.query_by_id(Timesheet, timesheet.id).rendered
+    assert data_source.query_by_id(Invoice, invoice.id).number == invoice.number
+
+
+def test_invoice_numbers(tmp_path):
+    data_source = InvoicingDataSource()
+    data_source.db_engine = db_engine.get_engine(
+        db_engine.get_db_url(tmp_path / "tuttle.db")
+    )
+    SQLModel.metadata.create_all(data_source.db_engine)
+    date = datetime.date(2022, 1, 1)
+    # numbered before the sequence existed
+    data_source.store(Invoice(number="2022-01-01-01", date=date))
+    assert data_source.reserve_invoice_numbers(date, 1) == ["2022-01-01-02"]
+    assert data_source.reserve_invoice_numbers(date, 3) == [
+        "2022-01-01-03",
+        "2022-01-01-04",
+        "2022-01-01-05",
+    ]
+    invoices = [Invoice(date=date), Invoice(date=date + datetime.timedelta(days=1))]
+    data_source.save_new_invoices(invoices)
+    assert [invoice.number for invoice in invoices] == [
+        "2022-01-01-06",
+        "2022-01-02-01",
+    ]
+    # the earlier invoices of the scope were deleted, or are numbered unpadded
+    date = datetime.date(2022, 1, 3)
+    data_source.store(Invoice(number="2022-01-03-2", date=date))
+    data_source.store(Invoice(number="2022-01-03-07", date=date))
+    assert data_source.reserve_invoice_numbers(date, 1) == ["2022-01-03-08"]
+
+
+def test_invoice_totals(tmp_path):
+    data_source = InvoicingDataSource()
+    data_source.db_engine = db_engine.get_engine(
+        db_engine.get_db_url(tmp_path / "tuttle.db")
+    )
+    SQLModel.metadata.create_all(data_source.db_engine)
+    for day, cancelled in [(1, False), (2, False), (3, True)]:
+        invoice = Invoice(date=datetime.date(2022, 1, day), cancelled=cancelled)
+        InvoiceItem(
+            invoice=invoice,
+            start_date=invoice.date,
+            quantity=10,
+            unit="hour",
+            unit_price=Decimal("50"),
+            VAT_rate=Decimal("0.19"),
+            description="Repair",
+        )
+        data_source.store(invoice)
+    (stored,) = data_source.query_where(Invoice, "date", datetime.date(2022, 1, 1))
+    assert stored.total_amount == Decimal("595.00")
+
+    # an item added later changes the stored totals
+    InvoiceItem(
+        invoice=stored,
+        start_date=stored.date,
+        quantity=1,
+        unit="hour",
+        unit_price=Decimal("100"),
+        VAT_rate=Decimal("0.19"),
+        description="Travel",
+    )
+    data_source.store(stored)
+    totals = data_source.get_invoice_totals()
+    assert totals == {
+        "count": 2,
+        "sum": Decimal("1100.00"),
+        "VAT_total": Decimal("209.00"),
+        "total": Decimal("1309.00"),
+    }
+    assert data_source.get_invoice_totals(end_date=datetime.date(2022, 1, 1))[
+        "total"
+    ] == Decimal("714.00")
+
+    # totals lost, e.g. in a database created before they were stored
+    with data_source.create_session() as session:
+        session.execute(sqlalchemy.update(Invoice).values(total_amount=0))
+        session.commit()
+    data_source.update_invoice_totals()
+    assert data_source.get_invoice_totals()["total"] == Decimal("1309.00")
+
+    # credits are rounded the same way in SQL as in Python
+    credit = Invoice(date=datetime.date(2022, 1, 4))
+    InvoiceItem(
+        invoice=credit,
+        start_date=credit.date,
+        quantity=1,
+        unit="hour",
+        unit_price=Decimal("-0.84"),
+        VAT_rate=Decimal("0.19"),
+        description="Discount",
+    )
+    data_source.store(credit)
+    (stored,) = data_source.query_where(Invoice, "date", credit.date)
+    assert stored.VAT_amount == Decimal("-0.16")
+    data_source.update_invoice_totals()
+    (stored,) = data_source.query_where(Invoice, "date", credit.date)
+    assert stored.VAT_amount == Decimal("-0.16")
+    assert stored.total_amount == Decimal("-1.00")
+
+
+def test_upgrade_creates_missing_indexes(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    storage = DatabaseStorageImpl(lambda data: None, debug_mode=False)
+    storage.ensure_database()
+    # a database created before the indexes existed
+    with storage.db_engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_invoice_date")
+    storage.ensure_database()
+    indexes = sqlalchemy.inspect(storage.db_engine).get_indexes("invoice")
+    assert "ix_invoice_date" in [index["name"] for index in indexes]
+
+
+def test_upgrade_rounds_stored_decimals_like_new_values(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    storage = DatabaseStorageImpl(lambda data: None, debug_mode=False)
+    storage.ensure_database()
+    data_source = SQLModelDataSourceMixin()
+    data_source.db_engine = storage.db_engine
+    for unit_price in [1.005, -0.005, -0.015]:
+        data_source.store(
+            InvoiceItem(
+                start_date=datetime.date(2022, 1, 1),
+                quantity=1,
+                unit="hour",
+                unit_price=Decimal("0"),
+                VAT_rate=Decimal("0.19"),
+                description=str(unit_price),
+            )
+        )
+    # a database created before amounts were stored as integers
+    with storage.db_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE invoiceitem SET unit_price = CAST(description AS REAL), "
+            "VAT_rate = 0.19"
+        )
+        connection.exec_driver_sql("PRAGMA user_version = 0")
+    storage.ensure_database()
+    items = data_source.query(InvoiceItem)
+    assert {item.description: item.unit_price for item in items} == {
+        "1.005": money.from_minor_units(money.to_minor_units(1.005)),
+        "-0.005": Decimal("-0.01"),
+        "-0.015": Decimal("-0.02"),
+    }
+    assert {item.VAT_rate for item in items} == {Decimal("0.19")}
@@ -0,0 +1,41 @@
+"""Tests for the database engine registry."""
+
+from tuttle.app.core import db_engine
+
+
+def test_engine_is_shared_per_url(tmp_path):
+    db_url = db_engine.get_db_url(tmp_path / "shared.db")
+    engine = db_engine.get_engine(db_url)
+    assert db_engine.get_engine(db_url) is engine
+    other_url = db_engine.get_db_url(tmp_path / "other.db")
+    assert db_engine.get_engine(other_url) is not engine
+
+
+def test_echo_applies_to_shared_engine(tmp_path):
+    db_url = db_engine.get_db_url(tmp_path / "echo.db")
+    engine = db_engine.get_engine(db_url)
+    assert not engine.echo
+    assert db_engine.get_engine(db_url, echo=True) is engine
+    assert engine.echo
+    # callers that do not ask for echo leave it as it is
+    db_engine.get_engine(db_url)
+    assert engine.echo
+
+
+def test_sqlite_pragmas_applied(tmp_path):
+    db_url = db_engine.get_db_url(tmp_path / "pragmas.db")
+    engine = db_engine.get_engine(db_url)
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+    assert journal_mode.lower() == "wal"
+    assert synchronous == 1  # NORMAL
+
+
+def test_disposed_engine_stays_registered(tmp_path):
+    db_url = db_engine.get_db_url(tmp_path / "disposed.db")
+    engine = db_engine.get_engine(db_url)
+    db_engine.dispose_engine(db_url)
+    assert db_engine.get_engine(db_url) is engine
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT 1").scalar() == 1
@@ -73,3 +73,30 @@ def test_generate_invoice(
             number=f"{datetime.date.today().strftime('%Y-%m-%d')}-{i}",
         )
         # assert invoice.total > 0
+
+
+def test_generate_due_invoices(
+    demo_projects,
+    demo_calendar_timetracking,
+):
+    invoices = invoicing.generate_due_invoices(
+        demo_calendar_timetracking.to_data(),
+        demo_projects,
+        date=datetime.date(2022, 2, 1),
+    )
+    assert len(invoices) > 0
+    for invoice in invoices:
+        (timesheet,) = invoice.timesheets
+        assert timesheet.period_start == datetime.date(2022, 1, 1)
+        assert timesheet.period_end == datetime.date(2022, 1, 31)
+        assert timesheet.project is invoice.project
+        assert invoice.total > 0
+    # periods with a timesheet are not invoiced again
+    assert (
+        invoicing.generate_due_invoices(
+            demo_calendar_timetracking.to_data(),
+            [invoice.project for invoice in invoices],
+            date=datetime.date(2022, 2, 1),
+        )
+        == []
+    )
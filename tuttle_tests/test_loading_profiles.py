@@ -0,0 +1,62 @@
+"""Tests for eager-loading profiles."""
+
+import faker
+import pytest
+import sqlalchemy
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from tuttle import demo
+from tuttle.app.core import loading_profiles
+from tuttle.model import Invoice
+
+
+@pytest.fixture
+def db_engine():
+    db_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=sqlalchemy.pool.StaticPool,
+    )
+    SQLModel.metadata.create_all(db_engine)
+    fake = faker.Faker()
+    with Session(db_engine) as session:
+        for _ in range(3):
+            session.add(demo.create_fake_invoice(fake, render=False))
+        session.commit()
+    return db_engine
+
+
+def query_invoices(db_engine, profile):
+    with Session(db_engine, expire_on_commit=False) as session:
+        return session.exec(
+            select(Invoice).options(
+                *loading_profiles.get_loader_options(Invoice, profile)
+            )
+        ).all()
+
+
+def test_list_profile_loads_only_listed_relationships(db_engine):
+    invoices = query_invoices(db_engine, loading_profiles.LIST)
+    assert len(invoices) == 3
+    for invoice in invoices:
+        assert invoice.contract.client.name
+        assert invoice.project.title
+        assert invoice.total > 0
+        with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+            invoice.items
+        with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+            invoice.timesheets
+        with pytest.raises(sqlalchemy.exc.InvalidRequestError):
+            invoice.contract.projects
+
+
+def test_render_profile_loads_timesheet_items(db_engine):
+    invoices = query_invoices(db_engine, loading_profiles.RENDER)
+    for invoice in invoices:
+        assert invoice.contract.client.invoicing_contact.address is not None
+        assert len(invoice.timesheets[0].items) > 0
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        loading_profiles.get_loader_options(Invoice, "unknown")
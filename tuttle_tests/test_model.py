@@ -215,3 +215,39 @@ class TestProject:
                     end_date=datetime.date(2022, 12, 31),
                 )
             )
+
+
+class TestTimesheet:
+    def create_item(self, day: int, hours: int) -> model.TimeTrackingItem:
+        begin = datetime.datetime(2022, 1, day, 9)
+        return model.TimeTrackingItem(
+            begin=begin,
+            end=begin + datetime.timedelta(hours=hours),
+            duration=datetime.timedelta(hours=hours),
+            title="Repair",
+            tag="#HeatingRepair",
+        )
+
+    def test_table_is_cached_until_items_change(self):
+        timesheet = model.Timesheet(
+            title="Timesheet",
+            date=datetime.date(2022, 2, 1),
+            period_start=datetime.date(2022, 1, 1),
+            period_end=datetime.date(2022, 1, 31),
+        )
+        assert timesheet.total == datetime.timedelta(0)
+        assert timesheet.begin is None
+        timesheet.items.append(self.create_item(day=3, hours=2))
+        timesheet.items.append(self.create_item(day=5, hours=3))
+        table = timesheet.table
+        assert timesheet.table is table
+        assert timesheet.total == datetime.timedelta(hours=5)
+        assert timesheet.begin == datetime.datetime(2022, 1, 3, 9)
+        assert timesheet.end == datetime.datetime(2022, 1, 5, 12)
+
+        timesheet.items[0].duration = datetime.timedelta(hours=1)
+        assert timesheet.table is not table
+        assert timesheet.total == datetime.timedelta(hours=4)
+        timesheet.items.remove(timesheet.items[1])
+        assert timesheet.total == datetime.timedelta(hours=1)
+        assert timesheet.end == datetime.datetime(2022, 1, 3, 11)
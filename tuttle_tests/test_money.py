@@ -0,0 +1,97 @@
+"""Tests for the money module."""
+
+import datetime
+from decimal import Decimal
+
+import numpy
+import sqlalchemy
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from tuttle import money
+from tuttle.model import InvoiceItem
+
+
+def test_conversions():
+    assert money.to_minor_units(Decimal("49.99")) == 4999
+    assert money.to_minor_units(0.1 + 0.2) == 30
+    assert money.to_minor_units("10.005") == 1001
+    assert money.from_minor_units(4999) == Decimal("49.99")
+    assert money.to_basis_points(0.19) == 1900
+    assert money.to_basis_points(Decimal(0.2)) == 2000
+    assert money.from_basis_points(725) == Decimal("0.0725")
+
+
+def test_apply_rate():
+    assert money.apply_rate(1050, 1900) == 200  # 199.5 rounded half away from zero
+    assert money.apply_rate(-1050, 1900) == -200
+    amounts = numpy.array([1050, 10000, 1], dtype=numpy.int64)
+    rates = numpy.array([1900, 700, 1900], dtype=numpy.int64)
+    assert (money.apply_rate(amounts, rates) == [200, 700, 0]).all()
+    assert (money.apply_rate(-amounts, rates) == [-200, -700, 0]).all()
+    # rounded once over the sum, not per amount
+    assert money.apply_rates([1, 1, 1], [5000, 5000, 5000]) == 2
+    assert money.apply_rates([-1, -1, -1], [5000, 5000, 5000]) == -2
+
+
+def test_stored_as_integers():
+    db_engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(db_engine)
+    with Session(db_engine) as session:
+        session.add(
+            InvoiceItem(
+                start_date=datetime.date(2022, 1, 1),
+                quantity=3,
+                unit="hour",
+                unit_price=Decimal("49.99"),
+                VAT_rate=Decimal("0.19"),
+                description="Repair",
+            )
+        )
+        session.commit()
+    with db_engine.connect() as connection:
+        stored = connection.execute(
+            sqlalchemy.text("SELECT unit_price, VAT_rate FROM invoiceitem")
+        ).one()
+    assert tuple(stored) == (4999, 1900)
+    with Session(db_engine) as session:
+        item = session.exec(select(InvoiceItem)).one()
+    assert item.unit_price == Decimal("49.99")
+    assert item.VAT_rate == Decimal("0.19")
+
+
+def test_divide_rounded_in_sql():
+    db_engine = create_engine("sqlite://")
+    dividends = range(-25000, 25001, 2500)
+    with db_engine.connect() as connection:
+        rounded = [
+            connection.execute(
+                sqlalchemy.select(
+                    money.divide_rounded_in_sql(sqlalchemy.literal(dividend), 10000)
+                )
+            ).scalar_one()
+            for dividend in dividends
+        ]
+    assert rounded == [money.divide_rounded(dividend, 10000) for dividend in dividends]
+
+
+def test_rounding_is_half_away_from_zero():
+    # -0.025, -0.015, ..., 0.015 in currency units
+    halves = [Decimal(10 * i + 5).scaleb(-3) for i in range(-3, 2)]
+    expected = [-3, -2, -1, 1, 2]
+    assert [money.to_minor_units(half) for half in halves] == expected
+    assert [money.to_minor_units(float(half)) for half in halves] == expected
+    dividends = [int(half.scaleb(6)) for half in halves]
+    assert [money.divide_rounded(dividend, 10000) for dividend in dividends] == (
+        expected
+    )
+    assert list(money.divide_rounded(numpy.array(dividends), 10000)) == expected
+    db_engine = create_engine("sqlite://")
+    with db_engine.connect() as connection:
+        assert [
+            connection.execute(
+                sqlalchemy.select(
+                    money.divide_rounded_in_sql(sqlalchemy.literal(dividend), 10000)
+                )
+            ).scalar_one()
+            for dividend in dividends
+        ] == expected
@@ -1,8 +1,12 @@
+import base64
+import io
+import os
 import tempfile
 import pytest
 from pathlib import Path
 
 import faker
+import PIL.Image
 
 from tuttle import rendering, demo
 
@@ -103,3 +107,154 @@ class TestRenderInvoice:
 
             dir = Path(out_dir) / Path(prefix)
             assert not dir.exists()
+
+
+class TestTemplateEnv:
+    """Tests for get_template_env"""
+
+    def test_environment_is_shared(self, fake):
+        template_env = rendering.get_template_env("invoice-anvil")
+        assert rendering.get_template_env("invoice-anvil") is template_env
+        user = demo.create_fake_user(fake)
+        invoice = demo.create_fake_invoice(fake, render=False)
+        html = rendering.render_invoice(user=user, invoice=invoice, out_dir=None)
+        assert html == rendering.render_invoice(
+            user=user, invoice=invoice, out_dir=None
+        )
+        assert template_env.get_template("invoice.html") is template_env.get_template(
+            "invoice.html"
+        )
+
+
+class TestRenderingService:
+    """Tests for RenderingService"""
+
+    def test_renders_batch_in_worker_processes(self, fake, tmp_path):
+        user = demo.create_fake_user(fake)
+        invoices = [demo.create_fake_invoice(fake, render=False) for _ in range(2)]
+        timesheets = [demo.create_fake_timesheet(fake)]
+        progress = []
+        service = rendering.RenderingService(max_workers=2)
+        try:
+            futures = service.render_batch(
+                user=user,
+                invoices=invoices,
+                timesheets=timesheets,
+                invoice_dir=tmp_path,
+                timesheet_dir=tmp_path,
+                on_progress=lambda finished, total: progress.append((finished, total)),
+                document_format="html",
+                only_final=True,
+            )
+            documents = [future.result(timeout=300) for future in futures]
+        finally:
+            service.shutdown()
+
+        assert documents == invoices + timesheets
+        for document in documents:
+            assert document.rendered
+            assert (tmp_path / f"{document.prefix}.html").is_file()
+        assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+class TestRenderCache:
+    """Tests for RenderCache"""
+
+    def test_key_depends_on_content_and_stylesheets(self, tmp_path):
+        cache = rendering.RenderCache(cache_dir=tmp_path / "cache")
+        css_path = tmp_path / "style.css"
+        css_path.write_text("body { color: black; }")
+        key = cache.get_key("<p>Invoice</p>", [css_path], "pdf")
+        assert key == cache.get_key("<p>Invoice</p>", [css_path], "pdf")
+        assert key != cache.get_key("<p>Changed invoice</p>", [css_path], "pdf")
+        assert key != cache.get_key("<p>Invoice</p>", [], "pdf")
+        css_path.write_text("body { color: darkblue; }")
+        assert key != cache.get_key("<p>Invoice</p>", [css_path], "pdf")
+
+    def test_key_depends_on_web_assets(self, tmp_path):
+        cache = rendering.RenderCache(cache_dir=tmp_path / "cache")
+        template_path = tmp_path / "template"
+        (template_path / "web" / "images").mkdir(parents=True)
+        logo_path = template_path / "web" / "images" / "logo.png"
+        logo_path.write_bytes(b"logo")
+        template_files = rendering._get_template_files(template_path)
+        assert template_files == [logo_path]
+        key = cache.get_key("<p>Invoice</p>", template_files, "pdf")
+        logo_path.write_bytes(b"new logo")
+        assert key != cache.get_key("<p>Invoice</p>", template_files, "pdf")
+
+    def test_renders_again_when_evicted_after_hit(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        monkeypatch.setattr(
+            rendering, "convert_html_string_to_pdf", lambda html, **kwargs: b"%PDF"
+        )
+        get = rendering.RenderCache.get
+
+        def get_then_evict(self, key, document_format):
+            # another process evicts the document right after the lookup
+            path = get(self, key, document_format)
+            if path is not None:
+                path.unlink()
+            return path
+
+        out_dir = tmp_path / "out"
+        rendering.write_document(
+            "<p>Invoice</p>", "invoice", "invoice", [], out_dir, only_final=True
+        )
+        monkeypatch.setattr(rendering.RenderCache, "get", get_then_evict)
+        document_path = rendering.write_document(
+            "<p>Invoice</p>", "invoice", "invoice", [], out_dir, only_final=True
+        )
+        assert document_path.read_bytes() == b"%PDF"
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = rendering.RenderCache(cache_dir=tmp_path, max_size=25)
+        assert cache.get("first", "pdf") is None
+        cache.put("first", "pdf", b"0123456789")
+        cache.put("second", "pdf", b"0123456789")
+        # mark the first document as older than the second, then use it
+        os.utime(tmp_path / "first.pdf", ns=(0, 0))
+        os.utime(tmp_path / "second.pdf", ns=(1, 1))
+        assert cache.get("first", "pdf").read_bytes() == b"0123456789"
+        cache.put("third", "pdf", b"0123456789")
+        assert cache.get("second", "pdf") is None
+        assert cache.get("first", "pdf") is not None
+        assert cache.get("third", "pdf") is not None
+
+
+class TestDocumentThumbnail:
+    """Tests for generate_document_thumbnail"""
+
+    @pytest.fixture(autouse=True)
+    def home(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", str(tmp_path))
+
+    def test_renders_first_page_at_width(self, tmp_path):
+        fitz = pytest.importorskip("fitz")
+        pdf_path = tmp_path / "document.pdf"
+        with fitz.open() as pdf_doc:
+            pdf_doc.new_page(width=595, height=842)
+            pdf_doc.new_page(width=595, height=842)
+            pdf_doc.save(pdf_path)
+        thumbnail = rendering.generate_document_thumbnail(pdf_path, 100)
+        image = PIL.Image.open(io.BytesIO(base64.b64decode(thumbnail)))
+        assert image.width == 100
+        assert rendering.generate_document_thumbnail(pdf_path, 100) == thumbnail
+
+    def test_uses_cached_thumbnail_until_modified(self, tmp_path):
+        pdf_path = tmp_path / "document.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4")
+        rendering._get_thumbnail_cache().put(
+            rendering._get_thumbnail_key(pdf_path, 100), "jpg", b"thumbnail"
+        )
+        thumbnail = rendering.generate_document_thumbnail(pdf_path, 100)
+        assert base64.b64decode(thumbnail) == b"thumbnail"
+        service = rendering.RenderingService(max_workers=1)
+        try:
+            future = service.submit_thumbnail(pdf_path, 100)
+            assert future.done() and future.result() == thumbnail
+        finally:
+            service.shutdown()
+        assert rendering._get_cached_thumbnail(pdf_path, 200) is None
+        os.utime(pdf_path, ns=(0, 0))
+        assert rendering._get_cached_thumbnail(pdf_path, 100) is None
@@ -1,6 +1,7 @@
 """Test timetracking module"""
 from time import time
 import pandas
+import pytest
 import datetime
 
 from tuttle import timetracking
@@ -14,8 +15,71 @@ def test_timetracking_import_toggl():
         preset=timetracking.TogglPreset,
     )
     assert not data.empty
+    assert data.index.dtype == "datetime64[ns]"
+    assert data.index[0] == pandas.Timestamp("2022-01-06 10:30:34")
+    assert data["duration"].iloc[0] == pandas.Timedelta(hours=2)
 
-    pass
+
+def test_timetracking_import_in_chunks():
+    path = "tuttle_tests/data/test_time_tracking_toggl.csv"
+    data = timetracking.import_from_spreadsheet(
+        path=path, preset=timetracking.TogglPreset
+    )
+    chunked = timetracking.import_from_spreadsheet(
+        path=path, preset=timetracking.TogglPreset, chunk_size=4
+    )
+    assert chunked.equals(data)
+
+
+def test_timetracking_import_excel(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = "tuttle_tests/data/test_time_tracking_toggl.csv"
+    excel_path = tmp_path / "toggl.xlsx"
+    pandas.read_csv(path).to_excel(excel_path, index=False)
+    data = timetracking.import_from_spreadsheet(
+        path=path, preset=timetracking.TogglPreset
+    )
+    from_excel = timetracking.import_from_spreadsheet(
+        path=excel_path, preset=timetracking.TogglPreset, chunk_size=10
+    )
+    assert (from_excel.index == data.index).all()
+    assert (from_excel["duration"] == data["duration"]).all()
+
+
+def test_detect_datetime_format():
+    values = pandas.Series(["2022-01-06 10:30:34 PM", "2022-01-07 01:30:10 AM"])
+    assert (
+        timetracking.detect_datetime_format(values, timetracking.DATETIME_FORMATS)
+        == "%Y-%m-%d %I:%M:%S %p"
+    )
+    assert timetracking.detect_datetime_format(values, ["%d.%m.%Y %H:%M"]) is None
+
+
+def test_infer_spreadsheet_preset(tmp_path):
+    path = "tuttle_tests/data/test_time_tracking_toggl.csv"
+    assert timetracking.detect_spreadsheet_preset(path) is timetracking.TogglPreset
+    assert timetracking.import_from_spreadsheet(path=path).equals(
+        timetracking.import_from_spreadsheet(path=path, preset=timetracking.TogglPreset)
+    )
+
+    harvest_path = tmp_path / "harvest.csv"
+    harvest_path.write_text(
+        "Date,Client,Project,Task,Notes,Hours,Billable?\n"
+        "2022-01-06,Sam Lowry,#HeatingRepair,Repair,Replace the ducts,1.5,Yes\n"
+        "2022-01-07,Sam Lowry,#HeatingRepair,Repair,,2.25,Yes\n"
+    )
+    assert (
+        timetracking.detect_spreadsheet_preset(harvest_path)
+        is timetracking.HarvestPreset
+    )
+    data = timetracking.import_from_spreadsheet(path=harvest_path)
+    assert data["duration"].iloc[0] == pandas.Timedelta(hours=1.5)
+    assert data["end"].iloc[1] == pandas.Timestamp("2022-01-07 02:15")
+
+    unknown_path = tmp_path / "unknown.csv"
+    unknown_path.write_text("Day,Hours\n2022-01-06,1.5\n")
+    with pytest.raises(ValueError):
+        timetracking.detect_spreadsheet_preset(unknown_path)
 
 
 def test_calendar_to_data(demo_calendar_timetracking):
@@ -40,6 +104,25 @@ def test_generate_timesheet_from_demo_calendar(
             assert (timesheet.empty) or (timesheet.total >= pandas.Timedelta("0 hours"))
 
 
+def test_timetracking_index(demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data()
+    index = timetracking.TimeTrackingIndex(data)
+    for tag in data["tag"].dropna().unique():
+        for period_start, period_end in [
+            (datetime.date(2022, 1, 1), datetime.date(2022, 1, 31)),
+            (datetime.date(2022, 2, 17), datetime.date(2022, 2, 17)),
+        ]:
+            expected = (
+                data.sort_index()
+                .loc[str(period_start) : str(period_end)]
+                .query(f"tag == '{tag}'")
+            )
+            found = index.lookup(tag, period_start, period_end)
+            assert (found.index == expected.index).all()
+            assert (found["tag"] == tag).all()
+    assert index.lookup("#Unknown", datetime.date(2022, 1, 1)).empty
+
+
 def test_create_timesheet(
     demo_projects,
 ):
@@ -81,3 +164,63 @@ def test_create_timesheet(
     assert timesheet.date == datetime.date.today()
     assert timesheet.total == datetime.timedelta(hours=8)
     assert timesheet.empty == False
+
+
+def test_progress_of_projects(demo_projects, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data()
+    demo_projects[0].contract.volume = 100
+    progress = timetracking.progress_of_projects(
+        demo_projects[1:], timetracking.tracked_time_by_tag(data)
+    )
+    assert progress["progress"].isna().all()
+    tracked_time = timetracking.tracked_time_by_tag(data)
+    progress = timetracking.progress_of_projects(demo_projects, tracked_time)
+    assert list(progress.index) == [project.tag for project in demo_projects]
+    for project in demo_projects[:1]:
+        contract = project.contract
+        entries = data[data["tag"] == project.tag]
+        unit_time = timetracking._get_unit_duration(contract.unit)
+        expected_units = (
+            entries.loc[~entries["all_day"], "duration"].sum() / unit_time
+            + entries["all_day"].sum() * contract.units_per_workday
+        )
+        row = progress.loc[project.tag]
+        assert row["tracked_units"] == pytest.approx(expected_units)
+        assert row["remaining_units"] == pytest.approx(contract.volume - expected_units)
+        assert row["progress"] == pytest.approx(expected_units / contract.volume)
+        assert timetracking.progress(project, data) == pytest.approx(row["progress"])
+
+
+def test_total_time_tracked(demo_projects, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data()
+    rollup = timetracking.rollup_by_day_and_tag(data)
+    assert rollup["entry_count"].sum() == len(data)
+
+    by_tag = timetracking.total_time_tracked("tag", rollup)
+    assert by_tag["tracked"].sum() == (
+        data.loc[~data["all_day"], "duration"].sum()
+        + data["all_day"].sum() * timetracking.WORKDAY_DURATION
+    )
+
+    totals = timetracking.total_time_tracked(
+        ["client", "month"], rollup, projects=demo_projects
+    )
+    assert totals["entry_count"].sum() == len(data)
+    days = pandas.DatetimeIndex(data.index).tz_localize(None)
+    clients = {project.tag: project.contract.client.name for project in demo_projects}
+    expected = (
+        data.assign(
+            client=data["tag"].map(clients).to_numpy(),
+            month=days.to_period("M").to_timestamp(),
+        )
+        .groupby(["client", "month"])
+        .size()
+    )
+    assert (totals["entry_count"].dropna().loc[expected.index] == expected).all()
+
+    billable = timetracking.total_time_tracked("billable", rollup, demo_projects)
+    tags = [project.tag for project in demo_projects]
+    assert billable.loc[True, "entry_count"] == data["tag"].isin(tags).sum()
+
+    with pytest.raises(ValueError):
+        timetracking.total_time_tracked("weekday", rollup)
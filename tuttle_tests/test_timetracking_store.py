@@ -0,0 +1,183 @@
+"""Tests for the time tracking store."""
+
+import datetime
+from pathlib import Path
+
+import pandas
+import pytest
+import sqlalchemy
+
+from tuttle import timetracking
+from tuttle.calendar import ICSCalendar
+from tuttle.timetracking_store import SyncResult, TimeTrackingStore
+
+
+@pytest.fixture
+def store():
+    return TimeTrackingStore(sqlalchemy.create_engine("sqlite://"))
+
+
+def test_roundtrip_calendar_data(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data().sort_index()
+    store.replace(data)
+    loaded = store.load()
+    assert store.get_time_zone() == "CET"
+    assert len(loaded) == len(data)
+    assert (loaded.index == data.index).all()
+    assert (loaded["end"] == data["end"]).all()
+    assert (loaded["duration"] == data["duration"]).all()
+    assert (loaded["tag"] == data["tag"]).all()
+    assert (loaded["all_day"] == data["all_day"]).all()
+
+
+def test_roundtrip_spreadsheet_data(store):
+    data = timetracking.import_from_spreadsheet(
+        path="tuttle_tests/data/test_time_tracking_toggl.csv",
+        preset=timetracking.TogglPreset,
+    ).sort_index()
+    store.replace(data)
+    loaded = store.load()
+    assert store.get_time_zone() is None
+    assert (loaded.index == data.index).all()
+    assert loaded["duration"].sum() == data["duration"].sum()
+
+
+def test_load_period_and_tag(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data().sort_index()
+    store.replace(data)
+    loaded = store.load(
+        start=datetime.date(2022, 1, 1),
+        end=datetime.date(2022, 1, 31),
+        tag="#HeatingEngineering",
+    )
+    expected = data.loc["2022-01-01":"2022-01-31"].query(
+        "tag == '#HeatingEngineering'"
+    )
+    assert len(loaded) > 0
+    assert (loaded.index == expected.index).all()
+
+
+def test_append(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data()
+    store.replace(data)
+    store.append(data)
+    assert store.count() == 2 * len(data)
+    store.clear()
+    assert store.count() == 0
+    assert store.load().empty
+
+
+def test_sync_writes_only_changes(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data()
+    result = timetracking.sync_calendar(demo_calendar_timetracking, store)
+    assert result == SyncResult(added=len(data))
+    source = timetracking.get_sync_source(demo_calendar_timetracking)
+    assert store.get_sync_state(source) is not None
+
+    assert store.sync("calendar", data) == SyncResult(added=len(data))
+    assert store.sync("calendar", data) == SyncResult()
+
+    changed = data.sort_index().copy()
+    changed.iloc[0, changed.columns.get_loc("title")] = "Changed #Tag"
+    changed = changed.iloc[:-1]
+    assert store.sync("calendar", changed) == SyncResult(updated=1, deleted=1)
+    assert store.count() == 2 * len(data) - 1
+    assert "Changed #Tag" in store.load()["title"].values
+
+
+def test_sync_window(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data().sort_index()
+    store.sync("calendar", data)
+    window_start = data.index[len(data) // 2]
+    # events before the window are kept even though they are not passed
+    result = store.sync("calendar", data.loc[window_start:], window_start=window_start)
+    assert result == SyncResult()
+    # events overlapping the window, as returned by cloud calendars, are ignored
+    result = store.sync("calendar", data, window_start=window_start)
+    assert result == SyncResult()
+    assert store.count() == len(data)
+    result = store.sync("calendar", data.iloc[:0], window_start=window_start)
+    assert result.deleted == len(data.loc[window_start:])
+    assert store.count() == len(data.loc[: window_start - pandas.Timedelta(1)])
+
+
+def test_revision_changes_with_writes(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data()
+    assert store.get_revision() is None
+    store.replace(data)
+    revision = store.get_revision()
+    assert revision is not None
+    assert store.sync("calendar", data).added == len(data)
+    assert store.get_revision() != revision
+    revision = store.get_revision()
+    store.sync("calendar", data)
+    assert store.get_revision() == revision
+    store.clear()
+    assert store.get_revision() != revision
+
+
+def test_rollup_follows_writes(store, demo_calendar_timetracking):
+    data = demo_calendar_timetracking.to_data().sort_index()
+
+    def assert_rollup_matches_records():
+        expected = timetracking.rollup_by_day_and_tag(store.load())
+        rollup = store.load_rollup()
+        assert rollup["entry_count"].sum() == store.count()
+        assert (rollup["day"] == expected["day"]).all()
+        assert (rollup["tag"].fillna("") == expected["tag"].fillna("")).all()
+        for count in ["duration", "all_day_count", "entry_count"]:
+            assert (rollup[count] == expected[count]).all()
+
+    store.replace(data)
+    assert_rollup_matches_records()
+    store.append(data)
+    assert_rollup_matches_records()
+
+    store.clear()
+    store.sync("calendar", data)
+    changed = data.copy()
+    changed.iloc[0, changed.columns.get_loc("tag")] = "#Changed"
+    store.sync("calendar", changed.iloc[:-1])
+    assert_rollup_matches_records()
+    assert "#Changed" in store.load_rollup()["tag"].values
+
+    # databases written before the rollup existed build it on first load
+    with store.db_engine.begin() as connection:
+        store._set_setting(connection, "rollup", None)
+    assert_rollup_matches_records()
+    january = store.load_rollup(
+        start=datetime.date(2022, 1, 1), end=datetime.date(2022, 1, 31)
+    )
+    assert january["day"].dt.month.eq(1).all()
+
+
+def test_store_untagged_spreadsheet_data(store, tmp_path):
+    path = tmp_path / "toggl.csv"
+    spreadsheet = pandas.read_csv("tuttle_tests/data/test_time_tracking_toggl.csv")
+    spreadsheet.loc[0, "Project"] = None
+    spreadsheet.to_csv(path, index=False)
+    data = timetracking.import_from_spreadsheet(
+        path=path, preset=timetracking.TogglPreset
+    ).sort_index()
+    assert data["tag"].iloc[0] == ""
+    store.replace(data)
+    # data edited or built elsewhere may lack tags as well
+    untagged = data.assign(tag=None)
+    store.append(untagged)
+    store.append(data.drop(columns=["tag"]))
+    assert store.count() == 3 * len(data)
+    assert (store.load()["tag"] == "").sum() == 2 * len(data) + 1
+
+
+def test_sync_calendar_files_of_same_name(store, demo_calendar_timetracking, tmp_path):
+    data = demo_calendar_timetracking.to_data()
+    # synchronized when calendar files were identified by name
+    store.sync(demo_calendar_timetracking.name, data)
+    assert timetracking.sync_calendar(demo_calendar_timetracking, store) == SyncResult()
+
+    copy_path = tmp_path / "TimeTracking.ics"
+    copy_path.write_bytes(Path(demo_calendar_timetracking.path).read_bytes())
+    copy = ICSCalendar(path=copy_path, name=demo_calendar_timetracking.name)
+    assert timetracking.sync_calendar(copy, store) == SyncResult(added=len(data))
+    assert timetracking.sync_calendar(demo_calendar_timetracking, store) == SyncResult()
+    assert store.count() == 2 * len(data)